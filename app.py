@@ -1,25 +1,49 @@
 # app.py (Yeni Veritabanı Odaklı Sürüm)
 import os
+import hashlib
+import json
 import threading
 import time
-from datetime import datetime, time as dt_time, timedelta
+from datetime import datetime
 import pytz
 import traceback
 
-from flask import Flask, jsonify
+from flask import Blueprint, Flask, jsonify, request, Response, g
 from flask_cors import CORS
-import yfinance as yf
-import pandas as pd
-import peewee as pw
 
 # --- VERİTABANI MODELLERİ ---
 # db_models.py dosyamızdan modelleri import ediyoruz
 try:
-    from db_models import db, Company, Price, create_tables
+    from db_models import db, Price, RefreshSchedule, QuoteBreaker, create_tables, bump_generation
 except ImportError:
     print("HATA: db_models.py bulunamadı.")
     exit(1)
 
+# --- BELLEK İÇİ SNAPSHOT ---
+# /api/bist100/companies cevabı her yazımdan sonra bir kez serileştirilir.
+from snapshot import companies_snapshot, build_companies_delta
+from market import DEFAULT_TOP
+from company_index import CompanyQuery
+from formats import (MEDIA_TYPES, negotiate_format, negotiate_encoding, serialize_payload, columnar,
+                     encode_rows, compress, decode_body)
+from portfolio import MAX_BODY_BYTES as PORTFOLIO_MAX_BODY_BYTES
+from indicators import indicator_store, parse_conditions, FIELDS as INDICATOR_FIELDS
+from risk import risk_store
+from price_frames import build_bist_price_rows
+from leader import refresher_lease, lease_status, LEADER_RETRY_SECONDS
+from cache import TTLCache
+from fetchers import fetch_all_with_deadline, download_in_chunks
+from history import append_history, query_history, compact_history
+from price_writer import price_writer
+from breaker import quote_breakers, STATES as BREAKER_STATES
+from stream import price_broadcaster, event_stream
+from providers import get_provider
+from metrics import (stage_timer, record_upstream_errors, metrics_payload, register_collector,
+                     QuoteAgeCollector, HTTP_REQUEST_SECONDS, HTTP_REQUESTS, DB_CONNECTION_WAIT_SECONDS)
+from derived import DERIVED_INSTRUMENTS, derived_engine
+from scheduler import (RefreshScheduler, AssetClassSchedule, bist_calendar,
+                       fx_hours, metals_hours)
+
 # --- SEMBOL LİSTELERİ (Sadece Arka Plan İçin) ---
 # Bu listeler sadece arka plan thread'inin neleri güncelleyeceğini bilmesi için gerekli.
 try:
@@ -29,325 +53,863 @@ except ImportError:
     BIST100_SYMBOLS = []
 
 # Döviz/Maden sembollerini seed_database.py'den biliyoruz
-COMMODITY_FOREX_SYMBOLS_LIST = [
-    'USDTRY=X', 'EURTRY=X', 'GBPTRY=X', 'GC=F', 'SI=F', 'PL=F', 'EURUSD=X'
-]
-SYNTHETIC_SYMBOLS_LIST = ['GRAMALTIN', 'GRAMGUMUS', 'GRAMPLATIN']
+FX_SYMBOLS_LIST = ['USDTRY=X', 'EURTRY=X', 'GBPTRY=X', 'EURUSD=X']
+METAL_SYMBOLS_LIST = ['GC=F', 'SI=F', 'PL=F']
+COMMODITY_FOREX_SYMBOLS_LIST = FX_SYMBOLS_LIST + METAL_SYMBOLS_LIST
+# Sentetik (türetilmiş) varlıklar derived.py'de formül olarak tanımlı
+SYNTHETIC_SYMBOLS_LIST = [d.symbol for d in DERIVED_INSTRUMENTS]
+# Endeks de arka planda Price tablosuna yazılır (Company kaydı yok, listede görünmez)
+INDEX_SYMBOL = 'XU100.IS'
+INDEX_SYMBOLS_LIST = [INDEX_SYMBOL]
+
+# --- VARLIK SINIFLARI ---
+# Her sınıf kendi temposuyla güncellenir (bkz. scheduler.py).
+# 'bist' parçalı toplu indirme ile, diğerleri fast_info ile tek tek çekilir
+# (her ikisi de aktif sağlayıcı üzerinden, bkz. providers.py).
+ASSET_CLASSES = ('bist', 'index', 'fx', 'metals')
+FAST_INFO_CLASSES = {
+    'index': INDEX_SYMBOLS_LIST,
+    'fx': FX_SYMBOLS_LIST,
+    'metals': METAL_SYMBOLS_LIST,
+}
+# Sembol -> varlık sınıfı (hedefli yeniden denemeler hangi sınıfın çekileceğini bilsin)
+SYMBOL_CLASSES = {s: 'bist' for s in BIST100_SYMBOLS}
+SYMBOL_CLASSES.update({s: name for name, symbols in FAST_INFO_CLASSES.items() for s in symbols})
 
 # --- SABİTLER ---
-ONS_TO_GRAM_DIVISOR = 31.1035
 UPDATE_FREQUENCY_SECONDS = 15 * 60  # 15 dakika
+BIST_REFRESH_SECONDS = UPDATE_FREQUENCY_SECONDS  # Seans içi hisse temposu
+INDEX_REFRESH_SECONDS = 5 * 60                   # Seans içi endeks temposu
+FX_REFRESH_SECONDS = 15 * 60                     # Döviz (7/24'e yakın, hafta sonu kapalı)
+METALS_REFRESH_SECONDS = 15 * 60                 # Ons madenler (COMEX)
+INDEX_CACHE_TTL_SECONDS = 30        # Canlı endeks verisi 30 sn taze sayılır
+INDEX_CACHE_STALE_SECONDS = 5 * 60  # Sonraki 5 dk eski değer dönülür, arkada yenilenir
+HISTORY_COMPACTION_INTERVAL_SECONDS = 24 * 60 * 60  # Geçmiş sıkıştırma günde bir
+FAST_INFO_MAX_WORKERS = 8                # Döviz/maden için eşzamanlı çağrı sayısı
+FAST_INFO_SYMBOL_TIMEOUT_SECONDS = 10    # Tek sembol için en fazla bekleme
+FAST_INFO_CYCLE_DEADLINE_SECONDS = 20    # Tüm döviz/maden aşaması için üst sınır
+BIST_CHUNK_SIZE = 50                     # Hisse indirmesinde parça başına sembol
+BIST_DOWNLOAD_WORKERS = 4                # Aynı anda indirilen parça sayısı
+BIST_DOWNLOAD_RATE_PER_SECOND = 2.0      # Saniyede en fazla kaç parça başlatılsın
+BIST_DOWNLOAD_ATTEMPTS = 3               # Başarısız parça/sembol için tur sayısı
 istanbul_tz = pytz.timezone('Europe/Istanbul')
 
-app = Flask(__name__)
-CORS(app)
+# Tüm endpoint'ler bu blueprint'te; Flask uygulaması create_app() ile kurulur
+api = Blueprint('api', __name__)
 
 # Arka plan thread'i için durdurma olayı
 stop_event = threading.Event()
 
+# /metrics: varlık sınıfı başına en yeni kotasyonun yaşı (scrape anında DB'den)
+register_collector(QuoteAgeCollector({
+    'bist': BIST100_SYMBOLS,
+    **FAST_INFO_CLASSES,
+    'derived': SYNTHETIC_SYMBOLS_LIST,
+}))
+
 # --- VERİTABANI BAĞLANTI YÖNETİMİ ---
-# Flask'ın her API isteğinden önce veritabanını açmasını
-# ve her istekten sonra kapatmasını sağlıyoruz.
-@app.before_request
+# Her istek havuzdan bu thread'e ait bir bağlantı alır ve istek bitince
+# (hata olsa bile) havuza geri verir. Fiziksel bağlantı açık kalır.
+@api.before_app_request
 def before_request():
-    if db.is_closed():
-        db.connect()
+    g.request_start = time.perf_counter()
+    db.connect(reuse_if_open=True)
+    # Havuzdan bağlantı alma (havuz doluysa bekleme) süresi
+    DB_CONNECTION_WAIT_SECONDS.observe(time.perf_counter() - g.request_start)
+
+# --- İSTEK METRİKLERİ ---
+# Etiket olarak URL kuralı kullanılır (/api/history/<symbol>), sembol değil;
+# böylece zaman serisi sayısı endpoint sayısıyla sınırlı kalır.
+@api.after_app_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_SECONDS.labels(endpoint, request.method).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    return response
 
-@app.after_request
-def after_request(response):
+@api.teardown_app_request
+def teardown_request(exc):
     if not db.is_closed():
         db.close()
-    return response
 
-# --- Borsa Saatleri Kontrolü (Değişiklik yok) ---
+# --- Borsa Saatleri Kontrolü ---
+# Hafta sonu, resmi/dini tatiller ve yarım günler scheduler.BistCalendar'da
 def is_market_open(now_istanbul):
-    day_of_week = now_istanbul.weekday() # Pazartesi=0, Pazar=6
-    current_time = now_istanbul.time()
-    if day_of_week >= 5: return False
-    market_open_time = dt_time(10, 0)
-    market_close_time = dt_time(18, 10)
-    return market_open_time <= current_time <= market_close_time
+    return bist_calendar.is_open(now_istanbul)
+
+# --- TEK SEMBOL fast_info ÇEKME ---
+# fetch_all_with_deadline tarafından havuz thread'lerinde çağrılır.
+def fetch_fast_info_row(symbol):
+    return get_provider().fast_quote(symbol)
+
+def load_derived_inputs():
+    # Türetilmiş enstrümanların temel girdilerinin DB'deki son değerleri
+    query = (Price
+             .select(Price.symbol, Price.price, Price.previousClose)
+             .where(Price.symbol.in_(derived_engine.base_symbols))
+             .tuples())
+    return {symbol: (price, prev_close) for symbol, price, prev_close in query}
 
 # --- YENİ: ARKA PLAN FİYAT GÜNCELLEME GÖREVİ ---
 # Bu fonksiyonun TEK GÖREVİ fiyattları çekip 'Price' tablosunu güncellemektir.
 # Artık .info ile Sektör/İsim çekmez!
-def update_prices_task():
-    print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] Arka plan fiyat güncelleme başladı...")
+def update_prices_task(asset_classes=ASSET_CLASSES, only=None):
+    """
+    Verilen varlık sınıflarının fiyatlarını çekip Price tablosuna yazar.
+    Sınıf başına hata mesajını (başarılıysa None) içeren bir dict döndürür;
+    planlayıcı bunu yeniden deneme/geri çekilme için kullanır.
+    only verilirse sadece o semboller çekilir (hedefli yeniden deneme).
+    Devresi açık semboller (bkz. breaker.py) her durumda atlanır.
+    """
+    print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] Arka plan fiyat güncelleme başladı ({', '.join(asset_classes)})...")
     
     # Güncellenecek fiyat verilerini bu listede toplayacağız
     prices_data_list = []
+    errors = {}
+
+    def requested(symbols):
+        if only is not None:
+            symbols = [s for s in symbols if s in only]
+        return quote_breakers.allowed(symbols)
     
     # === 1. BIST100 HİSSELERİNİ ÇEKME (HIZLI YÖNTEM) ===
+    bist_symbols = requested(BIST100_SYMBOLS) if 'bist' in asset_classes else []
     try:
-        if BIST100_SYMBOLS:
-            print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] BIST100 ({len(BIST100_SYMBOLS)} sembol) çekiliyor...")
+        if bist_symbols:
+            print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] BIST100 ({len(bist_symbols)} sembol) çekiliyor...")
             # 2 günlük veri çekiyoruz:
             # iloc[-1] (bugün) -> price, open, high, low, volume
             # iloc[-2] (dün)   -> previousClose
-            data = yf.download(
-                " ".join(BIST100_SYMBOLS),
-                period="2d", # 2 gün yeterli
-                interval="1d", # Günlük veri
-                progress=False,
-                timeout=60
-            )
+            # Evren parçalara bölünüp paralel indirilir; hata veren parça veya sembol
+            # tüm partiyi düşürmez, sadece kendisi yeniden denenir (bkz. fetchers.py)
+            with stage_timer('bist_download'):
+                data, download_errors = download_in_chunks(
+                    bist_symbols,
+                    get_provider().download_history,
+                    chunk_size=BIST_CHUNK_SIZE,
+                    max_workers=BIST_DOWNLOAD_WORKERS,
+                    rate=BIST_DOWNLOAD_RATE_PER_SECOND,
+                    attempts=BIST_DOWNLOAD_ATTEMPTS
+                )
+            record_upstream_errors('bist_download', len(download_errors))
+            if download_errors:
+                print(f"HATA (BIST100 indirme): {len(download_errors)} sembol alınamadı: {', '.join(sorted(download_errors))}")
             
-            if not data.empty and 'Close' in data:
-                # Veriyi daha kolay işlemek için sembol bazlı yeniden düzenle
-                data = data.stack(level=1).rename_axis(['Date', 'Symbol']).reset_index()
-
-                today_data = data[data['Date'] == data['Date'].max()]
-                yesterday_data = data[data['Date'] == data['Date'].min()]
-
-                for symbol in BIST100_SYMBOLS:
-                    today = today_data[today_data['Symbol'] == symbol].iloc[0:1] # Tek satırlık DF
-                    yesterday = yesterday_data[yesterday_data['Symbol'] == symbol].iloc[0:1] # Tek satırlık DF
-
-                    if today.empty:
-                        prices_data_list.append({'symbol': symbol, 'error': 'Bugün verisi yok', 'timestamp': datetime.now()})
-                        continue
-
-                    price_val = today['Close'].values[0] if not today.empty else None
-                    prev_close_val = yesterday['Close'].values[0] if not yesterday.empty else None
-                    
-                    # Eğer bugün fiyat yoksa (örn. tahta kapalı) ama dün varsa, dünkü fiyatı kullan
-                    if pd.isna(price_val) and not pd.isna(prev_close_val):
-                         price_val = prev_close_val
-
-                    if not pd.isna(price_val):
-                        prices_data_list.append({
-                            'symbol': symbol,
-                            'price': price_val,
-                            'previousClose': prev_close_val,
-                            'open': today['Open'].values[0] if not today.empty else None,
-                            'high': today['High'].values[0] if not today.empty else None,
-                            'low': today['Low'].values[0] if not today.empty else None,
-                            'volume': today['Volume'].values[0] if not today.empty else None,
-                            'timestamp': datetime.now(),
-                            'error': None
-                        })
-                    else:
-                        prices_data_list.append({'symbol': symbol, 'error': 'yf.download verisi bulunamadı', 'timestamp': datetime.now()})
-        print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] BIST100 hisse fiyatları çekildi.")
+            # Bugün/dün OHLCV, önceki kapanışa geri düşme ve hata satırları
+            # sütun bazında tek geçişte hesaplanır (bkz. price_frames.py)
+            bist_rows = build_bist_price_rows(data, bist_symbols)
+            if not bist_rows:
+                # Hiç veri dönmedi: istenen her sembol başarısız sayılır
+                bist_rows = [{'symbol': s, 'error': 'yf.download verisi bulunamadı', 'timestamp': datetime.now()}
+                             for s in bist_symbols]
+            quote_breakers.record(bist_rows)
+            prices_data_list.extend(bist_rows)
+            if not any(r.get('price') is not None for r in bist_rows):
+                errors['bist'] = 'Hisse indirmesi hiç fiyat döndürmedi'
+            print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] BIST100 hisse fiyatları çekildi.")
     except Exception as e:
         print(f"HATA (BIST100 yf.download): {e}")
         traceback.print_exc()
-
-    # === 2. DÖVİZ/MADEN ÇEKME (HIZLI YÖNTEM) ===
+        record_upstream_errors('bist_download')
+        errors['bist'] = str(e)
+        quote_breakers.record([{'symbol': s, 'error': str(e)} for s in bist_symbols])
+
+    # === 2. DÖVİZ/MADEN ÇEKME (EŞZAMANLI, SÜRE SINIRLI) ===
+    # Her sembol ayrı bir ağ çağrısı; paralel çalışır ve en yavaşı döngüyü kilitlemez.
+    fast_info_classes = [c for c in FAST_INFO_CLASSES if c in asset_classes]
+    fast_info_symbols = requested([s for c in fast_info_classes for s in FAST_INFO_CLASSES[c]])
     try:
-        if COMMODITY_FOREX_SYMBOLS_LIST:
-            print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] Döviz/Maden ({len(COMMODITY_FOREX_SYMBOLS_LIST)} sembol) çekiliyor...")
-            tickers_comm = yf.Tickers(" ".join(COMMODITY_FOREX_SYMBOLS_LIST))
-            
-            for symbol in COMMODITY_FOREX_SYMBOLS_LIST:
-                try:
-                    info = tickers_comm.tickers[symbol].fast_info
-                    price_val = info.get("lastPrice", info.get("regularMarketPrice"))
-                    if price_val:
-                        prices_data_list.append({
-                            'symbol': symbol,
-                            'price': price_val,
-                            'previousClose': info.get("previousClose", info.get("regularMarketPreviousClose")),
-                            'open': info.get("open", info.get("regularMarketOpen")),
-                            'high': info.get("dayHigh", info.get("regularMarketDayHigh")),
-                            'low': info.get("dayLow", info.get("regularMarketDayLow")),
-                            'volume': info.get("volume", info.get("regularMarketVolume")),
-                            'timestamp': datetime.now(),
-                            'error': None
-                        })
-                    else:
-                        prices_data_list.append({'symbol': symbol, 'error': 'fast_info fiyatı yok', 'timestamp': datetime.now()})
-                except Exception as e:
-                    print(f"HATA ({symbol} fast_info): {e}")
-                    prices_data_list.append({'symbol': symbol, 'error': str(e), 'timestamp': datetime.now()})
-        print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] Döviz/Maden fiyatları çekildi.")
+        if fast_info_symbols:
+            print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] Döviz/Maden/Endeks ({len(fast_info_symbols)} sembol) çekiliyor...")
+            with stage_timer('fx_fetch'):
+                results, fetch_errors = fetch_all_with_deadline(
+                    fast_info_symbols,
+                    fetch_fast_info_row,
+                    max_workers=FAST_INFO_MAX_WORKERS,
+                    per_symbol_timeout=FAST_INFO_SYMBOL_TIMEOUT_SECONDS,
+                    deadline=FAST_INFO_CYCLE_DEADLINE_SECONDS
+                )
+            record_upstream_errors('fast_info', len(fetch_errors))
+            fast_info_rows = []
+            for symbol in fast_info_symbols:
+                if symbol in results:
+                    fast_info_rows.append(results[symbol])
+                else:
+                    print(f"HATA ({symbol} fast_info): {fetch_errors.get(symbol)}")
+                    fast_info_rows.append({'symbol': symbol, 'error': fetch_errors.get(symbol), 'timestamp': datetime.now()})
+            quote_breakers.record(fast_info_rows)
+            prices_data_list.extend(fast_info_rows)
+
+            # Sınıfın istenen hiçbir sembolü fiyat alamadıysa o sınıf başarısız sayılır
+            for asset_class in fast_info_classes:
+                class_symbols = [s for s in FAST_INFO_CLASSES[asset_class] if s in fast_info_symbols]
+                if class_symbols and not any(results.get(s, {}).get('price') is not None for s in class_symbols):
+                    errors[asset_class] = '; '.join(f"{s}: {fetch_errors.get(s, 'fiyat yok')}" for s in class_symbols)
+            print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] Döviz/Maden fiyatları çekildi.")
     except Exception as e:
         print(f"HATA (Döviz/Maden Tickers): {e}")
         traceback.print_exc()
+        record_upstream_errors('fast_info')
+        for asset_class in fast_info_classes:
+            errors[asset_class] = str(e)
+        quote_breakers.record([{'symbol': s, 'error': str(e)} for s in fast_info_symbols])
 
     # === 3. SENTETİK VARLIKLARI HESAPLAMA ===
-    try:
-        # Az önce çektiğimiz güncel verilerden (DB'den değil) hesaplıyoruz
-        usd_try_item = next((p for p in prices_data_list if p["symbol"] == "USDTRY=X" and p.get("price")), None)
-        ons_gold_item = next((p for p in prices_data_list if p["symbol"] == "GC=F" and p.get("price")), None)
-        ons_silver_item = next((p for p in prices_data_list if p["symbol"] == "SI=F" and p.get("price")), None)
-        ons_platinum_item = next((p for p in prices_data_list if p["symbol"] == "PL=F" and p.get("price")), None)
-
-        def calculate_synthetic(base_item, name, symbol):
-            if usd_try_item and base_item:
-                price = (base_item["price"] / ONS_TO_GRAM_DIVISOR) * usd_try_item["price"]
-                prev_close = None
-                if base_item.get("previousClose") and usd_try_item.get("previousClose"):
-                   prev_close = (base_item["previousClose"] / ONS_TO_GRAM_DIVISOR) * usd_try_item["previousClose"]
-                prices_data_list.append({
-                    'symbol': symbol, 'price': price, 'previousClose': prev_close, 'timestamp': datetime.now()
-                })
-        
-        calculate_synthetic(ons_gold_item, "Gram Altın (TL)", "GRAMALTIN")
-        calculate_synthetic(ons_silver_item, "Gram Gümüş (TL)", "GRAMGUMUS")
-        calculate_synthetic(ons_platinum_item, "Gram Platin (TL)", "GRAMPLATIN")
-        
-        print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] Sentetik gram fiyatları hesaplandı.")
-    except Exception as e:
-        print(f"HATA (Sentetik Fiyatlar): {e}")
-        traceback.print_exc()
+    # Gram/sikke altın, çapraz kur ve sepetler kura ve onsa bağlı; ikisinden biri
+    # güncellendiyse sadece girdisi değişen türetilmişler yeniden hesaplanır (bkz. derived.py)
+    if 'fx' in asset_classes or 'metals' in asset_classes:
+        try:
+            with stage_timer('synthetic'):
+                if not derived_engine.loaded:
+                    # Bu döngüde çekilmeyen girdiler (örn. sadece madenler güncellenirken
+                    # USDTRY) DB'deki son değerden gelsin
+                    with db.connection_context():
+                        derived_engine.load(load_derived_inputs())
+
+                quotes = {p['symbol']: (p.get('price'), p.get('previousClose')) for p in prices_data_list}
+                derived = derived_engine.evaluate(quotes)
+            prices_data_list.extend(derived.rows)
+            
+            print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] Sentetik fiyatlar hesaplandı ({len(derived.recomputed)}/{len(derived_engine.derived_symbols)} yeniden hesaplandı).")
+        except Exception as e:
+            print(f"HATA (Sentetik Fiyatlar): {e}")
+            traceback.print_exc()
 
     # === 4. VERİTABANINA TOPLU YAZMA ===
     if prices_data_list:
         try:
-            # Thread güvenliği için bu thread'in kendi bağlantısını aç/kapat yapması en iyisi
-            if db.is_closed(): db.connect()
-            
-            with db.atomic():
-                # Peewee'nin sihirli komutu:
-                # 'symbol' (primary key) eşleşirse GÜNCELLE, eşleşmezse YENİ EKLE.
-                # 'on_conflict' SQLite için 'replace' anlamına gelir.
-                Price.replace_many(prices_data_list).execute()
+            # Bu thread havuzdan kendi bağlantısını alır, iş bitince geri verir
+            with stage_timer('db_write'), db.connection_context(), db.atomic():
+                # Nesil sayacını aynı transaction içinde artır (diğer worker'lar buna bakar)
+                generation = bump_generation()
+
+                # Sadece değeri değişen satırlar UPSERT edilir; değişmeyenlerin
+                # zaman damgası tek bir UPDATE ile tazelenir (bkz. price_writer.py)
+                result = price_writer.write(prices_data_list, generation)
+
+                # Değeri değişen satırlar grafik geçmişine de eklenir (aynı transaction)
+                history_count = append_history(result.changed)
+            price_writer.commit(result)
                 
-            print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] Veritabanı (Price tablosu) {len(prices_data_list)} kayıtla güncellendi.")
+            print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] Veritabanı (Price tablosu) güncellendi: {len(result.changed)} satır yazıldı, {len(result.unchanged)} satır atlandı, {len(result.stale)} satır son geçerli değerle sunuluyor (nesil {generation}, {history_count} geçmiş noktası).")
         except Exception as e:
             print(f"HATA (Veritabanı Yazma): {e}")
             traceback.print_exc()
-        finally:
-            if not db.is_closed(): db.close()
+            # Bellek içi kopya DB ile uyuşmayabilir; sonraki döngü DB'den yüklesin
+            price_writer.reset()
+            for asset_class in asset_classes:
+                errors.setdefault(asset_class, f"DB yazma hatası: {e}")
+            return {c: errors.get(c) for c in asset_classes}
+
+        # Commit başarılı: JSON cevabını şimdi bir kez oluştur. Bu adımların
+        # hatası yazımı geçersiz kılmaz; snapshot bir sonraki istekte get() ile
+        # yeniden denenir.
+        try:
+            with stage_timer('snapshot'), db.connection_context():
+                snap = companies_snapshot.refresh(generation)
+        except Exception as e:
+            print(f"HATA (Snapshot): {e}")
+            traceback.print_exc()
+            snap = None
+        if snap is not None:
+            # Göstergeler sadece en yeni fiyatlarla artımlı güncellenir (bkz. indicators.py)
+            try:
+                with stage_timer('indicators'), db.connection_context():
+                    indicator_store.sync(snap)
+            except Exception as e:
+                print(f"HATA (Göstergeler): {e}")
+                indicator_store.reset()
+            # Korelasyon/volatilite matrisi de aynı şekilde (bkz. risk.py)
+            try:
+                with stage_timer('risk'), db.connection_context():
+                    risk_store.sync(snap)
+            except Exception as e:
+                print(f"HATA (Korelasyon): {e}")
+                risk_store.reset()
+        # Bu süreçteki SSE abonelerine farkı hemen gönder
+        price_broadcaster.notify()
     else:
         print(f"[{datetime.now(istanbul_tz).strftime('%H:%M:%S')}] Güncellenecek fiyat verisi bulunamadı.")
         
-    return True
+    return {c: errors.get(c) for c in asset_classes}
 
 # --- YENİ: BASİTLEŞTİRİLMİŞ ARKA PLAN THREAD'İ ---
 def background_refresher():
-    print("Arka plan fiyat güncelleyici başlatıldı.")
-    
-    # Sunucu başlarken ilk veriyi hemen çekelim
-    # (Thread'in kendi bağlantısını yönetmesi önemli)
-    try:
-        update_prices_task()
-    except Exception as e:
-        print(f"İlk çalıştırmada hata: {e}")
-
-    last_update_time = time.time()
+    # Birden çok gunicorn worker'ı varsa fiyatları SADECE lider günceller.
+    # Diğerleri birkaç saniyede bir kilidi dener; lider ölürse biri devralır.
+    print("Arka plan fiyat güncelleyici başlatıldı (liderlik bekleniyor).")
+    while not stop_event.is_set():
+        try:
+            if refresher_lease.try_acquire():
+                # Biz lider değilken başka bir süreç yazmış olabilir
+                price_writer.reset()
+                derived_engine.reset()
+                quote_breakers.reset()
+                try:
+                    refresh_loop()
+                finally:
+                    refresher_lease.release()
+                continue
+        except Exception as e:
+            # Thread ölürse bu worker bir daha lider olamaz; bekleyip yeniden dene
+            print(f"HATA (Arka plan güncelleyici): {e}")
+            traceback.print_exc()
+        stop_event.wait(LEADER_RETRY_SECONDS)
+
+def build_refresh_scheduler():
+    # Her liderlik döneminde sıfırdan: tüm sınıflar hemen bir kez çalışır
+    return RefreshScheduler([
+        AssetClassSchedule('bist', bist_calendar, BIST_REFRESH_SECONDS),
+        AssetClassSchedule('index', bist_calendar, INDEX_REFRESH_SECONDS),
+        AssetClassSchedule('fx', fx_hours, FX_REFRESH_SECONDS),
+        AssetClassSchedule('metals', metals_hours, METALS_REFRESH_SECONDS),
+    ])
+
+def save_schedule(scheduler):
+    # Planı DB'ye yaz ki her worker /api/status/schedule ile gösterebilsin
+    now = datetime.now(istanbul_tz)
+    rows = [{'asset_class': s['assetClass'], 'status': json.dumps(s), 'updated_at': datetime.now()}
+            for s in scheduler.status(now)]
+    with db.connection_context():
+        RefreshSchedule.replace_many(rows).execute()
+
+def save_breakers():
+    # Devre durumlarını DB'ye yaz ki her worker /api/status/breakers ile gösterebilsin
+    rows = [{'symbol': s['symbol'], 'state': s['state'],
+             'status': json.dumps(dict(s, assetClass=SYMBOL_CLASSES.get(s['symbol']))),
+             'updated_at': datetime.now()}
+            for s in quote_breakers.status()]
+    if rows:
+        with db.connection_context():
+            QuoteBreaker.replace_many(rows).execute()
+
+def retryable_symbols(scheduler, now_istanbul):
+    # Sadece piyasası açık sınıfların sembolleri hedefli olarak yeniden denenir;
+    # kapalı piyasada bir sonraki planlı çalıştırma yeterli
+    open_classes = set(scheduler.open_classes(now_istanbul))
+    return [s for s, c in SYMBOL_CLASSES.items() if c in open_classes]
+
+def refresh_loop():
+    # Sunucu başlarken (veya liderlik alınınca) tüm sınıflar hemen bir kez güncellenir,
+    # sonra her sınıf kendi takvimine göre planlanır.
+    scheduler = build_refresh_scheduler()
+    last_compaction_time = 0
 
     while not stop_event.is_set():
         try:
             now_istanbul = datetime.now(istanbul_tz)
-            if is_market_open(now_istanbul):
-                if time.time() - last_update_time > UPDATE_FREQUENCY_SECONDS:
-                    print(f"[{now_istanbul.strftime('%H:%M:%S')}] [BG] Zamanı geldi, fiyat güncelleme tetikleniyor...")
-                    update_prices_task()
-                    last_update_time = time.time()
+            due = scheduler.due(now_istanbul)
+            if due:
+                print(f"[{now_istanbul.strftime('%H:%M:%S')}] [BG] Zamanı geldi, fiyat güncelleme tetikleniyor: {', '.join(due)}")
+                results = update_prices_task(due)
+                finished = datetime.now(istanbul_tz)
+                for asset_class in due:
+                    scheduler.record(asset_class, finished, results.get(asset_class))
+                save_schedule(scheduler)
+                save_breakers()
+            else:
+                # Tam döngüler arasında sadece zamanı gelmiş başarısız semboller
+                retry = quote_breakers.due(retryable_symbols(scheduler, now_istanbul))
+                if retry:
+                    print(f"[{now_istanbul.strftime('%H:%M:%S')}] [BG] Başarısız semboller yeniden deneniyor: {', '.join(retry)}")
+                    update_prices_task(sorted({SYMBOL_CLASSES[s] for s in retry}), only=set(retry))
+                    save_breakers()
+
+            # Günde bir kez eski tick'leri günlük barlara sıkıştır
+            if time.time() - last_compaction_time > HISTORY_COMPACTION_INTERVAL_SECONDS:
+                with db.connection_context():
+                    bar_count = compact_history()
+                print(f"[{now_istanbul.strftime('%H:%M:%S')}] [BG] Geçmiş sıkıştırıldı: {bar_count} günlük bar.")
+                last_compaction_time = time.time()
             
-            stop_event.wait(60) # 1 dakika bekle
+            # Bir sonraki planlı çalıştırmaya veya yeniden denemeye kadar (en fazla 1 dakika) bekle
+            now_istanbul = datetime.now(istanbul_tz)
+            stop_event.wait(min(scheduler.seconds_until_next(now_istanbul),
+                                quote_breakers.seconds_until_next(retryable_symbols(scheduler, now_istanbul))))
         except Exception as e:
             print(f"Arka plan yenileyici hatası: {e}")
             traceback.print_exc()
             stop_event.wait(300) # Hata durumunda 5dk bekle
 
-# --- Flask Endpoint: BIST100 (Değişiklik yok, bu zaten hızlı) ---
-@app.route('/api/bist100')
+# --- Flask Endpoint: Arka plan liderlik durumu ---
+# Hangi worker'ın fiyatları güncellediğini ve son kalp atışını gösterir.
+@api.route('/api/status/refresher')
+def get_refresher_status():
+    try:
+        return jsonify(lease_status(refresher_lease))
+    except Exception as e:
+        print(f"HATA (/api/status/refresher): {e}")
+        return jsonify({"error": "Liderlik durumu okunamadı.", "details": str(e)}), 500
+
+# --- Flask Endpoint: Canlı Fiyat Akışı (Server-Sent Events) ---
+# /api/stream/prices?symbols=THYAO.IS,USDTRY=X
+# Her commit edilen güncellemeden sonra sadece değişen semboller 'prices' olayı
+# olarak gönderilir. Kopan bağlantı Last-Event-ID ile kaldığı yerden devam eder.
+# Çok sayıda açık bağlantı için gunicorn'u gevent worker ile çalıştırın (-k gevent).
+@api.route('/api/stream/prices')
+def stream_prices():
+    symbols = [s.strip() for s in request.args.get('symbols', '').split(',') if s.strip()]
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is None:
+        last_event_id = request.args.get('since', type=int)
+
+    response = Response(event_stream(price_broadcaster, symbols or None, last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Proxy tamponlamasın
+    return response
+
+# --- Flask Endpoint: Piyasa özeti ---
+# Yükselen/düşenler, genişlik ve sektör/tür ortalamaları snapshot ile birlikte
+# bir kez hesaplanır; burada sadece hazır (ve önbelleğe alınmış) byte'lar döner.
+@api.route('/api/market/summary')
+def get_market_summary():
+    try:
+        top = request.args.get('top', default=DEFAULT_TOP, type=int)
+        sector = request.args.get('sector') or None
+        asset_type = request.args.get('type') or None
+        snap = companies_snapshot.get()
+        body = snap.market_body(top, sector, asset_type)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"HATA (/api/market/summary): {e}")
+        return jsonify({"error": "Piyasa özeti oluşturulamadı.", "details": str(e)}), 500
+
+    response = Response(body, mimetype='application/json')
+    # Aynı nesil + aynı filtre = aynı gövde
+    response.set_etag(f"{snap.etag}-t{top}-s{sector or ''}-y{asset_type or ''}")
+    response.headers['X-Data-Revision'] = str(snap.generation)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# --- Flask Endpoint: Prometheus metrikleri ---
+# Çok worker'lı kurulumda tüm worker'ların toplamı döner (bkz. metrics.py).
+@api.route('/metrics')
+def get_metrics():
+    body, content_type = metrics_payload()
+    return Response(body, content_type=content_type)
+
+# --- Flask Endpoint: Güncelleme planı ---
+# Varlık sınıfı başına işlem saatleri, tempo ve bir sonraki planlı çalıştırma.
+@api.route('/api/status/schedule')
+def get_refresh_schedule():
+    try:
+        rows = RefreshSchedule.select().order_by(RefreshSchedule.asset_class)
+        return jsonify([dict(json.loads(r.status), updatedAt=r.updated_at.isoformat()) for r in rows])
+    except Exception as e:
+        print(f"HATA (/api/status/schedule): {e}")
+        return jsonify({"error": "Plan okunamadı.", "details": str(e)}), 500
+
+# --- Flask Endpoint: Sembol devre kesicileri ---
+# /api/status/breakers?state=open,retrying&type=fx
+# Hangi sembollerin hata verdiğini, devresi açık olanları ve son geçerli
+# değerin yaşını (ageSeconds, istek anında) gösterir. Özet tüm sembolleri sayar.
+@api.route('/api/status/breakers')
+def get_breaker_status():
+    states = {s.strip() for s in request.args.get('state', '').split(',') if s.strip()}
+    unknown = states - set(BREAKER_STATES)
+    if unknown:
+        return jsonify({"error": f"Geçersiz durum: {', '.join(sorted(unknown))} (geçerli: {', '.join(BREAKER_STATES)})"}), 400
+    asset_class = request.args.get('type') or None
+    try:
+        last_good = dict(Price
+                         .select(Price.symbol, Price.timestamp)
+                         .where(Price.price.is_null(False))
+                         .tuples())
+        now = datetime.now()
+        summary = {state: 0 for state in BREAKER_STATES}
+        degraded = {}
+        symbols = []
+        for row in QuoteBreaker.select().order_by(QuoteBreaker.symbol):
+            status = json.loads(row.status)
+            # Soğuması kayıttan sonra dolmuş olabilir
+            if status['state'] == 'open' and datetime.fromisoformat(status['nextAttempt']) <= now:
+                status['state'] = 'half-open'
+            summary[status['state']] += 1
+            if status['state'] != 'closed':
+                degraded[status['assetClass']] = degraded.get(status['assetClass'], 0) + 1
+            if (states and status['state'] not in states) or (asset_class and status['assetClass'] != asset_class):
+                continue
+            ts = last_good.get(row.symbol)
+            status.update(lastGood=ts.isoformat() if ts else None,
+                          ageSeconds=round((now - ts).total_seconds()) if ts else None,
+                          updatedAt=row.updated_at.isoformat())
+            symbols.append(status)
+        return jsonify({"summary": summary, "degraded": degraded, "symbols": symbols})
+    except Exception as e:
+        print(f"HATA (/api/status/breakers): {e}")
+        return jsonify({"error": "Devre durumu okunamadı.", "details": str(e)}), 500
+
+# --- Flask Endpoint: Teknik göstergeler ---
+# Göstergeler her güncelleme döngüsünde en yeni fiyatla artımlı güncellenir;
+# burada sadece hazır tablo okunur ve cevap nesil başına bir kez serileştirilir.
+@api.route('/api/indicators/<symbol>')
+def get_indicators(symbol):
+    try:
+        snap = companies_snapshot.get()
+        table = indicator_store.sync(snap)
+        if table.row(symbol) is None:
+            return jsonify({"error": f"Bilinmeyen sembol: {symbol}"}), 404
+        body = indicator_store.body((snap.generation, 'symbol', symbol),
+                                    lambda: serialize_payload(dict(table.row(symbol), revision=snap.generation)))
+    except Exception as e:
+        print(f"HATA (/api/indicators/{symbol}): {e}")
+        return jsonify({"error": "Göstergeler hesaplanamadı.", "details": str(e)}), 500
+    return cached_view_response(body, snap, ('symbol', symbol))
+
+# /api/indicators/screener?where=rsi14<30&type=hisse&sort=rsi14&limit=20
+# where: virgülle ayrılmış koşullar; sağ taraf sayı veya başka bir gösterge (close>sma50).
+# type/sector: companies snapshot'ının indeksleriyle süzülür.
+@api.route('/api/indicators/screener')
+def get_indicator_screener():
+    try:
+        conditions = parse_conditions(request.args.get('where'))
+        types = [t for t in request.args.get('type', '').split(',') if t]
+        sectors = [t for t in request.args.get('sector', '').split(',') if t]
+        sort = request.args.get('sort') or None
+        descending = bool(sort) and sort.startswith('-')
+        if sort is not None:
+            sort = sort.lstrip('-')
+            if sort not in INDICATOR_FIELDS:
+                raise ValueError(f"Bilinmeyen sıralama alanı: {sort}")
+        limit = request.args.get('limit', default=100, type=int)
+        if not 1 <= limit <= 1000:
+            raise ValueError("limit 1 ile 1000 arasında olmalı")
+
+        snap = companies_snapshot.get()
+        table = indicator_store.sync(snap)
+        key = (snap.generation, 'screener', tuple(conditions), tuple(sorted(types)), tuple(sorted(sectors)),
+               sort, descending, limit)
+
+        def build():
+            symbols = None
+            if types or sectors:
+                query = CompanyQuery(types=tuple(types) or None, sectors=tuple(sectors) or None, fields=('symbol',))
+                symbols = [row['symbol'] for row in snap.index.query(query).rows]
+            results = table.screen(conditions, symbols, sort=sort, descending=descending, limit=limit)
+            return serialize_payload({
+                "where": [f"{f}{op}{rhs}" for f, op, rhs in conditions],
+                "type": types or None, "sector": sectors or None,
+                "count": len(results), "results": results, "revision": snap.generation,
+            })
+        body = indicator_store.body(key, build)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"HATA (/api/indicators/screener): {e}")
+        return jsonify({"error": "Tarama yapılamadı.", "details": str(e)}), 500
+    return cached_view_response(body, snap, key[1:])
+
+# --- Flask Endpoint: Korelasyon ve volatilite ---
+# Kayan pencereli getiri korelasyonu; matris her döngüde artımlı güncellenir (bkz. risk.py).
+# /api/risk/correlation                 -> tüm matris
+# /api/risk/correlation?sector=bankacilik (veya type=, symbols=) -> alt blok + blok ortalaması
+@api.route('/api/risk/correlation')
+def get_correlation_matrix():
+    try:
+        query = CompanyQuery.from_args({name: request.args.get(name) for name in ('type', 'sector', 'symbols')})
+        snap = companies_snapshot.get()
+        matrix = risk_store.sync(snap)
+        key = (snap.generation, 'block', query.types, query.sectors, query.symbols)
+
+        def build():
+            symbols = None
+            if query.types or query.sectors or query.symbols:
+                query.fields = ('symbol',)
+                symbols = [row['symbol'] for row in snap.index.query(query).rows]
+            return serialize_payload(dict(matrix.block(symbols), revision=snap.generation))
+        body = risk_store.body(key, build)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"HATA (/api/risk/correlation): {e}")
+        return jsonify({"error": "Korelasyon matrisi hesaplanamadı.", "details": str(e)}), 500
+    return cached_view_response(body, snap, key[1:])
+
+# /api/risk/correlation/<symbol>?top=10 -> en çok / en az korele semboller
+@api.route('/api/risk/correlation/<symbol>')
+def get_symbol_correlation(symbol):
+    try:
+        top = request.args.get('top', default=10, type=int)
+        if not 1 <= top <= 100:
+            raise ValueError("top 1 ile 100 arasında olmalı")
+        snap = companies_snapshot.get()
+        matrix = risk_store.sync(snap)
+        if symbol not in matrix.position:
+            return jsonify({"error": f"Bilinmeyen sembol: {symbol}"}), 404
+        key = (snap.generation, 'row', symbol, top)
+        body = risk_store.body(key, lambda: serialize_payload(dict(matrix.row(symbol, top), revision=snap.generation)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"HATA (/api/risk/correlation/{symbol}): {e}")
+        return jsonify({"error": "Korelasyon hesaplanamadı.", "details": str(e)}), 500
+    return cached_view_response(body, snap, key[1:])
+
+def cached_view_response(body, snap, key):
+    response = Response(body, mimetype='application/json')
+    response.set_etag(f"{snap.etag}-i{hashlib.sha1(repr(key).encode()).hexdigest()[:12]}")
+    response.headers['X-Data-Revision'] = str(snap.generation)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# --- Flask Endpoint: Toplu portföy değerlemesi ---
+# POST /api/portfolio/valuation
+#   {"portfolios": [{"id": "u1", "holdings": {"THYAO.IS": 100, "GRAMALTIN": 12.5, "USDTRY=X": 1000}}, ...]}
+# Gövde JSON veya MessagePack (Content-Type: application/msgpack) olabilir; cevap
+# biçimi ve sıkıştırması companies ile aynı şekilde seçilir. Portföy başına TL/USD
+# değer, önceki kapanışa göre günlük K/Z ve varlık sınıfı kırılımı döner; tüm
+# pozisyonlar güncel snapshot'a karşı tek vektör işlemiyle değerlenir (bkz. portfolio.py).
+@api.route('/api/portfolio/valuation', methods=['POST'])
+def value_portfolios():
+    if request.content_length is not None and request.content_length > PORTFOLIO_MAX_BODY_BYTES:
+        return jsonify({"error": f"Gövde en fazla {PORTFOLIO_MAX_BODY_BYTES} byte olabilir"}), 413
+    try:
+        fmt = negotiate_format(request)
+        encoding = negotiate_encoding(request)
+        data = decode_body(request)
+        if not isinstance(data, dict):
+            raise ValueError("Gövde {\"portfolios\": [...]} biçiminde olmalı")
+        snap = companies_snapshot.get()
+        result = dict(snap.pricer.value(data.get('portfolios')), revision=snap.generation)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"HATA (/api/portfolio/valuation): {e}")
+        traceback.print_exc()
+        return jsonify({"error": "Portföyler değerlenemedi.", "details": str(e)}), 500
+
+    if fmt == 'columnar':
+        body = serialize_payload(dict(result, portfolios=columnar(result['portfolios'])))
+    else:
+        body = encode_rows(result, fmt)
+    body, used = compress(body, encoding)
+    response = Response(body, content_type=MEDIA_TYPES[fmt])
+    if used != 'identity':
+        response.headers['Content-Encoding'] = used
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    response.headers['X-Data-Revision'] = str(snap.generation)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# --- Flask Endpoint: Fiyat Geçmişi ---
+# /api/history/<symbol>?range=1y&resolution=1d
+# Çözünürlük verilmezse aralığa göre birkaç yüz noktayı geçmeyecek şekilde seçilir.
+@api.route('/api/history/<symbol>')
+def get_price_history(symbol):
+    try:
+        data = query_history(
+            symbol,
+            range_name=request.args.get('range', '1mo'),
+            resolution=request.args.get('resolution')
+        )
+        return jsonify(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"HATA (/api/history/{symbol}): {e}")
+        traceback.print_exc()
+        return jsonify({"error": "Geçmiş verisi okunamadı.", "details": str(e)}), 500
+
+# --- Flask Endpoint: BIST100 Endeksi ---
+# Önce arka plan thread'inin Price tablosuna yazdığı XU100 satırı okunur (yerel okuma).
+# Satır yoksa veya borsa açıkken bir güncelleme döngüsünden eskiyse canlı veri
+# önbellek üzerinden çekilir: eşzamanlı istekler tek upstream çağrısını paylaşır,
+# süresi geçen değer hemen dönülüp arka planda yenilenir.
+index_cache = TTLCache(ttl=INDEX_CACHE_TTL_SECONDS, stale_ttl=INDEX_CACHE_STALE_SECONDS)
+
+def fetch_index_quote_live():
+    try:
+        data = get_provider().index_quote(INDEX_SYMBOL)
+    except Exception:
+        record_upstream_errors('index_live')
+        raise
+    if data["marketState"] == "UNKNOWN" and data["regularMarketPrice"] is not None:
+         now_ist = datetime.now(istanbul_tz)
+         data["marketState"] = "REGULAR" if is_market_open(now_ist) else "CLOSED"
+    return data
+
+def read_index_quote_from_db():
+    row = Price.get_or_none(Price.symbol == INDEX_SYMBOL)
+    if row is None or row.price is None or row.error:
+        return None
+
+    market_open = is_market_open(datetime.now(istanbul_tz))
+    age = (datetime.now() - row.timestamp).total_seconds()
+    if market_open and age > 2 * UPDATE_FREQUENCY_SECONDS:
+        return None # Arka plan güncellemesi gecikmiş, canlıya düş
+
+    return {
+        "symbol": INDEX_SYMBOL,
+        "shortName": "BIST 100",
+        "regularMarketPrice": row.price,
+        "regularMarketOpen": row.open,
+        "regularMarketDayHigh": row.high,
+        "regularMarketDayLow": row.low,
+        "regularMarketPreviousClose": row.previousClose,
+        "marketState": "REGULAR" if market_open else "CLOSED",
+        "timestamp": row.timestamp.isoformat()
+    }
+
+@api.route('/api/bist100')
 def get_bist100_index():
     try:
-        ticker = yf.Ticker("XU100.IS")
-        info = ticker.fast_info
-        data = {
-            "symbol": info.get("symbol", "XU100.IS"),
-            "shortName": info.get("shortName", "BIST 100"),
-            "regularMarketPrice": info.get("lastPrice"),
-            "regularMarketOpen": info.get("open"),
-            "regularMarketDayHigh": info.get("dayHigh"),
-            "regularMarketDayLow": info.get("dayLow"),
-            "regularMarketPreviousClose": info.get("previousClose"),
-            "marketState": info.get("marketState", "UNKNOWN")
-        }
-        if data["marketState"] == "UNKNOWN" and data["regularMarketPrice"] is not None:
-             now_ist = datetime.now(istanbul_tz)
-             data["marketState"] = "REGULAR" if is_market_open(now_ist) else "CLOSED"
+        data = read_index_quote_from_db()
+        if data is None:
+            data = index_cache.get(INDEX_SYMBOL, fetch_index_quote_live)
         return jsonify(data)
     except Exception as e:
         print(f"yfinance hatası (XU100.IS): {e}")
         return jsonify({"error": "Endeks verisi çekilemedi.", "symbol": "XU100.IS", "shortName": "BIST 100", "price": None}), 500
 
 # --- YENİ: IŞIK HIZINDA API ENDPOINT ---
-# Artık cache, lock, event, bekleme, timeout HİÇBİRİ YOK!
-@app.route('/api/bist100/companies')
+# JOIN + serileştirme artık istek başına değil, veri değiştiğinde bir kez yapılıyor.
+# Cevap bellekteki hazır byte'lardan döner; If-None-Match eşleşirse 304 döner.
+# ?since=<revision> verilirse sadece o revizyondan sonra değişen satırlar döner.
+# type=, sector=, symbols= (virgülle ayrılmış), fields=, sort=[-]alan, limit= ve
+# cursor= verilirse cevap snapshot'ın bellek içi indekslerinden hazırlanır; toplam
+# satır sayısı X-Total-Count, sonraki sayfa X-Next-Cursor başlığında döner.
+# Accept / ?format= ile columnar JSON veya MessagePack, Accept-Encoding ile
+# gzip/brotli seçilebilir; kodlanmış gövdeler de snapshot başına bir kez hazırlanır.
+@api.route('/api/bist100/companies')
 def get_bist100_companies():
     try:
-        # Tek yapmamız gereken veritabanından okumak.
-        # Peewee'nin JOIN sorgusu: Company ve Price tablolarını birleştir.
-        
-        # Company tablosunu seç, Price tablosunu da "LEFT JOIN" ile bağla.
-        # (LEFT_OUTER: Company'de olan ama Price'ta henüz olmayanları da getirir)
-        query = (Company
-                 .select(Company, Price) # İki tablodan da verileri al
-                 .join(Price, pw.JOIN.LEFT_OUTER, on=(Company.symbol == Price.symbol))
-                )
-
-        results_list = []
-        for company in query:
-            # Temel (Statik) veriler
-            data = {
-                "symbol": company.symbol,
-                "name": company.name,
-                "type": company.type,
-                "sector": company.sector,
-            }
-            
-            # Fiyat (Dinamik) verileri
-            # (company.price.symbol_id kontrolü, Price verisinin olup olmadığını kontrol eder)
-            if hasattr(company, 'price') and company.price.symbol_id is not None:
-                data.update({
-                    "price": company.price.price,
-                    "previousClose": company.price.previousClose,
-                    "open": company.price.open,
-                    "high": company.price.high,
-                    "low": company.price.low,
-                    "volume": company.price.volume,
-                    "timestamp": company.price.timestamp.isoformat() if company.price.timestamp else None,
-                    "error": company.price.error
-                })
-            else:
-                # Price tablosunda henüz verisi yoksa (örn. seed'den sonra ilk fetch bekleniyorsa)
-                 data.update({
-                    "price": None,
-                    "previousClose": None,
-                    "open": None, "high": None, "low": None, "volume": None,
-                    "timestamp": None,
-                    "error": "Henüz fiyat verisi alınmadı."
-                })
-            
-            results_list.append(data)
-
-        # Hızlıca JSON döndür
-        return jsonify(results_list)
-
+        since = request.args.get('since', type=int)
+        if since is not None:
+            return jsonify(build_companies_delta(since))
+
+        snap = companies_snapshot.get()
+        # Biçim (json/columnar/msgpack) ve sıkıştırma (br/gzip); bkz. formats.py
+        fmt = negotiate_format(request)
+        encoding = negotiate_encoding(request)
+
+        if any(name in request.args for name in CompanyQuery.PARAMS):
+            return companies_query_response(snap, fmt, encoding)
+
+        body, used = snap.encoded_body(fmt, encoding)
+        response = encoded_response(body, fmt, used, snap.etag)
+        # İstemci bir sonraki delta isteğinde bunu ?since= olarak kullanabilir
+        response.headers['X-Data-Revision'] = str(snap.generation)
+        # İstemci her seferinde ETag ile doğrulasın (veri 15 dk'da bir değişebilir)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"HATA (/api/bist100/companies): {e}")
         traceback.print_exc()
         return jsonify({"error": "Veritabanı sorgusunda hata oluştu.", "details": str(e)}), 500
 
-# app.py dosyasının EN ALTI
-
-# --- Uygulama Başlangıcı ---
-# ESKİ KODU SİLİN (if __name__ == '__main__': bloğunun tamamını)
-
-# YENİ KOD:
-# Gunicorn veya başka bir WSGI sunucusu çalıştırıldığında 
-# 'app' değişkenini bulabilmesi için bu kadarını bırakmak yeterlidir.
-
-# Sunucu başlamadan önce veritabanı tablolarının varlığını kontrol et
-# Bu, 'seed' adımının atlanıp atlanmadığını anlamak için iyi bir güvencedir.
-if not db.table_exists('company') or not db.table_exists('price'):
-    print("="*50)
-    print("HATA: 'company' veya 'price' tablosu bulunamadı.")
-    print("Lütfen önce veritabanını 'Build Command' ile oluşturduğunuzdan emin olun.")
-    print("Render Build Command: pip install -r requirements.txt && python seed_database.py")
-    print("="*50)
+def encoded_response(body, fmt, encoding, etag):
+    response = Response(body, content_type=MEDIA_TYPES[fmt])
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    # Her temsilin kendi ETag'i olmalı; düz JSON eski ETag'ini korur
+    if (fmt, encoding) != ('json', 'identity'):
+        etag = f"{etag}-{fmt}-{encoding}"
+    response.set_etag(etag)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
 
-# Arka plan thread'ini başlat (Flask debug modu çift çalıştırmasın diye kontrol)
-if not os.environ.get("WERKZEUG_RUN_MAIN"):
-     print("Arka plan fiyat güncelleyici thread başlatılıyor...")
-     background_thread = threading.Thread(target=background_refresher, daemon=True)
-     background_thread.start()
+def companies_query_response(snap, fmt, encoding):
+    # Geçersiz parametrede ValueError (400)
+    query = CompanyQuery.from_args(request.args)
+    body, used, total, next_cursor = snap.query_body(query, fmt, encoding)
+
+    # Aynı nesil + aynı normalize sorgu = aynı gövde
+    response = encoded_response(body, fmt, used,
+                                f"{snap.etag}-q{hashlib.sha1(repr(query.key).encode()).hexdigest()[:12]}")
+    response.headers['X-Data-Revision'] = str(snap.generation)
+    response.headers['X-Total-Count'] = str(total)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# --- UYGULAMA FABRİKASI VE BAŞLATMA ---
+# app.py'yi import etmek yan etkisizdir: DB'ye dokunmaz, thread başlatmaz,
+# pandas/yfinance yüklemez. Bu sayede gunicorn --preload güvenlidir (fork'tan önce
+# açık bağlantı veya thread kalmaz) ve worker'lar hızlı açılır. Başlatma adımları
+# açıkça çağrılır; gunicorn'da gunicorn.conf.py kancaları, geliştirmede
+# `python app.py` bunu yapar:
+#   - warm_snapshot(): ilk snapshot DB'den hazırlanır, ilk istek bellekten döner
+#   - start_background_work(): fiyat güncelleyici thread (fork'tan SONRA, worker içinde)
+
+def create_app():
+    """
+    Flask uygulamasını kurar (yan etkisiz; test ve benchmark'lar da kullanır).
+    """
+    flask_app = Flask(__name__)
+    CORS(flask_app)
+    flask_app.register_blueprint(api)
+    return flask_app
+
+def check_database():
+    """
+    Tabloların varlığını kontrol eder, eski şemaları günceller.
+    Tohumlama yapılmamışsa False döner.
+    """
+    # Bu, 'seed' adımının atlanıp atlanmadığını anlamak için iyi bir güvencedir.
+    with db.connection_context():
+        ready = db.table_exists('company') and db.table_exists('price')
+    if not ready:
+        print("="*50)
+        print("HATA: 'company' veya 'price' tablosu bulunamadı.")
+        print("Lütfen önce veritabanını 'Build Command' ile oluşturduğunuzdan emin olun.")
+        print("Render Build Command: pip install -r requirements.txt && python seed_database.py")
+        print("="*50)
+        return False
+    # Eski veritabanlarında yeni tablo/kolonlar olmayabilir
+    create_tables()
+    return True
 
-print("Flask uygulaması (app) Gunicorn için hazır.")
-print(f"Flask sunucusu http://127.0.0.1:5000 adresinde başlatılıyor...") # Bu log Gunicorn'da farklı görünebilir
+def warm_snapshot():
+    """
+    Süreçte güncel bir snapshot yoksa DB'den hazırlar. --preload ile master'da
+    hazırlanan snapshot fork ile worker'lara kopyalanır; hâlâ güncelse yeniden
+    oluşturulmaz. Açık bağlantı bırakmaz (fork'tan önce çağrılabilir).
+    """
+    try:
+        if not check_database():
+            return None
+        with db.connection_context():
+            snap = companies_snapshot.get()
+        print(f"Başlangıç snapshot'ı hazır (nesil {snap.generation}, {len(snap.payload)} satır).")
+        return snap
+    except Exception as e:
+        print(f"UYARI: Başlangıç snapshot'ı hazırlanamadı: {e}")
+        return None
+    finally:
+        db.close_all()
+
+_background_thread = None
+
+def start_background_work():
+    """
+    Arka plan fiyat güncelleyici thread'ini (süreç başına bir kez) başlatır.
+    Fork'tan sonra, worker sürecinde çağrılmalıdır.
+    """
+    global _background_thread
+    if _background_thread is not None and _background_thread.is_alive():
+        return _background_thread
+    print("Arka plan fiyat güncelleyici thread başlatılıyor...")
+    _background_thread = threading.Thread(target=background_refresher, name='price-refresher', daemon=True)
+    _background_thread.start()
+    return _background_thread
+
+def init_worker():
+    """
+    Worker süreci başlatması (gunicorn post_worker_init kancası).
+    """
+    warm_snapshot()
+    start_background_work()
+
+# Gunicorn 'app:app' ile bu nesneyi bulur
+app = create_app()
+
+if __name__ == '__main__':
+    init_worker()
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,379 @@
+# backfill.py
+# Geçmiş günlük OHLCV barlarını (yıllarca) PriceHistory tablosuna yükler.
+#
+# Arka plan güncelleyicisi sadece o anki fiyatı 'tick' olarak ekler; grafikler
+# için gereken yıllık geçmiş buradan gelir:
+#   - Geçmiş, (sembol, tarih aralığı) parçaları halinde sınırlı bir thread
+#     havuzunda indirilir (token bucket + üstel geri çekilme).
+#   - Tamamlanan parçalar büyük transaction'larda executemany ile yazılır;
+#     her parçanın aralığı barlarıyla aynı transaction'da HistoryCoverage
+#     tablosuna kaydedilir. Kayıtlı aralıklar tekrar indirilmez, yani yarıda
+#     kesilen bir yükleme aynı komutla kaldığı yerden devam eder.
+#   - export/import: geçmiş Parquet veya CSV dosyasına yazılır / okunur; yeni bir
+#     kurulum yeniden indirmek yerine yerel dosyadan saniyeler içinde yüklenir.
+#
+# Kullanım:
+#   python backfill.py download --start 2015-01-01
+#   python backfill.py download --symbols THYAO.IS GARAN.IS --chunk-days 180
+#   python backfill.py export history.parquet
+#   python backfill.py import history.parquet
+#   python backfill.py status
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+from peewee import fn
+
+from db_models import db, Company, PriceHistory, HistoryCoverage, create_tables
+from derived import DERIVED_INSTRUMENTS
+from providers import PROVIDERS, OHLCV_FIELDS, get_provider, set_provider
+from ratelimit import TokenBucket, retry_with_backoff
+
+BACKFILL_YEARS = 10            # --start verilmezse kaç yıl geriye gidilsin
+BACKFILL_CHUNK_DAYS = 365      # Tek istekte istenen en uzun tarih aralığı
+BACKFILL_WORKERS = 4           # Aynı anda en fazla kaç geçmiş isteği
+BACKFILL_RATE_PER_SECOND = 2.0 # Upstream'e saniyede en fazla kaç istek
+BACKFILL_ATTEMPTS = 3          # Başarısız parça kaç kez denensin
+BACKFILL_FLUSH_TASKS = 50      # Kaç tamamlanan parça bir transaction'da yazılsın
+IMPORT_BATCH_ROWS = 50_000     # İçe aktarmada executemany başına satır
+
+# Dosyadaki / tablodaki sütunlar (PriceHistory alan sırası)
+HISTORY_COLUMNS = ('symbol', 'timestamp', 'interval', 'open', 'high', 'low', 'close', 'volume')
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'  # peewee DateTimeField'ın SQLite'taki metin biçimi
+
+
+def _insert_sql():
+    table = PriceHistory._meta.table_name
+    columns = ', '.join(f'"{c}"' for c in HISTORY_COLUMNS)
+    placeholders = ', '.join('?' for _ in HISTORY_COLUMNS)
+    # Aynı (sembol, gün) için upstream barı, sıkıştırmadan oluşan barın yerine geçer
+    return f'INSERT OR REPLACE INTO "{table}" ({columns}) VALUES ({placeholders})'
+
+
+def default_symbols():
+    """
+    Company tablosundaki tüm semboller (türetilmişler hariç; onların upstream'i yok).
+    """
+    derived = {d.symbol for d in DERIVED_INSTRUMENTS}
+    with db.connection_context():
+        return [s for (s,) in Company.select(Company.symbol).order_by(Company.symbol).tuples()
+                if s not in derived]
+
+
+def load_coverage(symbols):
+    """
+    symbol -> tamamlanmış [start, end) aralıkları (başlangıca göre sıralı).
+    """
+    coverage = {s: [] for s in symbols}
+    query = (HistoryCoverage
+             .select(HistoryCoverage.symbol, HistoryCoverage.start, HistoryCoverage.end)
+             .where(HistoryCoverage.symbol.in_(list(symbols)))
+             .order_by(HistoryCoverage.symbol, HistoryCoverage.start)
+             .tuples())
+    for symbol, start, end in query:
+        coverage[symbol].append((start, end))
+    return coverage
+
+
+def missing_ranges(covered, start, end):
+    """
+    [start, end) aralığının, sıralı 'covered' aralıklarının dışında kalan parçaları.
+    """
+    gaps = []
+    cursor = start
+    for c_start, c_end in covered:
+        if c_end <= cursor:
+            continue
+        if c_start >= end:
+            break
+        if c_start > cursor:
+            gaps.append((cursor, c_start))
+        cursor = max(cursor, c_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def split_range(start, end, days):
+    """
+    [start, end) aralığını en fazla 'days' günlük parçalara böler.
+    """
+    pieces = []
+    while start < end:
+        piece_end = min(end, start + timedelta(days=days))
+        pieces.append((start, piece_end))
+        start = piece_end
+    return pieces
+
+
+def plan_backfill(symbols, start, end, chunk_days=BACKFILL_CHUNK_DAYS):
+    """
+    İndirilmesi gereken (symbol, start, end) parçaları; kayıtlı aralıklar atlanır.
+    """
+    coverage = load_coverage(symbols)
+    tasks = []
+    for symbol in symbols:
+        for gap_start, gap_end in missing_ranges(coverage[symbol], start, end):
+            tasks.extend((symbol, s, e) for s, e in split_range(gap_start, gap_end, chunk_days))
+    return tasks
+
+
+def frame_to_rows(symbol, frame):
+    """
+    Günlük OHLCV tablosunu executemany için satır tuple'larına çevirir (NaN -> None).
+    """
+    if frame is None or frame.empty:
+        return []
+    frame = frame[OHLCV_FIELDS]
+    stamps = pd.DatetimeIndex(frame.index).normalize().strftime(_TIMESTAMP_FORMAT)
+    rows = []
+    for ts, (o, h, l, c, v) in zip(stamps, frame.itertuples(index=False, name=None)):
+        if c != c:  # Kapanışı olmayan bar yazılmaz
+            continue
+        rows.append((symbol, ts, '1d',
+                     None if o != o else float(o), None if h != h else float(h),
+                     None if l != l else float(l), float(c), None if v != v else int(v)))
+    return rows
+
+
+def write_bars(rows, covered=()):
+    """
+    Barları ve tamamlanan aralıkları tek transaction'da yazar.
+    covered: (symbol, start, end) listesi. Açık bir bağlantı içinde çağrılmalıdır.
+    """
+    now = datetime.now()
+    with db.atomic():
+        if rows:
+            db.connection().executemany(_insert_sql(), rows)
+        if covered:
+            (HistoryCoverage
+             .insert_many([{'symbol': s, 'start': a, 'end': b, 'updated_at': now} for s, a, b in covered])
+             .on_conflict_replace()
+             .execute())
+
+
+def coalesce_coverage(symbols):
+    """
+    Sembollerin bitişik/örtüşen aralıklarını birleştirir ki tablo küçük kalsın.
+    Açık bir bağlantı içinde çağrılmalıdır.
+    """
+    coverage = load_coverage(symbols)
+    with db.atomic():
+        for symbol, ranges in coverage.items():
+            merged = []
+            for start, end in ranges:
+                if merged and start <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+                else:
+                    merged.append((start, end))
+            if len(merged) == len(ranges):
+                continue
+            HistoryCoverage.delete().where(HistoryCoverage.symbol == symbol).execute()
+            write_bars([], [(symbol, s, e) for s, e in merged])
+
+
+def backfill(symbols, start, end, chunk_days=BACKFILL_CHUNK_DAYS, workers=BACKFILL_WORKERS,
+             rate=BACKFILL_RATE_PER_SECOND, attempts=BACKFILL_ATTEMPTS, flush_tasks=BACKFILL_FLUSH_TASKS):
+    """
+    Sembollerin [start, end) günlük geçmişini eksik aralıklar için indirip yazar.
+    İndirme thread'lerde, DB yazımı sadece çağıran thread'de yapılır.
+    Sayaçları (dict) döndürür.
+    """
+    with db.connection_context():
+        tasks = plan_backfill(symbols, start, end, chunk_days)
+    stats = {'symbols': len(symbols), 'tasks': len(tasks), 'done': 0, 'failed': 0, 'bars': 0}
+    if not tasks:
+        print("Tüm aralıklar zaten yüklü; indirilecek bir şey yok.")
+        return stats
+
+    provider = get_provider()
+    bucket = TokenBucket(rate) if rate else None
+    limit = f"saniyede en fazla {rate:g} istek" if rate else "hız sınırı yok"
+    print(f"{len(tasks)} parça indirilecek ({len(symbols)} sembol, {start} - {end}, "
+          f"{workers} eşzamanlı, {limit})...")
+
+    def fetch(task):
+        symbol, a, b = task
+
+        def call():
+            if bucket is not None:
+                bucket.acquire()
+            return provider.daily_history(symbol, a, b)
+        return frame_to_rows(symbol, retry_with_backoff(call, attempts=attempts))
+
+    rows, covered = [], []
+
+    def flush():
+        write_bars(rows, covered)
+        stats['bars'] += len(rows)
+        stats['done'] += len(covered)
+        print(f"[+] {stats['done'] + stats['failed']}/{len(tasks)} parça, {stats['bars']} bar yazıldı")
+        rows.clear()
+        covered.clear()
+
+    started = time.perf_counter()
+    with db.connection_context(), ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as executor:
+        futures = {executor.submit(fetch, task): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                rows.extend(future.result())
+                covered.append(task)
+            except Exception as e:
+                stats['failed'] += 1
+                print(f"[!] HATA: {task[0]} {task[1]} - {task[2]} indirilemedi. Sebep: {e}")
+            if len(covered) >= flush_tasks:
+                flush()
+        flush()
+        coalesce_coverage(symbols)
+
+    stats['seconds'] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def export_history(path, symbols=None, interval='1d'):
+    """
+    Geçmişi dosya uzantısına göre Parquet (.parquet) veya CSV (.csv, .csv.gz) olarak yazar.
+    interval=None ise tick'ler dahil tüm satırlar. Yazılan satır sayısını döndürür.
+    """
+    query = (PriceHistory
+             .select(*[getattr(PriceHistory, c) for c in HISTORY_COLUMNS])
+             .order_by(PriceHistory.symbol, PriceHistory.timestamp))
+    if interval is not None:
+        query = query.where(PriceHistory.interval == interval)
+    if symbols:
+        query = query.where(PriceHistory.symbol.in_(list(symbols)))
+
+    # Ham cursor: satır başına model nesnesi oluşturulmaz
+    with db.connection_context():
+        frame = pd.DataFrame.from_records(db.execute(query).fetchall(), columns=list(HISTORY_COLUMNS))
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+    frame['volume'] = frame['volume'].astype('Int64')
+    if _is_parquet(path):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+    return len(frame)
+
+
+def import_history(path, batch_rows=IMPORT_BATCH_ROWS):
+    """
+    export_history ile yazılmış dosyayı tek transaction'da yükler. Günlük barlar
+    için her sembolün ilk ve son barı arasındaki aralık tamamlanmış sayılır.
+    (satır sayısı, sembol sayısı) döndürür.
+    """
+    frame = pd.read_parquet(path) if _is_parquet(path) else pd.read_csv(path)
+    missing = [c for c in HISTORY_COLUMNS if c not in frame.columns and c != 'interval']
+    if missing:
+        raise ValueError(f"Dosyada eksik sütun: {', '.join(missing)}")
+    if 'interval' not in frame.columns:
+        frame['interval'] = '1d'
+    frame = frame.dropna(subset=['symbol', 'timestamp', 'close'])
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+
+    stamps = frame['timestamp'].dt.strftime(_TIMESTAMP_FORMAT)
+    floats = frame[['open', 'high', 'low', 'close']].astype(float)
+    floats = floats.astype(object).where(floats.notna(), None)
+    volume = frame['volume'].astype('Int64').astype(object).where(frame['volume'].notna(), None)
+    rows = list(zip(frame['symbol'].astype(str), stamps, frame['interval'].astype(str),
+                    floats['open'], floats['high'], floats['low'], floats['close'],
+                    (None if v is None else int(v) for v in volume)))
+
+    daily = frame[frame['interval'] == '1d'].groupby('symbol')['timestamp'].agg(['min', 'max'])
+    covered = [(symbol, first.date(), last.date() + timedelta(days=1))
+               for symbol, first, last in daily.itertuples(name=None)]
+
+    with db.connection_context():
+        with db.atomic():
+            for i in range(0, len(rows), batch_rows):
+                write_bars(rows[i:i + batch_rows])
+            write_bars([], covered)
+        coalesce_coverage([symbol for symbol, _, _ in covered])
+    return len(rows), frame['symbol'].nunique()
+
+
+def coverage_status(symbols=None):
+    """
+    Sembol başına günlük bar sayısı, ilk/son bar ve kayıtlı aralık sayısı.
+    """
+    bars = (PriceHistory
+            .select(PriceHistory.symbol, fn.COUNT(PriceHistory.symbol),
+                    fn.MIN(PriceHistory.timestamp), fn.MAX(PriceHistory.timestamp))
+            .where(PriceHistory.interval == '1d')
+            .group_by(PriceHistory.symbol)
+            .tuples())
+    if symbols:
+        bars = bars.where(PriceHistory.symbol.in_(list(symbols)))
+    with db.connection_context():
+        ranges = {}
+        for symbol, in HistoryCoverage.select(HistoryCoverage.symbol).tuples():
+            ranges[symbol] = ranges.get(symbol, 0) + 1
+        return [{'symbol': s, 'bars': n, 'first': str(first)[:10], 'last': str(last)[:10],
+                 'ranges': ranges.get(s, 0)} for s, n, first, last in bars]
+
+
+def _is_parquet(path):
+    return str(path).lower().endswith('.parquet')
+
+
+def _parse_date(value):
+    return date.fromisoformat(value)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Geçmiş günlük OHLCV verisini PriceHistory tablosuna yükler.")
+    parser.add_argument('--provider', choices=sorted(PROVIDERS), help="piyasa verisi sağlayıcısı (varsayılan: SANBIST_PROVIDER veya yfinance)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('download', help="eksik aralıkları indir (kaldığı yerden devam eder)")
+    p.add_argument('--symbols', nargs='+', help="varsayılan: Company tablosundaki tüm semboller")
+    p.add_argument('--start', type=_parse_date, help=f"varsayılan: {BACKFILL_YEARS} yıl önce")
+    p.add_argument('--end', type=_parse_date, help="hariç; varsayılan: bugün")
+    p.add_argument('--chunk-days', type=int, default=BACKFILL_CHUNK_DAYS)
+    p.add_argument('--workers', type=int, default=BACKFILL_WORKERS)
+    p.add_argument('--rate', type=float, default=BACKFILL_RATE_PER_SECOND)
+    p.add_argument('--attempts', type=int, default=BACKFILL_ATTEMPTS)
+    p.add_argument('--flush-tasks', type=int, default=BACKFILL_FLUSH_TASKS, help="transaction başına parça")
+
+    p = sub.add_parser('export', help="geçmişi Parquet/CSV dosyasına yaz")
+    p.add_argument('path', help=".parquet, .csv veya .csv.gz")
+    p.add_argument('--symbols', nargs='+')
+    p.add_argument('--all-intervals', action='store_true', help="tick'leri de dahil et")
+
+    p = sub.add_parser('import', help="Parquet/CSV dosyasından geçmiş yükle")
+    p.add_argument('path')
+
+    p = sub.add_parser('status', help="sembol başına yüklü geçmiş")
+    p.add_argument('--symbols', nargs='+')
+
+    args = parser.parse_args()
+    if args.provider:
+        set_provider(PROVIDERS[args.provider]())
+
+    create_tables()
+    start_time = time.time()
+
+    if args.command == 'download':
+        end = args.end or date.today()
+        start = args.start or end - timedelta(days=365 * BACKFILL_YEARS)
+        symbols = args.symbols or default_symbols()
+        stats = backfill(symbols, start, end, chunk_days=args.chunk_days, workers=args.workers,
+                         rate=args.rate, attempts=args.attempts, flush_tasks=args.flush_tasks)
+        print(f"\nTamamlandı: {stats['done']} parça, {stats['bars']} bar yazıldı, "
+              f"{stats['failed']} parça başarısız (yeniden çalıştırınca tekrar denenir).")
+    elif args.command == 'export':
+        count = export_history(args.path, args.symbols, interval=None if args.all_intervals else '1d')
+        print(f"{count} satır '{args.path}' dosyasına yazıldı.")
+    elif args.command == 'import':
+        count, n_symbols = import_history(args.path)
+        print(f"{count} satır ({n_symbols} sembol) '{args.path}' dosyasından yüklendi.")
+    elif args.command == 'status':
+        for row in coverage_status(args.symbols):
+            print(f"{row['symbol']:<14} {row['bars']:>6} bar  {row['first']} - {row['last']}  "
+                  f"({row['ranges']} aralık)")
+
+    print(f"\nToplam süre: {time.time() - start_time:.2f} saniye.")
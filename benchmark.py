@@ -0,0 +1,1155 @@
+# benchmark.py
+# Performans ölçümleri. Canlı yfinance'a veya 'sanbist.db'ye dokunmaz;
+# her senaryo geçici bir SQLite dosyası üzerinde sentetik veriyle çalışır.
+# Sadece süre ölçer; doğruluk kontrolleri tests/ altında (python -m pytest).
+#
+# Kullanım:
+#   python benchmark.py companies --symbols 110 --requests 2000
+#   python benchmark.py concurrency --readers 32 --seconds 5
+#   python benchmark.py frames --sizes 100 500 5000
+#   python benchmark.py fetch --symbols 8 --slow-seconds 3
+#   python benchmark.py stream --clients 5000
+#   python benchmark.py batch --symbols 500 --chunk-size 50
+#   python benchmark.py market --symbols 500 --requests 5000
+#   python benchmark.py formats --symbols 500
+#   python benchmark.py indicators --symbols 500 --history 250 1000 5000
+#   python benchmark.py risk --symbols 117
+#   python benchmark.py startup --repeat 5 --max-import-ms 600
+#   python benchmark.py portfolio --portfolios 10000 --positions 15
+#   python benchmark.py suite --sizes 100 500 5000 --output bench_results.json
+import sys
+
+# SSE senaryosu gevent ile çalışır; monkey patch her şeyden önce yapılmalı
+if sys.argv[1:2] == ["stream"]:
+    from gevent import monkey
+    monkey.patch_all()
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+
+def _synthetic_prices(symbols, rng):
+    prices = []
+    for symbol in symbols:
+        prev = rng.uniform(5, 500)
+        prices.append({'symbol': symbol, 'price': prev * rng.uniform(0.95, 1.05), 'previousClose': prev,
+                       'open': prev, 'high': prev * 1.06, 'low': prev * 0.94,
+                       'volume': rng.randint(1_000, 50_000_000), 'timestamp': datetime.now(), 'error': None})
+    return prices
+
+
+def _setup_temp_db(n_symbols, pragmas=None):
+    """
+    Geçici bir veritabanı oluşturur ve n_symbols adet sentetik varlık ekler.
+    """
+    from db_models import db, Company, Price, create_tables, bump_generation
+
+    path = os.path.join(tempfile.mkdtemp(prefix="sanbist_bench_"), "bench.db")
+    # Havuzdaki bağlantılar önceki dosyaya açık kalmasın (suite birden çok kez çağırır)
+    db.close_all()
+    if pragmas is not None:
+        db.init(path, pragmas=pragmas)
+    else:
+        db.init(path)
+    create_tables()
+
+    rng = random.Random(42)
+    companies = [{'symbol': f"SYM{i:04d}.IS", 'name': f"Sentetik {i}", 'type': 'hisse',
+                  'sector': f"sektor-{i % 12}"} for i in range(n_symbols)]
+    prices = _synthetic_prices([c['symbol'] for c in companies], rng)
+    with db.connection_context():
+        with db.atomic():
+            Company.insert_many(companies).execute()
+            Price.replace_many(prices).execute()
+            bump_generation()
+    return path
+
+
+def _rate(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    elapsed = time.perf_counter() - start
+    return n / elapsed, elapsed
+
+
+def bench_companies(args):
+    """
+    /api/bist100/companies: eski yol (istek başına JOIN + jsonify) ile
+    snapshot yolu (hazır byte + ETag) ve 304 yolunu karşılaştırır.
+    """
+    _setup_temp_db(args.symbols)
+
+    import app as app_module
+    from flask import jsonify
+    from snapshot import build_companies_payload
+
+    flask_app = app_module.app
+
+    # Eski yolun birebir karşılığı: her istekte sorgu + dict + jsonify
+    def legacy_view():
+        return jsonify(build_companies_payload())
+    flask_app.add_url_rule('/bench/legacy-companies', 'bench_legacy_companies', legacy_view)
+
+    client = flask_app.test_client()
+    etag = client.get('/api/bist100/companies').headers['ETag']
+
+    filtered = '/api/bist100/companies?sector=sektor-3&fields=symbol,price,previousClose'
+    paged = '/api/bist100/companies?sort=-price&limit=20&cursor=20'
+    results = {
+        "legacy (JOIN + jsonify)": _rate(lambda: client.get('/bench/legacy-companies'), args.requests),
+        "snapshot (200)": _rate(lambda: client.get('/api/bist100/companies'), args.requests),
+        "snapshot (304 If-None-Match)": _rate(
+            lambda: client.get('/api/bist100/companies', headers={'If-None-Match': etag}), args.requests),
+        "sector + fields": _rate(lambda: client.get(filtered), args.requests),
+        "sort=-price, limit=20": _rate(lambda: client.get(paged), args.requests),
+    }
+
+    # İndeks her snapshot'ta yeniden kurulur; maliyeti payload boyutuyla doğrusal olmalı
+    from company_index import CompanyIndex
+    payload = build_companies_payload()
+    builds = 50
+    _, index_elapsed = _rate(lambda: CompanyIndex(payload), builds)
+
+    print(f"\n/api/bist100/companies — {args.symbols} sembol, {args.requests} istek (Flask test client)")
+    baseline = results["legacy (JOIN + jsonify)"][0]
+    for name, (rps, elapsed) in results.items():
+        print(f"  {name:<32} {rps:>10.0f} istek/sn  ({elapsed:.2f} sn)  x{rps / baseline:.1f}")
+    print(f"  indeks kurulumu (snapshot başına) {index_elapsed / builds * 1000:>9.3f} ms")
+    print(f"  gövde boyutu: tam {len(client.get('/api/bist100/companies').data)} B, "
+          f"sector + fields {len(client.get(filtered).data)} B")
+
+
+def bench_concurrency(args):
+    """
+    Çok sayıda okuyucu thread, sürekli yazan bir thread'e karşı çalışır.
+    Okuyucuların gecikme dağılımını ve kilit hatalarını raporlar
+    (doğruluk kontrolü tests/test_concurrency.py'de).
+    """
+    from db_models import SQLITE_PRAGMAS
+
+    pragmas = dict(SQLITE_PRAGMAS, journal_mode=args.journal_mode)
+    _setup_temp_db(args.symbols, pragmas=pragmas)
+
+    from db_models import db, Price, bump_generation
+    from snapshot import build_companies_payload
+
+    stop = threading.Event()
+    symbols = [f"SYM{i:04d}.IS" for i in range(args.symbols)]
+    writes = []
+    errors = []
+    latencies = []
+    lat_lock = threading.Lock()
+
+    def writer():
+        rng = random.Random(7)
+        while not stop.is_set():
+            rows = _synthetic_prices(symbols, rng)
+            start = time.perf_counter()
+            try:
+                with db.connection_context(), db.atomic():
+                    bump_generation()
+                    Price.replace_many(rows).execute()
+                    # Arka plan thread'inin uzun transaction'ını taklit et
+                    time.sleep(args.write_hold_ms / 1000)
+                writes.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"writer: {e}")
+
+    def reader():
+        local = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with db.connection_context():
+                    build_companies_payload()
+                local.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"reader: {e}")
+        with lat_lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(args.readers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    db.close_all()
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float('nan')
+
+    print(f"\nEşzamanlılık — journal_mode={args.journal_mode}, {args.readers} okuyucu + 1 yazıcı, {args.seconds} sn")
+    print(f"  okuma: {len(latencies)} ({len(latencies) / args.seconds:.0f}/sn)  p50={pct(0.50):.1f}ms  p99={pct(0.99):.1f}ms  max={pct(1.0):.1f}ms")
+    print(f"  yazma: {len(writes)} transaction")
+    print(f"  hata : {len(errors)}")
+    for e in errors[:5]:
+        print(f"    {e}")
+
+
+def _synthetic_download_frame(n_symbols, seed=0):
+    """
+    yf.download(period="2d") çıktısı biçiminde sentetik geniş tablo üretir.
+    Sembollerin bir kısmında bugün verisi, bir kısmında bugün kapanışı eksiktir.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    symbols = [f"SYM{i:05d}.IS" for i in range(n_symbols)]
+    columns = pd.MultiIndex.from_product([['Close', 'High', 'Low', 'Open', 'Volume'], symbols],
+                                         names=['Price', 'Ticker'])
+    index = pd.DatetimeIndex(['2025-01-02', '2025-01-03'], name='Date')
+    values = rng.uniform(5, 500, size=(2, len(columns)))
+    frame = pd.DataFrame(values, index=index, columns=columns)
+
+    no_today = rng.random(n_symbols) < 0.03
+    no_close = rng.random(n_symbols) < 0.03
+    for i in np.flatnonzero(no_today):
+        frame.loc[index[1], (slice(None), symbols[i])] = np.nan
+    for i in np.flatnonzero(no_close):
+        frame.loc[index[1], ('Close', symbols[i])] = np.nan
+    return frame, symbols
+
+
+def _legacy_bist_rows(data, symbols, now):
+    """
+    update_prices_task'ın eski (sembol başına maske taramalı) işleme adımı.
+    """
+    import warnings
+    import pandas as pd
+
+    rows = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        data = data.stack(level=1).rename_axis(['Date', 'Symbol']).reset_index()
+    today_data = data[data['Date'] == data['Date'].max()]
+    yesterday_data = data[data['Date'] == data['Date'].min()]
+    for symbol in symbols:
+        today = today_data[today_data['Symbol'] == symbol].iloc[0:1]
+        yesterday = yesterday_data[yesterday_data['Symbol'] == symbol].iloc[0:1]
+        if today.empty:
+            rows.append({'symbol': symbol, 'error': 'Bugün verisi yok', 'timestamp': now})
+            continue
+        price_val = today['Close'].values[0]
+        prev_close_val = yesterday['Close'].values[0] if not yesterday.empty else None
+        if pd.isna(price_val) and not pd.isna(prev_close_val):
+            price_val = prev_close_val
+        if not pd.isna(price_val):
+            rows.append({'symbol': symbol, 'price': price_val, 'previousClose': prev_close_val,
+                         'open': today['Open'].values[0], 'high': today['High'].values[0],
+                         'low': today['Low'].values[0], 'volume': today['Volume'].values[0],
+                         'timestamp': now, 'error': None})
+        else:
+            rows.append({'symbol': symbol, 'error': 'yf.download verisi bulunamadı', 'timestamp': now})
+    return rows
+
+
+def bench_frames(args):
+    """
+    yf.download sonrası işleme: eski sembol başına tarama vs vektörel yol.
+    Önce iki yolun aynı satırları ürettiğini doğrular.
+    """
+    from price_frames import build_bist_price_rows
+
+    print("\nBIST işleme adımı (yf.download sonrası)")
+    print(f"  {'sembol':>7} {'eski (ms)':>12} {'vektörel (ms)':>14} {'µs/sembol':>10}")
+    for n in args.sizes:
+        frame, symbols = _synthetic_download_frame(n)
+        now = datetime.now()
+
+        new_rows = build_bist_price_rows(frame, symbols, now)
+        legacy_ms = float('nan')
+        if n <= args.legacy_max:
+            start = time.perf_counter()
+            legacy_rows = _legacy_bist_rows(frame, symbols, now)
+            legacy_ms = (time.perf_counter() - start) * 1000
+            _assert_same_rows(legacy_rows, new_rows)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            build_bist_price_rows(frame, symbols, now)
+        new_ms = (time.perf_counter() - start) * 1000 / args.repeat
+        print(f"  {n:>7} {legacy_ms:>12.1f} {new_ms:>14.2f} {new_ms * 1000 / n:>10.1f}")
+
+
+def _assert_same_rows(expected, actual):
+    import math
+
+    assert len(expected) == len(actual), "satır sayısı farklı"
+    for a, b in zip(expected, actual):
+        for key in set(a) | set(b):
+            x, y = a.get(key), b.get(key)
+            if isinstance(x, float) and math.isnan(x):
+                x = None
+            assert x == y, f"{a['symbol']} {key}: {x!r} != {y!r}"
+
+
+def bench_fetch(args):
+    """
+    Döviz/maden aşaması: sahte fetcher'a gecikme enjekte edip döngü süresini
+    gecikmelerin toplamı ve en yavaş çağrıyla karşılaştırır.
+    Doğruluk kontrolü tests/test_fetchers.py'de.
+    """
+    from fetchers import fetch_all_with_deadline
+
+    rng = random.Random(1)
+    symbols = [f"FX{i}" for i in range(args.symbols)]
+    latency = {s: rng.uniform(0.05, args.max_latency) for s in symbols}
+    latency[symbols[-1]] = args.slow_seconds  # Takılan tek sembol
+
+    def fake_fetch(symbol):
+        time.sleep(latency[symbol])
+        if symbol == symbols[0]:
+            raise RuntimeError("sahte upstream hatası")
+        return {'symbol': symbol, 'price': 1.0}
+
+    start = time.perf_counter()
+    results, errors = fetch_all_with_deadline(symbols, fake_fetch, max_workers=args.workers,
+                                              per_symbol_timeout=args.timeout, deadline=args.deadline)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nEşzamanlı fetch — {args.symbols} sembol, {args.workers} thread, "
+          f"sembol başına {args.timeout:g} sn, döngü {args.deadline:g} sn")
+    print(f"  gecikmelerin toplamı : {sum(latency.values()):.2f} sn (sıralı yol)")
+    print(f"  en yavaş çağrı       : {max(latency.values()):.2f} sn")
+    print(f"  döngü süresi         : {elapsed:.2f} sn")
+    print(f"  başarılı/hatalı      : {len(results)}/{len(errors)}")
+    for symbol, error in sorted(errors.items()):
+        print(f"    {symbol}: {error}")
+
+
+def _http_throughput(port, path, clients, seconds):
+    """
+    Gerçek bir WSGI sunucusuna 'clients' thread ile 'seconds' saniye boyunca
+    istek atar; istek/sn ve gecikme yüzdeliklerini döndürür.
+    """
+    import http.client
+
+    latencies, failures = [], [0]
+    lock = threading.Lock()
+    end = time.perf_counter() + seconds
+
+    def client():
+        local, failed = [], 0
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                conn.close()
+                if response.status != 200:
+                    failed += 1
+            except OSError:
+                failed += 1
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            failures[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else None
+    return {"requests": len(latencies), "rps": len(latencies) / elapsed, "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99), "failures": failures[0]}
+
+
+def bench_suite(args):
+    """
+    Çevrimdışı uçtan uca ölçüm paketi: sahte sağlayıcı (providers.FakeProvider)
+    ile her boyut için güncelleme döngüsü süresi, DB yazma süresi ve endpoint
+    verimi (Flask test client ve gerçek WSGI sunucusu). Sonuçlar JSON olarak
+    kaydedilir; farklı çalıştırmalar bu dosyalar üzerinden karşılaştırılır.
+    """
+    import platform
+    import subprocess
+
+    from db_models import db, bump_generation
+    from derived import derived_engine
+    from price_writer import price_writer
+    from providers import FakeProvider, set_provider
+    from snapshot import companies_snapshot
+    from werkzeug.serving import make_server
+
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                  text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+
+    report = {
+        "meta": {
+            "startedAt": datetime.now().isoformat(),
+            "gitRevision": revision,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k != 'func'},
+        },
+        "runs": [],
+    }
+
+    for n in args.sizes:
+        _setup_temp_db(n)
+        import app as app_module  # İlk geçici DB hazırlandıktan sonra
+        symbols = [f"SYM{i:04d}.IS" for i in range(n)]
+        app_module.BIST100_SYMBOLS = symbols
+        app_module.BIST_DOWNLOAD_RATE_PER_SECOND = args.rate
+        set_provider(FakeProvider(seed=args.seed, latency=args.latency, failure_rate=args.failure_rate))
+        price_writer.reset()
+        derived_engine.reset()
+        with db.connection_context():
+            companies_snapshot.refresh()
+
+        # 1. Güncelleme döngüsü (indirme + döviz + sentetik + yazma + snapshot)
+        cycle_times = []
+        for _ in range(args.cycles):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                app_module.update_prices_task()
+            cycle_times.append(time.perf_counter() - start)
+
+        # 2. Sadece DB yazma: her satırı değişmiş N satır
+        rng = random.Random(args.seed)
+        write_times = []
+        for _ in range(args.cycles):
+            rows = _synthetic_prices(symbols, rng)
+            start = time.perf_counter()
+            with db.connection_context(), db.atomic():
+                result = price_writer.write(rows, bump_generation())
+            price_writer.commit(result)
+            write_times.append(time.perf_counter() - start)
+        with db.connection_context():
+            companies_snapshot.refresh()
+
+        endpoints = ['/api/bist100/companies', '/api/market/summary', '/api/bist100',
+                     f'/api/history/{symbols[0]}?range=1d']
+
+        # 3. Flask test client (sunucu katmanı olmadan)
+        client = app_module.app.test_client()
+        test_client = {}
+        for path in endpoints:
+            client.get(path)
+            rps, _ = _rate(lambda: client.get(path), args.requests)
+            test_client[path] = {"rps": rps}
+
+        # 4. Gerçek WSGI sunucusu (werkzeug, thread'li) üzerinden HTTP
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)  # İstek başına log satırı basmasın
+        server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        try:
+            wsgi = {path: _http_throughput(server.server_port, path, args.http_clients, args.http_seconds)
+                    for path in endpoints}
+        finally:
+            server.shutdown()
+
+        run = {
+            "symbols": n,
+            "refreshCycleSeconds": {"min": min(cycle_times), "mean": sum(cycle_times) / len(cycle_times),
+                                    "max": max(cycle_times)},
+            "dbWriteSeconds": {"min": min(write_times), "mean": sum(write_times) / len(write_times),
+                               "max": max(write_times)},
+            "testClient": test_client,
+            "wsgi": wsgi,
+        }
+        report["runs"].append(run)
+
+        print(f"\n=== {n} sembol ===")
+        print(f"  güncelleme döngüsü : ort {run['refreshCycleSeconds']['mean'] * 1000:8.1f} ms "
+              f"(min {run['refreshCycleSeconds']['min'] * 1000:.1f}, max {run['refreshCycleSeconds']['max'] * 1000:.1f})")
+        print(f"  DB yazma ({n} satır): ort {run['dbWriteSeconds']['mean'] * 1000:8.1f} ms")
+        for path in endpoints:
+            w = wsgi[path]
+            print(f"  {path:<36} test client {test_client[path]['rps']:>8.0f} istek/sn | "
+                  f"WSGI {w['rps']:>7.0f} istek/sn, p50 {w['p50_ms']:.1f} ms, p99 {w['p99_ms']:.1f} ms"
+                  + (f", {w['failures']} hata" if w['failures'] else ""))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSonuçlar kaydedildi: {args.output}")
+
+
+def bench_market(args):
+    """
+    /api/market/summary: özetin snapshot başına hesaplama maliyeti ve
+    istek başına süre (hazır byte'lar, istek anında hesaplama yok).
+    """
+    _setup_temp_db(args.symbols)
+
+    import app as app_module
+    from market import MarketSummary
+    from snapshot import companies_snapshot, build_companies_payload
+
+    payload = build_companies_payload()
+    _, build_elapsed = _rate(lambda: MarketSummary(payload), args.builds)
+
+    client = app_module.app.test_client()
+    client.get('/api/market/summary')
+    sector = companies_snapshot.current.market.tables['sector'][0]['sector']
+    client.get(f'/api/market/summary?top=5&sector={sector}')
+
+    snap = companies_snapshot.current
+    _, body_elapsed = _rate(lambda: snap.market_body(10, sector), args.requests)
+
+    results = {
+        "summary (varsayılan)": _rate(lambda: client.get('/api/market/summary'), args.requests),
+        "summary (top=5, sector)": _rate(lambda: client.get(f'/api/market/summary?top=5&sector={sector}'), args.requests),
+        "companies (karşılaştırma)": _rate(lambda: client.get('/api/bist100/companies'), args.requests),
+    }
+
+    print(f"\n/api/market/summary — {args.symbols} sembol, {args.requests} istek (Flask test client)")
+    print(f"  özet hesaplama (snapshot başına)   {build_elapsed / args.builds * 1000:>8.2f} ms")
+    print(f"  hazır gövde (Flask hariç)          {body_elapsed / args.requests * 1e6:>8.2f} µs/istek")
+    for name, (rps, elapsed) in results.items():
+        print(f"  {name:<32} {elapsed / args.requests * 1000:>8.3f} ms/istek  ({rps:.0f} istek/sn)")
+
+
+def bench_formats(args):
+    """
+    companies cevabının biçim/sıkıştırma seçenekleri: gövde boyutu, snapshot
+    başına kodlama maliyeti, istemci tarafı ayrıştırma süresi ve istek süresi.
+    """
+    _setup_temp_db(args.symbols)
+
+    import gzip as gzip_module
+    import app as app_module
+    import formats
+    from snapshot import companies_snapshot
+
+    client = app_module.app.test_client()
+    client.get('/api/bist100/companies')
+    snap = companies_snapshot.current
+
+    def decoder(fmt):
+        if fmt == 'msgpack':
+            return formats.msgpack.unpackb
+        return json.loads
+
+    def decompressor(encoding):
+        if encoding == 'br':
+            return formats.brotli.decompress
+        if encoding == 'gzip':
+            return gzip_module.decompress
+        return lambda body: body
+
+    headers = {'identity': {}, 'gzip': {'Accept-Encoding': 'gzip'}, 'br': {'Accept-Encoding': 'br'}}
+    baseline = len(snap.body)
+    print(f"\n/api/bist100/companies biçimleri — {args.symbols} sembol, {args.requests} istek (Flask test client)")
+    print(f"  {'biçim':<10} {'kodlama':<9} {'boyut':>9} {'oran':>6} {'kodlama/snap':>13} "
+          f"{'ayrıştırma':>11} {'istek':>10}")
+    for fmt in formats.available_formats():
+        plain = formats.encode_rows(snap.payload, fmt)
+        _, encode_elapsed = _rate(lambda: formats.encode_rows(snap.payload, fmt), args.builds)
+        for encoding in ['identity'] + formats.available_encodings():
+            _, compress_elapsed = _rate(lambda: formats.compress(plain, encoding), args.builds)
+            body, used = formats.compress(plain, encoding)
+            # İstemcinin yaptığı iş: açma + ayrıştırma
+            decode = decoder(fmt)
+            unpack = decompressor(used)
+            _, parse_elapsed = _rate(lambda: decode(unpack(body)), args.builds)
+            url = f'/api/bist100/companies?format={fmt}'
+            _, request_elapsed = _rate(lambda: client.get(url, headers=headers[encoding]), args.requests)
+            per_snapshot = (encode_elapsed + compress_elapsed) / args.builds
+            print(f"  {fmt:<10} {used:<9} {len(body):>8}B {len(body) / baseline:>6.1%} "
+                  f"{per_snapshot * 1000:>10.2f} ms {parse_elapsed / args.builds * 1000:>8.2f} ms "
+                  f"{request_elapsed / args.requests * 1000:>7.3f} ms")
+
+
+def bench_indicators(args):
+    """
+    Gösterge motoru: ilk yükleme geçmiş uzunluğuyla büyür, döngü başına artımlı
+    güncelleme (en yeni fiyat + tablo) ise geçmişten bağımsız kalmalıdır.
+    Karşılaştırma: her döngüde tüm pencereyi pandas ile yeniden hesaplamak.
+    """
+    import numpy as np
+    import pandas as pd
+    from indicators import IndicatorEngine
+
+    rng = np.random.default_rng(args.seed)
+    symbols = [f"SYM{i:04d}.IS" for i in range(args.symbols)]
+    print(f"\nGöstergeler — {args.symbols} sembol, {args.cycles} döngü")
+    print(f"  {'geçmiş (gün)':>12} {'ilk yükleme':>12} {'artımlı/döngü':>14} {'tam hesap/döngü':>16}")
+    for days in args.history:
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (args.symbols, days)), axis=1))
+        day_numbers = np.arange(days, dtype=np.int64)
+
+        engine = IndicatorEngine(symbols)
+        start = time.perf_counter()
+        engine.load_matrix(day_numbers, closes)
+        load_elapsed = time.perf_counter() - start
+
+        # Her döngü: aynı gün içinde yeni fiyat, arada bir gün değişimi (commit)
+        quotes = []
+        for cycle in range(args.cycles):
+            day = str(np.datetime64(int(days + cycle // 10), 'D'))
+            prices = closes[:, -1] * (1 + rng.normal(0, 0.01, args.symbols))
+            quotes.append({s: (float(p), day) for s, p in zip(symbols, prices)})
+        start = time.perf_counter()
+        for q in quotes:
+            engine.update(q)
+            engine.table()
+        incremental = (time.perf_counter() - start) / args.cycles
+
+        # Eski yol: her döngüde tüm geçmiş üzerinden
+        frame = pd.DataFrame(closes.T, columns=symbols)
+        full_cycles = max(1, min(args.cycles, 5))
+        start = time.perf_counter()
+        for _ in range(full_cycles):
+            frame.rolling(20).mean().iloc[-1]
+            frame.rolling(50).mean().iloc[-1]
+            frame.rolling(20).std(ddof=0).iloc[-1]
+            ema12 = frame.ewm(span=12, adjust=False).mean()
+            ema26 = frame.ewm(span=26, adjust=False).mean()
+            (ema12 - ema26).ewm(span=9, adjust=False).mean().iloc[-1]
+            change = frame.diff()
+            change.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean().iloc[-1]
+            (-change.clip(upper=0)).ewm(alpha=1 / 14, adjust=False).mean().iloc[-1]
+        full = (time.perf_counter() - start) / full_cycles
+
+        print(f"  {days:>12} {load_elapsed * 1000:>9.1f} ms {incremental * 1000:>11.3f} ms "
+              f"{full * 1000:>13.1f} ms")
+
+
+def bench_risk(args):
+    """
+    Korelasyon/volatilite: döngü başına artımlı güncelleme (O(n^2)) ile pencerenin
+    kapanışlardan her seferinde yeniden hesaplanması; uzun çalışmada bellek sabit mi.
+    """
+    import numpy as np
+    import pandas as pd
+    from risk import CorrelationEngine, RETURN_WINDOW
+
+    rng = np.random.default_rng(args.seed)
+    symbols = [f"SYM{i:04d}.IS" for i in range(args.symbols)]
+    days = args.days
+    market = rng.normal(0, 0.01, (days, 1))
+    closes = (100 * np.exp(np.cumsum(0.5 * market + rng.normal(0, 0.015, (days, args.symbols)), axis=0))).T
+
+    engine = CorrelationEngine(symbols)
+    start = time.perf_counter()
+    engine.load_matrix(np.arange(days, dtype=np.int64), closes)
+    load_elapsed = time.perf_counter() - start
+
+    def state_bytes():
+        return sum(a.nbytes for a in (engine.returns, engine.valid, engine.cross, engine.sums,
+                                      engine.valid_count, engine.close, engine.pending_price))
+    bytes_before = state_bytes()
+
+    # Her 10 döngüde bir gün değişir (commit)
+    quotes = []
+    for cycle in range(args.cycles):
+        day = str(np.datetime64(int(days + cycle // 10), 'D'))
+        prices = closes[:, -1] * np.exp(rng.normal(0, 0.01, args.symbols))
+        quotes.append({s: (float(p), day) for s, p in zip(symbols, prices)})
+    start = time.perf_counter()
+    for q in quotes:
+        engine.update(q)
+        engine.matrix()
+    incremental = (time.perf_counter() - start) / args.cycles
+
+    # Eski yol: her seferinde kapanış penceresinden getiri + korelasyon
+    window = closes[:, -(RETURN_WINDOW + 1):]
+    start = time.perf_counter()
+    for _ in range(args.cycles):
+        returns = np.diff(np.log(window), axis=1)
+        np.corrcoef(returns)
+        returns.std(axis=1, ddof=1)
+    numpy_full = (time.perf_counter() - start) / args.cycles
+
+    frame = pd.DataFrame(closes.T, columns=symbols)
+    pandas_cycles = max(1, args.cycles // 50)
+    start = time.perf_counter()
+    for _ in range(pandas_cycles):
+        np.log(frame).diff().rolling(RETURN_WINDOW).corr().iloc[-args.symbols:]
+    pandas_full = (time.perf_counter() - start) / pandas_cycles
+
+    print(f"\nKorelasyon — {args.symbols} sembol, pencere {RETURN_WINDOW} gün, {days} günlük geçmiş")
+    print(f"  ilk yükleme                        {load_elapsed * 1000:>9.1f} ms")
+    print(f"  artımlı güncelleme + matris        {incremental * 1000:>9.3f} ms/döngü")
+    print(f"  pencereden yeniden (NumPy)         {numpy_full * 1000:>9.3f} ms/döngü")
+    print(f"  rolling corr (pandas, tüm geçmiş)  {pandas_full * 1000:>9.1f} ms/döngü")
+    print(f"  durum belleği: {bytes_before / 1024:.0f} KB -> {state_bytes() / 1024:.0f} KB "
+          f"({args.cycles} döngü, {engine.commits} kesinleşme sonra)")
+
+
+# Portföy senaryosu için hisse dışı varlıklar: (sembol, tür, fiyat)
+PORTFOLIO_EXTRA_ASSETS = [
+    ('USDTRY=X', 'doviz', 42.0), ('EURTRY=X', 'doviz', 48.7), ('GBPTRY=X', 'doviz', 55.8),
+    ('EURUSD=X', 'doviz_capraz', 1.16), ('GC=F', 'maden_ons', 4000.0), ('SI=F', 'maden_ons', 48.0),
+    ('GRAMALTIN', 'maden_gram', 5400.0), ('CEYREKALTIN', 'maden_sikke', 8800.0),
+]
+
+
+def _loop_valuation(payload, portfolios):
+    """
+    Eski (istemci tarafı) yolun karşılığı: pozisyon başına Python döngüsü.
+    """
+    rows = {r['symbol']: r for r in payload}
+    usd = rows['USDTRY=X']
+
+    def unit(symbol, field):
+        row = rows[symbol]
+        p = row[field] if row[field] is not None else row['price']
+        if symbol.endswith('=F') or symbol == 'EURUSD=X':
+            return p * (usd[field] if usd[field] is not None else usd['price'])
+        return p
+
+    out = []
+    for p in portfolios:
+        value = prev = 0.0
+        breakdown = {}
+        for symbol, quantity in p['holdings'].items():
+            if symbol not in rows or rows[symbol]['price'] is None:
+                continue
+            v = quantity * unit(symbol, 'price')
+            value += v
+            prev += quantity * unit(symbol, 'previousClose')
+            cls = rows[symbol]['type'].split('_')[0]
+            breakdown[cls] = breakdown.get(cls, 0.0) + v
+        out.append({"id": p['id'], "value": value, "dailyPnl": value - prev, "breakdown": breakdown,
+                    "valueUsd": value / usd['price']})
+    return out
+
+
+def bench_portfolio(args):
+    """
+    Toplu portföy değerlemesi: pozisyon başına Python döngüsü ile seyrek
+    portföy x fiyat vektörü çarpımı; uçtan uca POST (JSON ve MessagePack).
+    """
+    _setup_temp_db(args.symbols)
+    from db_models import db, Company, Price, bump_generation
+    with db.connection_context(), db.atomic():
+        Company.insert_many([{'symbol': s, 'name': s, 'type': t, 'sector': t.split('_')[0]}
+                             for s, t, _ in PORTFOLIO_EXTRA_ASSETS]).execute()
+        Price.replace_many([{'symbol': s, 'price': p * 1.01, 'previousClose': p, 'timestamp': datetime.now()}
+                            for s, _, p in PORTFOLIO_EXTRA_ASSETS]).execute()
+        bump_generation()
+
+    import msgpack
+    import app as app_module
+    from portfolio import PortfolioPricer
+    from snapshot import companies_snapshot
+
+    snap = companies_snapshot.get()
+    payload = snap.payload
+    symbols = [r['symbol'] for r in payload]
+    rng = random.Random(args.seed)
+    portfolios = []
+    for i in range(args.portfolios):
+        held = rng.sample(symbols, min(len(symbols), rng.randint(1, 2 * args.positions - 1)))
+        portfolios.append({"id": f"p{i}", "holdings": {s: rng.randint(1, 1000) for s in held}})
+    positions = sum(len(p['holdings']) for p in portfolios)
+
+    _, build_elapsed = _rate(lambda: PortfolioPricer(payload), args.builds)
+    pricer = snap.pricer
+    _, loop_elapsed = _rate(lambda: _loop_valuation(payload, portfolios), args.repeat)
+    _, vector_elapsed = _rate(lambda: pricer.valuate(portfolios), args.repeat)
+    _, value_elapsed = _rate(lambda: pricer.value(portfolios), args.repeat)
+
+    # İki yol aynı sonucu vermeli
+    vector = pricer.valuate(portfolios)
+    loop = _loop_valuation(payload, portfolios)
+    max_diff = max(max(abs(a - b['value']), abs((a - pa) - b['dailyPnl']))
+                   for a, pa, b in zip(vector.total.tolist(), vector.prev_total.tolist(), loop))
+
+    client = app_module.app.test_client()
+    json_body = json.dumps({"portfolios": portfolios})
+    msgpack_body = msgpack.packb({"portfolios": portfolios})
+    requests_ = {
+        "POST JSON -> JSON": lambda: client.post('/api/portfolio/valuation', data=json_body,
+                                                 content_type='application/json'),
+        "POST JSON -> JSON (gzip)": lambda: client.post('/api/portfolio/valuation', data=json_body,
+                                                        content_type='application/json',
+                                                        headers={'Accept-Encoding': 'gzip'}),
+        "POST msgpack -> msgpack": lambda: client.post('/api/portfolio/valuation', data=msgpack_body,
+                                                       content_type='application/msgpack',
+                                                       headers={'Accept': 'application/msgpack'}),
+    }
+    sizes = {name: len(send().data) for name, send in requests_.items()}
+    timings = {name: _rate(send, args.repeat)[1] / args.repeat for name, send in requests_.items()}
+
+    print(f"\nPortföy değerlemesi — {args.portfolios} portföy, {positions} pozisyon, {len(symbols)} sembol")
+    print(f"  fiyat vektörleri (snapshot başına)  {build_elapsed / args.builds * 1000:>8.2f} ms")
+    print(f"  pozisyon döngüsü (Python)           {loop_elapsed / args.repeat * 1000:>8.1f} ms")
+    print(f"  seyrek matris x vektör (valuate)    {vector_elapsed / args.repeat * 1000:>8.1f} ms  "
+          f"x{loop_elapsed / vector_elapsed:.1f}  ({positions * args.repeat / vector_elapsed / 1e6:.1f} M pozisyon/sn)")
+    print(f"  + cevap nesneleri (value)           {value_elapsed / args.repeat * 1000:>8.1f} ms")
+    print(f"  en büyük fark (TL)                  {max_diff:>8.2e}")
+    print(f"  istek gövdesi: JSON {len(json_body) / 1024:.0f} KB, msgpack {len(msgpack_body) / 1024:.0f} KB")
+    for name in requests_:
+        print(f"  {name:<34} {timings[name] * 1000:>8.1f} ms  (cevap {sizes[name] / 1024:.0f} KB)")
+
+
+# Okuma yolunda (app import edilirken) yüklenmemesi gereken kütüphaneler
+HEAVY_MODULES = ('pandas', 'yfinance', 'pyarrow', 'gevent')
+
+
+def _import_profile():
+    """
+    Temiz bir yorumlayıcıda `python -X importtime -c "import app"` çalıştırır.
+    (app toplam µs, app'in doğrudan import ettiği modüllerin kümülatif µs'leri,
+    yüklenen ağır modüller, duvar saati süresi) döndürür.
+    """
+    code = ("import app, sys; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=os.path.dirname(os.path.abspath(__file__)),
+                          capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+
+    # Çocuklar ebeveynlerinden önce yazılır: derinlik-1 satırlar bir sonraki
+    # derinlik-0 satırına (site, app, ...) aittir
+    total, direct, children = None, {}, {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Başlık satırı
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == "app":
+                total, direct = int(cumulative), children
+            children = {}
+        elif depth == 1:
+            children[name.strip()] = int(cumulative)
+    heavy = [m for m in proc.stdout.strip().splitlines()[-1].split(",") if m] if proc.stdout.strip() else []
+    return total, direct, heavy, wall
+
+
+def bench_startup(args):
+    """
+    Worker açılışı: app'in import süresi (ayrı süreçte, -X importtime ile), okuma
+    yolunda ağır kütüphane yüklenip yüklenmediği ve başlangıç snapshot'ının maliyeti.
+    --max-import-ms aşılırsa çıkış kodu 1 (gerilemeleri CI'da yakalamak için).
+    """
+    profiles = [_import_profile() for _ in range(args.repeat)]
+    totals = [p[0] / 1000 for p in profiles]
+    walls = [p[3] * 1000 for p in profiles]
+    import_ms = statistics.median(totals)
+    # En yavaş doğrudan import'lar (medyan koşudan)
+    direct = sorted(profiles, key=lambda p: p[0])[len(profiles) // 2][1]
+    heavy = sorted({m for p in profiles for m in p[2]})
+
+    # Açılış: snapshot'ı import sonrası hazırlamak vs ilk istekte oluşturmak
+    _setup_temp_db(args.symbols)
+    import app as app_module
+    from db_models import db, bump_generation
+
+    start = time.perf_counter()
+    app_module.create_app()
+    factory_elapsed = time.perf_counter() - start
+    client = app_module.app.test_client()
+
+    start = time.perf_counter()
+    app_module.warm_snapshot()
+    warm_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    client.get('/api/bist100/companies')
+    warm_first = time.perf_counter() - start
+
+    # Soğuk yol: nesil değişti, snapshot ilk istekte oluşturulur
+    with db.connection_context():
+        bump_generation()
+    start = time.perf_counter()
+    client.get('/api/bist100/companies')
+    cold_first = time.perf_counter() - start
+
+    print(f"\nAçılış — {args.repeat} temiz süreç, {args.symbols} sembol")
+    print(f"  import app (-X importtime)          {import_ms:>8.1f} ms  (min {min(totals):.1f}, max {max(totals):.1f})")
+    print(f"  yorumlayıcı + import (duvar saati)  {statistics.median(walls):>8.1f} ms")
+    print(f"  ağır modüller: {', '.join(heavy) if heavy else 'yok'}")
+    print("  en yavaş doğrudan import'lar:")
+    for name, us in sorted(direct.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"    {name:<32} {us / 1000:>8.1f} ms")
+    print(f"  create_app()                        {factory_elapsed * 1000:>8.2f} ms")
+    print(f"  warm_snapshot()                     {warm_elapsed * 1000:>8.2f} ms")
+    print(f"  ilk istek (sıcak snapshot)          {warm_first * 1000:>8.2f} ms")
+    print(f"  ilk istek (soğuk, istek içinde)     {cold_first * 1000:>8.2f} ms")
+
+    if heavy:
+        print(f"UYARI: app import edilirken ağır modüller yüklendi: {', '.join(heavy)}")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"HATA: import süresi {import_ms:.1f} ms > sınır {args.max_import_ms:.1f} ms")
+        sys.exit(1)
+
+
+class _FakeDownloader:
+    """
+    yf.download yerine geçen sahte parça indirici. Sembol başına gecikme ekler ve:
+    - 'flaky_chunk' sembollerinden birini içeren parça ilk isteğinde hata fırlatır,
+    - 'flaky' semboller ilk istendiklerinde boş döner,
+    - 'dead' semboller hiç veri döndürmez.
+    """
+
+    def __init__(self, frame, latency, flaky_chunk, flaky, dead):
+        self.frame = frame
+        self.latency = latency
+        self.flaky_chunk = flaky_chunk
+        self.flaky = flaky
+        self.dead = dead
+        self.calls = 0
+        self._requested = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, chunk):
+        with self._lock:
+            self.calls += 1
+            first = {s for s in chunk if s not in self._requested}
+            self._requested.update(chunk)
+        time.sleep(self.latency * len(chunk))
+        if first & self.flaky_chunk:
+            raise RuntimeError("sahte upstream hatası (429)")
+        keep = [s for s in chunk if s not in self.dead and not (s in self.flaky and s in first)]
+        return self.frame.loc[:, self.frame.columns.get_level_values(1).isin(keep)]
+
+
+def bench_batch(args):
+    """
+    Hisse indirmesi: evren tek bir çağrı yerine parçalara bölünüp paralel
+    indirilir; geçici hatalar sadece ilgili parça/sembol yeniden denenerek
+    kurtarılır. Tek çağrıyla karşılaştırır; doğruluk kontrolü
+    tests/test_download.py'de.
+    """
+    from fetchers import download_in_chunks
+
+    frame, symbols = _synthetic_download_frame(args.symbols)
+    rng = random.Random(2)
+    flaky_chunk = set(rng.sample(symbols, max(1, int(args.symbols * args.chunk_failure_rate))))
+    flaky = set(rng.sample(symbols, int(args.symbols * args.symbol_miss_rate)))
+    dead = set(rng.sample(symbols, int(args.symbols * args.dead_rate)))
+
+    # Eski yol: tek çağrı; herhangi bir parça hatası tüm partiyi düşürür
+    legacy = _FakeDownloader(frame, args.latency, flaky_chunk, flaky, dead)
+    start = time.perf_counter()
+    try:
+        legacy_count = legacy(symbols)['Close'].notna().any(axis=0).sum()
+    except RuntimeError:
+        legacy_count = 0
+    legacy_elapsed = time.perf_counter() - start
+
+    fake = _FakeDownloader(frame, args.latency, flaky_chunk, flaky, dead)
+    start = time.perf_counter()
+    data, errors = download_in_chunks(symbols, fake, chunk_size=args.chunk_size, max_workers=args.workers,
+                                      rate=args.rate, attempts=args.attempts, base_delay=args.base_delay)
+    elapsed = time.perf_counter() - start
+    got = set(data['Close'].columns[data['Close'].notna().any(axis=0)]) if not data.empty else set()
+
+    print(f"\nParçalı indirme — {args.symbols} sembol, parça {args.chunk_size}, {args.workers} thread, "
+          f"saniyede {args.rate:g} parça, {args.attempts} tur")
+    print(f"  enjekte: {len(flaky_chunk)} parça hatası tetikleyen, {len(flaky)} geçici eksik, {len(dead)} ölü sembol")
+    print(f"  tek çağrı     : {legacy_count:5d} sembol, {legacy_elapsed:.2f} sn")
+    print(f"  parçalı       : {len(got):5d} sembol, {elapsed:.2f} sn, {fake.calls} çağrı")
+    print(f"  kalan hatalar : {len(errors)} ({len(dead)} ölü sembol)")
+
+
+def bench_stream(args):
+    """
+    Tek bir gevent worker'ında binlerce boşta SSE bağlantısı tutar, sonra bir
+    güncelleme yazıp olayın tüm istemcilere ulaşma süresini ve bellek kullanımını ölçer.
+    """
+    import resource
+    import gevent
+    from gevent import socket as gsocket
+    from gevent.pywsgi import WSGIServer
+
+    _setup_temp_db(args.symbols)
+    import app as app_module
+    from db_models import db, Price, bump_generation
+    from stream import price_broadcaster
+
+    server = WSGIServer(('127.0.0.1', 0), app_module.app, log=None, spawn=args.clients + 100)
+    server.start()
+    port = server.server_port
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    connected = []
+    received = []
+    request = (f"GET /api/stream/prices{args.query} HTTP/1.1\r\nHost: localhost\r\n"
+               f"Accept: text/event-stream\r\n\r\n").encode()
+
+    def client():
+        sock = gsocket.create_connection(('127.0.0.1', port))
+        sock.sendall(request)
+        buf = b""
+        while b"event: hello" not in buf:
+            buf += sock.recv(65536)
+        connected.append(sock)
+        buf = b""
+        while b"event: prices" not in buf:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return
+            buf += chunk
+        received.append(time.perf_counter())
+
+    start = time.perf_counter()
+    greenlets = [gevent.spawn(client) for _ in range(args.clients)]
+    while len(connected) < args.clients:
+        gevent.sleep(0.05)
+        if time.perf_counter() - start > 120:
+            break
+    connect_time = time.perf_counter() - start
+    rss_idle = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    gevent.sleep(0.5)  # İzleyici ilk neslini okusun
+
+    # Birkaç sembolün fiyatını değiştir ve yayıncıyı dürt
+    rng = random.Random(3)
+    symbols = [f"SYM{i:04d}.IS" for i in range(args.symbols)]
+    with db.connection_context(), db.atomic():
+        generation = bump_generation()
+        rows = _synthetic_prices(rng.sample(symbols, min(args.changed, len(symbols))), rng)
+        for row in rows:
+            row['revision'] = generation
+        Price.replace_many(rows).execute()
+    publish_start = time.perf_counter()
+    price_broadcaster.notify()
+    gevent.joinall(greenlets, timeout=60)
+    fanout = (max(received) - publish_start) if received else float('nan')
+
+    print(f"\nSSE — {args.clients} bağlantı, tek süreç (gevent), {args.changed} sembol değişti")
+    print(f"  bağlanma süresi      : {connect_time:.2f} sn ({len(connected)} bağlı)")
+    print(f"  bellek (maxrss)      : {rss_before / 1024:.0f} MB -> {rss_idle / 1024:.0f} MB boşta "
+          f"(~{(rss_idle - rss_before) / max(1, len(connected)):.1f} KB/bağlantı)")
+    print(f"  olayı alan istemci   : {len(received)}")
+    print(f"  dağıtım süresi       : {fanout * 1000:.0f} ms (son istemciye kadar)")
+    server.stop(timeout=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SanBIST performans ölçümleri")
+    sub = parser.add_subparsers(dest="scenario", required=True)
+
+    p = sub.add_parser("companies", help="companies endpoint'i: eski yol vs snapshot")
+    p.add_argument("--symbols", type=int, default=110)
+    p.add_argument("--requests", type=int, default=2000)
+    p.set_defaults(func=bench_companies)
+
+    p = sub.add_parser("concurrency", help="okuyucu thread'ler aktif bir yazıcıya karşı")
+    p.add_argument("--symbols", type=int, default=110)
+    p.add_argument("--readers", type=int, default=32)
+    p.add_argument("--seconds", type=float, default=5)
+    p.add_argument("--write-hold-ms", type=float, default=50)
+    p.add_argument("--journal-mode", default="wal", help="karşılaştırma için: wal | delete")
+    p.set_defaults(func=bench_concurrency)
+
+    p = sub.add_parser("frames", help="yf.download sonrası işleme ölçeklenmesi")
+    p.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 5000])
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--legacy-max", type=int, default=5000, help="eski yolun ölçüleceği en büyük boyut")
+    p.set_defaults(func=bench_frames)
+
+    p = sub.add_parser("fetch", help="eşzamanlı, süre sınırlı sembol çekme")
+    p.add_argument("--symbols", type=int, default=8)
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--max-latency", type=float, default=1.0)
+    p.add_argument("--slow-seconds", type=float, default=3.0)
+    p.add_argument("--timeout", type=float, default=1.5)
+    p.add_argument("--deadline", type=float, default=5.0)
+    p.set_defaults(func=bench_fetch)
+
+    p = sub.add_parser("suite", help="sahte sağlayıcı ile uçtan uca ölçüm paketi (JSON çıktı)")
+    p.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 5000])
+    p.add_argument("--cycles", type=int, default=3)
+    p.add_argument("--requests", type=int, default=500, help="test client: endpoint başına istek")
+    p.add_argument("--http-clients", type=int, default=8)
+    p.add_argument("--http-seconds", type=float, default=2.0)
+    p.add_argument("--latency", type=float, default=0.0, help="sahte sağlayıcı: sembol başına gecikme (sn)")
+    p.add_argument("--failure-rate", type=float, default=0.01)
+    p.add_argument("--rate", type=float, default=1000.0, help="saniyede en fazla indirilen parça")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--output", default="bench_results.json")
+    p.set_defaults(func=bench_suite)
+
+    p = sub.add_parser("market", help="piyasa özeti: snapshot başına hesaplama ve istek süresi")
+    p.add_argument("--symbols", type=int, default=500)
+    p.add_argument("--requests", type=int, default=5000)
+    p.add_argument("--builds", type=int, default=20)
+    p.set_defaults(func=bench_market)
+
+    p = sub.add_parser("formats", help="companies: JSON / columnar / MessagePack, gzip / brotli karşılaştırması")
+    p.add_argument("--symbols", type=int, default=500)
+    p.add_argument("--requests", type=int, default=1000)
+    p.add_argument("--builds", type=int, default=20)
+    p.set_defaults(func=bench_formats)
+
+    p = sub.add_parser("indicators", help="gösterge motoru: artımlı güncelleme maliyeti vs geçmiş uzunluğu")
+    p.add_argument("--symbols", type=int, default=500)
+    p.add_argument("--history", type=int, nargs="+", default=[250, 1000, 2500, 5000])
+    p.add_argument("--cycles", type=int, default=200)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_indicators)
+
+    p = sub.add_parser("risk", help="korelasyon/volatilite matrisi: artımlı vs yeniden hesaplama")
+    p.add_argument("--symbols", type=int, default=117)
+    p.add_argument("--days", type=int, default=500)
+    p.add_argument("--cycles", type=int, default=500)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_risk)
+
+    p = sub.add_parser("startup", help="worker açılışı: import süresi, ağır modüller, sıcak snapshot")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--symbols", type=int, default=117)
+    p.add_argument("--top", type=int, default=8, help="gösterilecek en yavaş doğrudan import sayısı")
+    p.add_argument("--max-import-ms", type=float, default=None, help="aşılırsa çıkış kodu 1")
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("portfolio", help="toplu portföy değerlemesi: pozisyon döngüsü vs seyrek matris")
+    p.add_argument("--portfolios", type=int, default=10000)
+    p.add_argument("--positions", type=int, default=15, help="portföy başına ortalama pozisyon")
+    p.add_argument("--symbols", type=int, default=109, help="sentetik hisse sayısı (+ döviz/maden)")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--builds", type=int, default=20)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_portfolio)
+
+    p = sub.add_parser("batch", help="parçalı, eşzamanlı, yeniden denemeli hisse indirmesi")
+    p.add_argument("--symbols", type=int, default=500)
+    p.add_argument("--chunk-size", type=int, default=50)
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--rate", type=float, default=20.0)
+    p.add_argument("--attempts", type=int, default=3)
+    p.add_argument("--base-delay", type=float, default=0.1)
+    p.add_argument("--latency", type=float, default=0.002, help="sembol başına sahte gecikme (sn)")
+    p.add_argument("--chunk-failure-rate", type=float, default=0.02)
+    p.add_argument("--symbol-miss-rate", type=float, default=0.05)
+    p.add_argument("--dead-rate", type=float, default=0.01)
+    p.set_defaults(func=bench_batch)
+
+    p = sub.add_parser("stream", help="SSE: binlerce boşta bağlantı ve olay dağıtımı")
+    p.add_argument("--symbols", type=int, default=110)
+    p.add_argument("--clients", type=int, default=2000)
+    p.add_argument("--changed", type=int, default=5)
+    p.add_argument("--query", default="", help="ör. '?symbols=SYM0001.IS,SYM0002.IS'")
+    p.set_defaults(func=bench_stream)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
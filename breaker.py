@@ -0,0 +1,169 @@
+# breaker.py
+# Sembol başına hata takibi ve devre kesici (circuit breaker).
+#
+# Eskiden yfinance hız sınırına takıldığında veya hisse işleme kapandığında o
+# sembol için bir 'error' satırı yazılıyor, son geçerli fiyat siliniyor ve sembol
+# bir sonraki tam döngüye (15 dk) kadar boş kalıyordu; arada hiçbir şey yeniden
+# denenmiyordu. Burada her sembolün durumu ayrı tutulur:
+#   - closed:    sağlıklı; her tam döngüde istenir
+#   - retrying:  son istek(ler) başarısız; tam döngüleri beklemeden RETRY_DELAYS
+#                takvimiyle sadece bu semboller yeniden istenir
+#   - open:      TRIP_AFTER kez üst üste başarısız (ölü/durdurulmuş hisse); soğuma
+#                süresi dolana kadar hiç istenmez
+#   - half-open: soğuma doldu; bir sonraki istek deneme isteğidir. Başarılıysa
+#                closed, değilse soğuma iki katına çıkarak (en fazla COOLDOWN_MAX)
+#                tekrar open
+# Başarısız sembollerin Price satırı silinmez; son geçerli değerler 'stale'
+# işaretiyle sunulmaya devam eder (bkz. price_writer.py).
+#
+# Durum sadece lider süreçte tutulur; diğer worker'lar /api/status/breakers
+# üzerinden DB'ye yazılan kopyayı okur.
+from datetime import datetime, timedelta
+
+RETRY_DELAYS = (30, 60, 120, 240)  # Saniye; n. ardışık hatadan sonraki bekleme
+TRIP_AFTER = 5                     # Bu kadar ardışık hatada devre açılır
+COOLDOWN_SECONDS = 30 * 60         # İlk soğuma süresi
+COOLDOWN_MAX_SECONDS = 6 * 60 * 60
+
+STATES = ('closed', 'retrying', 'open', 'half-open')
+
+
+class SymbolBreaker:
+    """
+    Tek bir sembolün hata sayacı ve devre durumu.
+    """
+    __slots__ = ('symbol', 'state', 'failures', 'cooldown', 'next_attempt',
+                 'last_error', 'last_failure', 'last_success', 'trips')
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.state = 'closed'
+        self.failures = 0          # Ardışık hata sayısı
+        self.cooldown = COOLDOWN_SECONDS
+        self.next_attempt = None   # retrying/open: bir sonraki istek zamanı
+        self.last_error = None
+        self.last_failure = None
+        self.last_success = None
+        self.trips = 0             # Devrenin toplam açılma sayısı
+
+    def current_state(self, now):
+        if self.state == 'open' and self.next_attempt <= now:
+            return 'half-open'
+        return self.state
+
+    def allows(self, now):
+        # Açık devre soğuma dolana kadar istenmez
+        return self.state != 'open' or self.next_attempt <= now
+
+    def record_success(self, now):
+        self.state = 'closed'
+        self.failures = 0
+        self.cooldown = COOLDOWN_SECONDS
+        self.next_attempt = None
+        self.last_error = None
+        self.last_success = now
+
+    def record_failure(self, error, now):
+        probe = self.state == 'open'  # Soğuma sonrası deneme isteği
+        self.failures += 1
+        self.last_error = error
+        self.last_failure = now
+        if probe:
+            self.cooldown = min(COOLDOWN_MAX_SECONDS, self.cooldown * 2)
+        if probe or self.failures >= TRIP_AFTER:
+            if not probe:
+                self.trips += 1
+            self.state = 'open'
+            self.next_attempt = now + timedelta(seconds=self.cooldown)
+        else:
+            self.state = 'retrying'
+            delay = RETRY_DELAYS[min(self.failures, len(RETRY_DELAYS)) - 1]
+            self.next_attempt = now + timedelta(seconds=delay)
+
+    def status(self, now):
+        return {
+            "symbol": self.symbol,
+            "state": self.current_state(now),
+            "failures": self.failures,
+            "trips": self.trips,
+            "lastError": self.last_error,
+            "lastFailure": self.last_failure.isoformat() if self.last_failure else None,
+            "lastSuccess": self.last_success.isoformat() if self.last_success else None,
+            "nextAttempt": self.next_attempt.isoformat() if self.next_attempt else None,
+        }
+
+
+class QuoteBreakers:
+    """
+    Tüm sembollerin devre kesicileri. Sadece lider sürecin güncelleme
+    thread'inden kullanılır (kilit gerekmez).
+    """
+
+    def __init__(self):
+        self._breakers = {}
+
+    def reset(self):
+        """
+        Tüm durumu unutur (liderlik değiştiğinde çağrılır).
+        """
+        self._breakers = {}
+
+    def _get(self, symbol):
+        breaker = self._breakers.get(symbol)
+        if breaker is None:
+            breaker = self._breakers[symbol] = SymbolBreaker(symbol)
+        return breaker
+
+    def allowed(self, symbols, now=None):
+        """
+        Bu döngüde istenecek semboller (açık devreliler hariç, sıra korunur).
+        """
+        now = now or datetime.now()
+        breakers = self._breakers
+        return [s for s in symbols if s not in breakers or breakers[s].allows(now)]
+
+    def record(self, rows, now=None):
+        """
+        Upstream'den dönen satırları işler: fiyatı olan satır başarı, olmayan hatadır.
+        Durumu değişen sembolleri döndürür.
+        """
+        now = now or datetime.now()
+        changed = []
+        for row in rows:
+            breaker = self._get(row['symbol'])
+            before = breaker.state
+            if row.get('price') is not None:
+                breaker.record_success(now)
+            else:
+                breaker.record_failure(row.get('error') or 'fiyat yok', now)
+            if breaker.state != before:
+                changed.append(row['symbol'])
+        return changed
+
+    def due(self, symbols, now=None):
+        """
+        'symbols' içinden hedefli yeniden deneme zamanı gelmiş olanlar
+        (retrying ve soğuması dolmuş open).
+        """
+        now = now or datetime.now()
+        breakers = self._breakers
+        return [s for s in symbols
+                if s in breakers and breakers[s].state != 'closed' and breakers[s].next_attempt <= now]
+
+    def seconds_until_next(self, symbols, now=None, cap=60):
+        """
+        'symbols' içindeki en yakın yeniden denemeye kalan süre (en fazla cap saniye).
+        """
+        now = now or datetime.now()
+        pending = [self._breakers[s].next_attempt for s in symbols
+                   if s in self._breakers and self._breakers[s].state != 'closed']
+        if not pending:
+            return cap
+        return max(0.0, min(cap, min((t - now).total_seconds() for t in pending)))
+
+    def status(self, now=None):
+        now = now or datetime.now()
+        return [b.status(now) for b in self._breakers.values()]
+
+
+quote_breakers = QuoteBreakers()
@@ -0,0 +1,91 @@
+# cache.py
+# Kısa ömürlü (TTL) süreç içi önbellek.
+#
+# - Taze değer varsa doğrudan döner.
+# - Değer eskimiş ama "stale" penceresi içindeyse eski değer HEMEN döner ve
+#   arka planda tek bir yenileme başlatılır (stale-while-revalidate).
+# - Değer hiç yoksa aynı anahtar için gelen eşzamanlı istekler tek bir
+#   yükleme çağrısını paylaşır (single-flight); N istek = 1 upstream çağrısı.
+import threading
+import time
+import traceback
+
+
+class _Flight:
+    """
+    Devam eden tek bir yükleme; bekleyenler event üzerinden sonucu alır.
+    """
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    ttl saniye taze, ardından stale_ttl saniye daha "eski ama kullanılabilir"
+    kabul edilen değerleri tutar. Hatalar önbelleğe alınmaz.
+    """
+
+    def __init__(self, ttl, stale_ttl=0, clock=time.monotonic):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}   # key -> (loaded_at, value)
+        self._inflight = {}  # key -> _Flight
+
+    def get(self, key, loader):
+        """
+        key için değeri döndürür; gerekiyorsa loader() ile yükler.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = self._clock() - entry[0]
+                if age < self.ttl:
+                    return entry[1]
+                if age < self.ttl + self.stale_ttl:
+                    if key not in self._inflight:
+                        flight = self._inflight[key] = _Flight()
+                        threading.Thread(target=self._load_in_background, args=(key, loader, flight),
+                                         daemon=True).start()
+                    return entry[1]
+
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._inflight[key] = _Flight()
+
+        if owner:
+            self._load(key, loader, flight)
+        else:
+            flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _load(self, key, loader, flight):
+        try:
+            flight.value = loader()
+            with self._lock:
+                self._entries[key] = (self._clock(), flight.value)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def _load_in_background(self, key, loader, flight):
+        self._load(key, loader, flight)
+        if flight.error is not None:
+            # Eski değer bir sonraki denemeye kadar kullanılmaya devam eder
+            print(f"HATA (önbellek arka plan yenileme: {key}): {flight.error}")
+            traceback.print_exception(flight.error)
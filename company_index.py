@@ -0,0 +1,188 @@
+# company_index.py
+# /api/bist100/companies için filtreleme, alan seçimi (projeksiyon), sıralama ve
+# sayfalama.
+#
+# Sadece döviz fiyatlarına ihtiyaç duyan bir widget eskiden tüm hisse satırlarını
+# indirip ayrıştırmak zorundaydı. Burada snapshot her yeniden oluşturulduğunda
+# (yani her Price yazımından sonra bir kez) tür, sektör ve sembol indeksleri payload
+# üzerinden tek geçişte (O(N)) kurulur. İndeks snapshot'ın bir parçası olduğu için
+# yenisiyle birlikte atomik olarak devreye girer; istek anında SQLite'a gidilmez.
+#
+# Sıralama düzenleri (sort=price gibi) pahalı olduğu için indeksle birlikte değil,
+# o alan ilk kez istendiğinde hesaplanır ve snapshot boyunca saklanır.
+import numpy as np
+
+MAX_LIMIT = 1000
+MAX_LIST_ITEMS = 200  # type/sector/symbols/fields parametrelerinde en fazla öğe
+
+# Satırların alanları (bkz. snapshot.build_companies_payload)
+FIELDS = ('symbol', 'name', 'type', 'sector', 'price', 'previousClose', 'open', 'high', 'low',
+          'volume', 'timestamp', 'error', 'stale', 'revision')
+
+
+def _split(value, name):
+    # 'a,b,,c ' -> ('a', 'b', 'c'); boş veya None -> None
+    if value is None:
+        return None
+    items = tuple(sorted({v.strip() for v in value.split(',') if v.strip()}))
+    if not items:
+        return None
+    if len(items) > MAX_LIST_ITEMS:
+        raise ValueError(f"{name} en fazla {MAX_LIST_ITEMS} öğe içerebilir")
+    return items
+
+
+class CompanyQuery:
+    """
+    Ayrıştırılmış ve normalize edilmiş sorgu. Aynı anlama gelen sorgular
+    (örn. type=a,b ve type=b,a) aynı 'key' değerini üretir.
+    """
+    __slots__ = ('types', 'sectors', 'symbols', 'fields', 'sort', 'descending', 'limit', 'cursor')
+
+    PARAMS = ('type', 'sector', 'symbols', 'fields', 'sort', 'limit', 'cursor')
+
+    def __init__(self, types=None, sectors=None, symbols=None, fields=None, sort=None,
+                 descending=False, limit=None, cursor=0):
+        self.types = types
+        self.sectors = sectors
+        self.symbols = symbols
+        self.fields = fields
+        self.sort = sort
+        self.descending = descending
+        self.limit = limit
+        self.cursor = cursor
+
+    @classmethod
+    def from_args(cls, args):
+        """
+        İstek parametrelerinden sorgu oluşturur. Geçersiz değerde ValueError fırlatır.
+        """
+        fields = _split(args.get('fields'), 'fields')
+        if fields is not None:
+            unknown = [f for f in fields if f not in FIELDS]
+            if unknown:
+                raise ValueError(f"Bilinmeyen alan: {', '.join(unknown)} (geçerli: {', '.join(FIELDS)})")
+
+        sort = args.get('sort') or None
+        descending = False
+        if sort is not None:
+            descending = sort.startswith('-')
+            sort = sort.lstrip('-')
+            if sort not in FIELDS:
+                raise ValueError(f"Bilinmeyen sıralama alanı: {sort}")
+
+        limit = args.get('limit')
+        if limit is not None:
+            if not limit.isdigit() or not 1 <= int(limit) <= MAX_LIMIT:
+                raise ValueError(f"limit 1 ile {MAX_LIMIT} arasında olmalı")
+            limit = int(limit)
+
+        cursor = args.get('cursor') or '0'
+        if not cursor.isdigit():
+            raise ValueError("Geçersiz cursor")
+
+        return cls(types=_split(args.get('type'), 'type'),
+                   sectors=_split(args.get('sector'), 'sector'),
+                   symbols=_split(args.get('symbols'), 'symbols'),
+                   fields=fields, sort=sort, descending=descending,
+                   limit=limit, cursor=int(cursor))
+
+    @property
+    def key(self):
+        return (self.types, self.sectors, self.symbols, self.fields,
+                self.sort, self.descending, self.limit, self.cursor)
+
+
+class QueryResult:
+    """
+    rows: bu sayfadaki (projeksiyonu yapılmış) satırlar
+    total: filtreye uyan toplam satır sayısı
+    next_cursor: sonraki sayfanın cursor'ı (son sayfada None)
+    """
+    __slots__ = ('rows', 'total', 'next_cursor')
+
+    def __init__(self, rows, total, next_cursor):
+        self.rows = rows
+        self.total = total
+        self.next_cursor = next_cursor
+
+
+class CompanyIndex:
+    """
+    Bir snapshot payload'u üzerindeki değişmez indeksler.
+    Payload'daki satırlar sırasıyla (pozisyonlarıyla) tutulur; filtreler
+    pozisyon dizileri üzerinde çalışır.
+    """
+
+    def __init__(self, payload):
+        self.payload = payload
+        by_type, by_sector, by_symbol = {}, {}, {}
+        for i, row in enumerate(payload):
+            by_type.setdefault(row['type'], []).append(i)
+            by_sector.setdefault(row['sector'], []).append(i)
+            by_symbol[row['symbol']] = i
+        # Listeler pozisyon sırasıyla doldu; yani diziler zaten sıralı
+        self.by_type = {k: np.array(v, dtype=np.intp) for k, v in by_type.items()}
+        self.by_sector = {k: np.array(v, dtype=np.intp) for k, v in by_sector.items()}
+        self.by_symbol = by_symbol
+        self._ranks = {}
+
+    def _positions(self, groups, index):
+        arrays = [index[g] for g in groups if g in index]
+        if not arrays:
+            return np.empty(0, dtype=np.intp)
+        if len(arrays) == 1:
+            return arrays[0]
+        # Bir satır tek bir türe/sektöre ait olduğundan gruplar kesişmez
+        return np.sort(np.concatenate(arrays))
+
+    def _rank(self, field, descending):
+        """
+        Alanın sıralamasında her pozisyonun sırası (ilk istendiğinde hesaplanır).
+        Değeri olmayan (None) satırlar yönden bağımsız olarak en sona gider;
+        eşitlikte sembol adı sırası korunur.
+        """
+        key = (field, descending)
+        rank = self._ranks.get(key)
+        if rank is None:
+            payload = self.payload
+            by_symbol = sorted(range(len(payload)), key=lambda i: payload[i]['symbol'])
+            present = [i for i in by_symbol if payload[i][field] is not None]
+            missing = [i for i in by_symbol if payload[i][field] is None]
+            present.sort(key=lambda i: payload[i][field], reverse=descending)  # sort kararlıdır
+            rank = np.empty(len(payload), dtype=np.intp)
+            rank[present + missing] = np.arange(len(payload))
+            # (Eşzamanlı iki istek aynı düzeni hesaplayabilir; sonuç aynı olduğundan zararsız)
+            self._ranks[key] = rank
+        return rank
+
+    def query(self, q):
+        """
+        Filtreleri uygular, sıralar, sayfalar ve istenen alanları seçer.
+        """
+        positions = None
+        if q.types is not None:
+            positions = self._positions(q.types, self.by_type)
+        if q.sectors is not None:
+            selected = self._positions(q.sectors, self.by_sector)
+            positions = selected if positions is None else np.intersect1d(positions, selected, assume_unique=True)
+        if q.symbols is not None:
+            selected = np.array(sorted(self.by_symbol[s] for s in q.symbols if s in self.by_symbol), dtype=np.intp)
+            positions = selected if positions is None else np.intersect1d(positions, selected, assume_unique=True)
+        if positions is None:
+            positions = np.arange(len(self.payload), dtype=np.intp)
+
+        if q.sort is not None:
+            positions = positions[np.argsort(self._rank(q.sort, q.descending)[positions], kind='stable')]
+
+        total = len(positions)
+        end = total if q.limit is None else min(total, q.cursor + q.limit)
+        page = positions[q.cursor:end].tolist()
+        next_cursor = end if end < total else None
+
+        payload = self.payload
+        if q.fields is None:
+            rows = [payload[i] for i in page]
+        else:
+            rows = [{f: payload[i][f] for f in q.fields} for i in page]
+        return QueryResult(rows, total, next_cursor)
@@ -1,10 +1,37 @@
 # db_models.py
 import peewee as pw
+from playhouse.pool import PooledSqliteDatabase
 from datetime import datetime
 
 # Veritabanı dosyamızı tanımlıyoruz. 
 # Proje dizininde 'sanbist.db' adında bir dosya oluşturulacak.
-db = pw.SqliteDatabase('sanbist.db')
+#
+# Bağlantı havuzu: her thread kendi bağlantısını alır (peewee thread-local),
+# close() bağlantıyı kapatmaz, havuza geri koyar. Böylece her API isteğinde
+# yeniden bağlantı kurma maliyeti ödenmez.
+#
+# WAL modu: okuyucular, arka plan thread'inin yazma transaction'ını beklemez
+# ("database is locked" beklemeleri biter). Yazıcı tek olduğu sürece
+# synchronous=NORMAL WAL'da güvenlidir.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64 * 1024,       # 64 MB sayfa önbelleği (negatif = KiB)
+    'mmap_size': 256 * 1024 * 1024, # 256 MB bellek eşlemeli okuma
+    'temp_store': 'memory',
+    'busy_timeout': 10 * 1000,      # Kilitli ise 10 sn'ye kadar bekle (ms)
+}
+
+db = PooledSqliteDatabase(
+    'sanbist.db',
+    max_connections=32,
+    stale_timeout=300,  # 5 dk kullanılmayan bağlantıyı yenile
+    timeout=10,         # Havuz doluysa en fazla 10 sn bekle
+    pragmas=SQLITE_PRAGMAS,
+    # Havuza dönen bağlantıyı başka bir thread alabilir; aynı anda
+    # yine tek thread kullandığı için sqlite3'ün thread kontrolü kapatılır.
+    check_same_thread=False,
+)
 
 # Tüm modellerimiz için temel bir sınıf
 class BaseModel(pw.Model):
@@ -46,17 +73,153 @@ class Price(BaseModel):
     # Veri çekme hatası olursa buraya yazılır
     error = pw.CharField(max_length=255, null=True)
 
+    # Satırın değerleri en son hangi nesilde (DataVersion) değişti?
+    # Sadece fiyat alanları gerçekten değiştiğinde artar; ?since= sorgusu bunu kullanır.
+    revision = pw.BigIntegerField(default=0, index=True)
+
     class Meta:
         # Fiyat verilerini en son güncellenene göre sıralamak için
         ordering = ['timestamp']
 
+# --- 3. VERİ SÜRÜMÜ (NESİL SAYACI) ---
+# Fiyat verisinin kaçıncı "nesil" olduğunu tutar.
+class DataVersion(BaseModel):
+    """
+    Verinin nesil (generation) sayacını tutar.
+    Arka plan thread'i her başarılı Price yazımında sayacı bir artırır.
+    Gunicorn worker'ları bellek içi snapshot'larının güncel olup olmadığını
+    bu sayaca bakarak anlar (her worker'ın kendi belleği vardır).
+    """
+    key = pw.CharField(primary_key=True, max_length=50)
+    generation = pw.BigIntegerField(default=0)
+
+PRICES_VERSION_KEY = 'prices'
+
+def get_generation(key=PRICES_VERSION_KEY):
+    """
+    Verilen anahtarın güncel nesil numarasını döndürür (kayıt yoksa 0).
+    """
+    row = (DataVersion
+           .select(DataVersion.generation)
+           .where(DataVersion.key == key)
+           .tuples()
+           .first())
+    return row[0] if row else 0
+
+def bump_generation(key=PRICES_VERSION_KEY):
+    """
+    Nesil sayacını bir artırır ve yeni değeri döndürür.
+    Yazma ile aynı transaction (db.atomic) içinde çağrılmalıdır ki
+    sayaç ile veri her zaman birlikte commit edilsin.
+    """
+    (DataVersion
+     .insert(key=key, generation=1)
+     .on_conflict(conflict_target=[DataVersion.key],
+                  update={DataVersion.generation: DataVersion.generation + 1})
+     .execute())
+    return get_generation(key)
+
+# --- 4. FİYAT GEÇMİŞİ (ZAMAN SERİSİ) ---
+# Price tablosu sembol başına tek satır tutar ve her döngüde üzerine yazılır.
+# Grafikler için her güncellemede buraya da bir nokta eklenir.
+class PriceHistory(BaseModel):
+    """
+    Sembol başına zaman serisi. İki tür satır vardır:
+    - 'tick': arka plan güncellemesinin o anki fiyatı (open=high=low=close=fiyat,
+      volume=o ana kadarki günlük hacim)
+    - '1d'  : eski tick'lerin sıkıştırılmasıyla oluşan günlük OHLCV barı
+    (symbol, timestamp) birincil anahtardır ve tablo WITHOUT ROWID olduğu için
+    satırlar bu anahtara göre kümelenir; aralık sorguları indeksin kendisinden okunur.
+    """
+    symbol = pw.CharField(max_length=20)
+    timestamp = pw.DateTimeField()
+    interval = pw.CharField(max_length=8, default='tick')  # tick | 1d
+    open = pw.FloatField(null=True)
+    high = pw.FloatField(null=True)
+    low = pw.FloatField(null=True)
+    close = pw.FloatField(null=True)
+    volume = pw.BigIntegerField(null=True)
+
+    class Meta:
+        primary_key = pw.CompositeKey('symbol', 'timestamp')
+        without_rowid = True
+
+# --- 5. ARKA PLAN LİDERLİK KAYDI ---
+# Hangi sürecin fiyat güncelleyici lider olduğunu gösterir (sadece bilgi amaçlı;
+# asıl kilit dosya kilididir, bkz. leader.py).
+class RefresherLease(BaseModel):
+    """
+    Arka plan fiyat güncelleyicisinin o anki sahibini ve son kalp atışını tutar.
+    Lider süreç birkaç saniyede bir heartbeat_at alanını günceller.
+    """
+    name = pw.CharField(primary_key=True, max_length=50)
+    holder = pw.CharField(max_length=255)  # hostname:pid
+    pid = pw.IntegerField()
+    acquired_at = pw.DateTimeField(default=datetime.now)
+    heartbeat_at = pw.DateTimeField(default=datetime.now)
+
+# --- 6. GÜNCELLEME PLANI ---
+# Lider sürecin varlık sınıfı başına planı (bkz. scheduler.py). Her worker
+# /api/status/schedule üzerinden okuyabilsin diye DB'ye yazılır.
+class RefreshSchedule(BaseModel):
+    """
+    Varlık sınıfı başına bir satır: planın JSON hali ve son güncellenme zamanı.
+    """
+    asset_class = pw.CharField(primary_key=True, max_length=20)
+    status = pw.TextField()  # JSON (AssetClassSchedule.status çıktısı)
+    updated_at = pw.DateTimeField(default=datetime.now)
+
+# --- 7. GEÇMİŞ YÜKLEME KAPSAMI ---
+# backfill.py'nin hangi sembol için hangi tarih aralıklarını tamamladığı.
+# Aralık, barlarıyla aynı transaction'da yazılır; yarıda kesilen bir yükleme
+# yeniden çalıştırıldığında sadece kaydı olmayan aralıkları indirir.
+class HistoryCoverage(BaseModel):
+    """
+    Sembol başına tamamlanmış günlük bar aralığı: [start, end) (end hariç).
+    Aralıkta bar olmaması (tatil, halka arz öncesi) da 'tamamlandı' sayılır.
+    """
+    symbol = pw.CharField(max_length=20)
+    start = pw.DateField()
+    end = pw.DateField()
+    updated_at = pw.DateTimeField(default=datetime.now)
+
+    class Meta:
+        primary_key = pw.CompositeKey('symbol', 'start')
+        without_rowid = True
+
+# --- 8. SEMBOL DEVRE KESİCİLERİ ---
+# Lider sürecin sembol başına hata/devre durumu (bkz. breaker.py). Her worker
+# /api/status/breakers üzerinden okuyabilsin diye DB'ye yazılır.
+class QuoteBreaker(BaseModel):
+    """
+    Sembol başına bir satır: devre durumunun JSON hali ve son güncellenme zamanı.
+    """
+    symbol = pw.CharField(primary_key=True, max_length=20)
+    state = pw.CharField(max_length=10)
+    status = pw.TextField()  # JSON (SymbolBreaker.status çıktısı)
+    updated_at = pw.DateTimeField(default=datetime.now)
+
 # --- Tabloları Oluşturma Fonksiyonu ---
 def create_tables():
     """
     Veritabanı bağlantısını açar ve tabloları (eğer yoksa) oluşturur.
+    Eski şemadaki tablolara sonradan eklenen kolonları da ekler.
     """
     with db:
-        db.create_tables([Company, Price])
+        db.create_tables([Company, Price, DataVersion, PriceHistory, RefresherLease, RefreshSchedule,
+                          HistoryCoverage, QuoteBreaker])
+        migrate_tables()
+
+def migrate_tables():
+    """
+    Var olan tablolarda eksik kolonları (ve indekslerini) ekler.
+    Açık bir bağlantı içinde çağrılmalıdır.
+    """
+    price_columns = {c.name for c in db.get_columns('price')}
+    if 'revision' not in price_columns:
+        # SQLite, NOT NULL kolonu sabit bir DEFAULT ile doğrudan ekleyebilir
+        db.execute_sql('ALTER TABLE "price" ADD COLUMN "revision" INTEGER NOT NULL DEFAULT 0')
+        db.execute_sql('CREATE INDEX IF NOT EXISTS "price_revision" ON "price" ("revision")')
 
 # Bu dosya doğrudan çalıştırılırsa tabloları oluştursun
 if __name__ == '__main__':
@@ -0,0 +1,258 @@
+# derived.py
+# Türetilmiş (sentetik) enstrümanlar: diğer sembollerin formülü olarak tanımlanır.
+#
+# Eskiden gram altın/gümüş/platin update_prices_task içinde calculate_synthetic ile
+# elle hesaplanıyor, girdiler her seferinde listede next(...) ile aranıyor ve girdi
+# değişmese bile her döngüde yeniden hesaplanıyordu. Burada:
+#   - Her türetilmiş enstrüman (sembol, girdiler, formül, seed bilgileri) bir kez
+#     DERIVED_INSTRUMENTS listesinde bildirilir; seed_database.py de buradan okur.
+#   - Bağımlılıklar bir DAG olarak çözülür (türetilmiş bir sembol başka bir
+#     türetilmişe dayanabilir, örn. çeyrek altın -> gram altın -> ons + kur).
+#   - Değerler sembol -> sütun indeksli 2xN bir matriste tutulur (satır 0 = fiyat,
+#     satır 1 = önceki kapanış); formüller iki satıra aynı anda uygulanır, yani
+#     fiyat ve önceki kapanış tek geçişte hesaplanır.
+#   - Sadece girdisi değişen düğümler (ve onlara bağlı olanlar) yeniden hesaplanır.
+from datetime import datetime
+
+import numpy as np
+
+ONS_TO_GRAM_DIVISOR = 31.1035  # 1 troy ons = 31.1035 gram
+
+# Cumhuriyet altınları 22 ayar (0.916 saflık) ve brüt ağırlıkları (gram)
+GOLD_22K_PURITY = 0.916
+CEYREK_ALTIN_GRAMS = 1.754
+YARIM_ALTIN_GRAMS = 3.508
+TAM_ALTIN_GRAMS = 7.016
+
+
+class Derived:
+    """
+    Tek bir türetilmiş enstrümanın bildirimi.
+    formula, girdiler sırasıyla verilen NumPy dizilerini alır ve aynı şekilde
+    bir dizi döndürür (sadece aritmetik; NaN girdiler NaN sonuç verir).
+    """
+    __slots__ = ('symbol', 'inputs', 'formula', 'name', 'type', 'sector')
+
+    def __init__(self, symbol, inputs, formula, name, type, sector):
+        self.symbol = symbol
+        self.inputs = tuple(inputs)
+        self.formula = formula
+        self.name = name
+        self.type = type
+        self.sector = sector
+
+    def metadata(self):
+        # Company tablosuna yazılan statik bilgiler (seed_database.py)
+        return {'symbol': self.symbol, 'type': self.type, 'name': self.name, 'sector': self.sector}
+
+
+def ons_to_gram_try(ons, usd):
+    # Ons (USD) fiyatını gram (TL) fiyatına çevirir
+    return ons / ONS_TO_GRAM_DIVISOR * usd
+
+
+def coin(grams):
+    # Gram altından (24 ayar) 22 ayar Cumhuriyet altını
+    return lambda gram_gold: gram_gold * grams * GOLD_22K_PURITY
+
+
+def basket(*weights):
+    # Ağırlıklı sepet: sum(w_i * x_i)
+    return lambda *values: sum(w * v for w, v in zip(weights, values))
+
+
+DERIVED_INSTRUMENTS = [
+    Derived('GRAMALTIN', ('GC=F', 'USDTRY=X'), ons_to_gram_try, 'Gram Altın (TL)', 'maden_gram', 'maden'),
+    Derived('GRAMGUMUS', ('SI=F', 'USDTRY=X'), ons_to_gram_try, 'Gram Gümüş (TL)', 'maden_gram', 'maden'),
+    Derived('GRAMPLATIN', ('PL=F', 'USDTRY=X'), ons_to_gram_try, 'Gram Platin (TL)', 'maden_gram', 'maden'),
+    Derived('CEYREKALTIN', ('GRAMALTIN',), coin(CEYREK_ALTIN_GRAMS), 'Çeyrek Altın (TL)', 'maden_sikke', 'maden'),
+    Derived('YARIMALTIN', ('GRAMALTIN',), coin(YARIM_ALTIN_GRAMS), 'Yarım Altın (TL)', 'maden_sikke', 'maden'),
+    Derived('TAMALTIN', ('GRAMALTIN',), coin(TAM_ALTIN_GRAMS), 'Tam Altın (TL)', 'maden_sikke', 'maden'),
+    # Çapraz kur: doğrudan kotasyonla karşılaştırıp tutarsızlığı görmek için
+    Derived('EURTRY_CAPRAZ', ('EURUSD=X', 'USDTRY=X'), lambda eurusd, usd: eurusd * usd,
+            'Euro/TL (Çapraz)', 'doviz_capraz', 'doviz'),
+    # TCMB kur sepeti: 0.5 USD + 0.5 EUR
+    Derived('DOVIZSEPETI', ('USDTRY=X', 'EURTRY=X'), basket(0.5, 0.5),
+            'Döviz Sepeti (0.5 USD + 0.5 EUR)', 'doviz_sepet', 'doviz'),
+]
+
+
+def resolve_order(instruments):
+    """
+    Türetilmiş enstrümanları bağımlılık sırasına dizer (Kahn algoritması).
+    Tekrarlanan sembol veya döngüsel bağımlılıkta ValueError fırlatır.
+    """
+    by_symbol = {}
+    for d in instruments:
+        if d.symbol in by_symbol:
+            raise ValueError(f"Türetilmiş sembol iki kez tanımlanmış: {d.symbol}")
+        by_symbol[d.symbol] = d
+
+    pending = {s: {i for i in d.inputs if i in by_symbol} for s, d in by_symbol.items()}
+    order = []
+    ready = [s for s, deps in pending.items() if not deps]
+    while ready:
+        symbol = ready.pop(0)
+        order.append(by_symbol[symbol])
+        del pending[symbol]
+        for other, deps in pending.items():
+            if symbol in deps:
+                deps.discard(symbol)
+                if not deps and other not in ready:
+                    ready.append(other)
+    if pending:
+        raise ValueError(f"Türetilmiş enstrümanlarda döngüsel bağımlılık: {', '.join(sorted(pending))}")
+    return order
+
+
+class DerivedResult:
+    """
+    Bir değerlendirmenin sonucu.
+    rows: tüm türetilmiş semboller için Price satırları (hesaplanamayanlar 'error' ile)
+    recomputed: bu geçişte yeniden hesaplanan semboller
+    change / change_percent: symbol -> günlük değişim (fiyat - önceki kapanış);
+    hesaplanamayanlar None. Price tablosunda ve payload'da hiçbir satırın değişim
+    kolonu yoktur; market.py değişimi her satır için fiyat ve önceki kapanıştan
+    bulur, bu yüzden türetilmişler de yükselen/düşen listelerine girer.
+    """
+    __slots__ = ('rows', 'recomputed', 'change', 'change_percent')
+
+    def __init__(self, rows, recomputed, change, change_percent):
+        self.rows = rows
+        self.recomputed = recomputed
+        self.change = change
+        self.change_percent = change_percent
+
+
+class DerivedEngine:
+    """
+    Girdi fiyatlarının bellek içi kopyasını tutar ve türetilmişleri artımlı hesaplar.
+    Kopya boşsa (ilk kullanım veya reset() sonrası) çağıran load() ile doldurmalıdır.
+    """
+
+    def __init__(self, instruments=DERIVED_INSTRUMENTS):
+        self.order = resolve_order(instruments)
+        self.derived_symbols = [d.symbol for d in self.order]
+        derived = set(self.derived_symbols)
+        self.base_symbols = sorted({i for d in self.order for i in d.inputs if i not in derived})
+        self._base = frozenset(self.base_symbols)
+
+        # Sembol -> sütun indeksi: önce temel girdiler, sonra DAG sırasıyla türetilmişler
+        self.index = {s: i for i, s in enumerate(self.base_symbols + self.derived_symbols)}
+        self._input_idx = [np.array([self.index[i] for i in d.inputs]) for d in self.order]
+        self._dependents = {s: [] for s in self.index}
+        for d in self.order:
+            for i in d.inputs:
+                self._dependents[i].append(d.symbol)
+        self.reset()
+
+    def reset(self):
+        """
+        Bellek içi değerleri unutur; sonraki evaluate() her şeyi yeniden hesaplar.
+        """
+        self._values = np.full((2, len(self.index)), np.nan)
+        self._loaded = False    # Temel girdiler DB'den yüklendi mi
+        self._computed = False  # İlk tam hesaplama yapıldı mı
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def load(self, quotes):
+        """
+        Temel girdileri (örn. DB'deki son Price satırlarından) yükler.
+        quotes: symbol -> (price, previousClose)
+        """
+        self.update(quotes)
+        self._loaded = True
+
+    def update(self, quotes):
+        """
+        Temel girdileri günceller, değeri değişen sembolleri döndürür.
+        quotes: symbol -> (price, previousClose). Fiyatı olmayan (hatalı) kotasyonlar
+        yok sayılır; türetilmişler son geçerli girdiyle hesaplanmaya devam eder.
+        """
+        changed = set()
+        for symbol, (price, prev_close) in quotes.items():
+            if symbol not in self._base or price is None:
+                continue
+            col = self.index[symbol]
+            new = np.array([np.nan if price is None else price,
+                            np.nan if prev_close is None else prev_close], dtype=float)
+            if not np.array_equal(self._values[:, col], new, equal_nan=True):
+                self._values[:, col] = new
+                changed.add(symbol)
+        return changed
+
+    def evaluate(self, quotes, now=None):
+        """
+        Yeni temel girdileri işler ve sadece etkilenen türetilmişleri yeniden hesaplar.
+        Girdisi eksik (NaN fiyat) olan türetilmişler için fiyatsız bir hata satırı
+        üretilir; her türetilmiş sembolün her döngüde bir satırı olur.
+        """
+        dirty = set()
+        stack = list(self.update(quotes))
+        if not self._computed:
+            # İlk geçiş: her şeyi hesapla
+            stack = list(self.base_symbols)
+            self._computed = True
+        while stack:
+            for dependent in self._dependents[stack.pop()]:
+                if dependent not in dirty:
+                    dirty.add(dependent)
+                    stack.append(dependent)
+
+        values = self._values
+        recomputed = []
+        for d, idx in zip(self.order, self._input_idx):
+            if d.symbol not in dirty:
+                continue
+            col = self.index[d.symbol]
+            # values[:, idx] -> (2, girdi sayısı); her girdi sütunu [fiyat, önceki kapanış]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values[:, col] = d.formula(*values[:, idx].T)
+            recomputed.append(d.symbol)
+
+        # Değişim alanları tüm türetilmişler için aynı geçişte, tek vektör işlemiyle
+        cols = np.array([self.index[s] for s in self.derived_symbols])
+        price, prev_close = values[0, cols], values[1, cols]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            change = price - prev_close
+            change_percent = change / prev_close * 100
+
+        now = now or datetime.now()
+        rows = []
+        change_map = {s: None if ch != ch else ch for s, ch in zip(self.derived_symbols, change.tolist())}
+        percent_map = {s: None if pct != pct else pct for s, pct in zip(self.derived_symbols, change_percent.tolist())}
+        for d, p, pc in zip(self.order, price.tolist(), prev_close.tolist()):
+            if p != p:
+                # NaN: girdi eksik. Satır yine yazılır; price_writer son geçerli
+                # değer varsa onu korur (stale), yoksa fiyatsız hata satırı olur
+                missing = [i for i in d.inputs if np.isnan(values[0, self.index[i]])]
+                rows.append({'symbol': d.symbol, 'price': None, 'previousClose': None, 'timestamp': now,
+                             'error': f"Girdi fiyatı yok: {', '.join(missing)}"})
+                continue
+            rows.append({'symbol': d.symbol, 'price': p,
+                         'previousClose': None if pc != pc else pc, 'timestamp': now})
+        return DerivedResult(rows, recomputed, change_map, percent_map)
+
+
+def fill_derived_history(symbols, closes, instruments=DERIVED_INSTRUMENTS):
+    """
+    (n, T) kapanış matrisinde türetilmiş sembollerin eksik (NaN) günlerini
+    girdilerinin kapanışlarından formülle doldurur (DAG sırasıyla; yerinde).
+    Upstream'i olmayan türetilmişlerin geçmişi böylece sadece girdilerinden gelir.
+    """
+    position = {s: i for i, s in enumerate(symbols)}
+    for d in resolve_order(instruments):
+        if d.symbol not in position or not all(i in position for i in d.inputs):
+            continue
+        with np.errstate(invalid='ignore', divide='ignore'):
+            computed = d.formula(*(closes[position[i]] for i in d.inputs))
+        row = closes[position[d.symbol]]
+        missing = np.isnan(row)
+        row[missing] = computed[missing]
+    return closes
+
+
+derived_engine = DerivedEngine()
@@ -0,0 +1,146 @@
+# fetchers.py
+# Upstream (yfinance) çağrılarını eşzamanlı ve süre sınırlı çalıştıran yardımcılar.
+#
+# Tek tek yapılan ağ çağrılarında en yavaş sembol tüm döngüyü (ve DB yazmayı)
+# geciktirir. Burada çağrılar sınırlı bir thread havuzunda paralel çalışır;
+# her sembolün kendi süre sınırı, tüm döngünün de toplam bir son tarihi vardır.
+# Süresi dolan semboller beklenmez, hata olarak işaretlenir.
+#
+# Toplu (yf.download biçimli) indirmelerde ise evren parçalara (chunk) bölünür;
+# bir parçanın veya sembolün hatası tüm partiyi çöpe atmaz, sadece o kısım
+# yeniden denenir ve sonuçlar tek bir geniş tabloda birleştirilir.
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+
+from ratelimit import TokenBucket
+
+# Bekleme döngüsünün en uzun uyku süresi; yeni başlayan işlerin süre sınırı
+# en geç bu kadar gecikmeyle fark edilir.
+_POLL_SECONDS = 0.05
+
+
+def fetch_all_with_deadline(symbols, fetch_one, max_workers=8, per_symbol_timeout=10.0,
+                            deadline=30.0, clock=time.monotonic):
+    """
+    fetch_one(symbol) çağrılarını en fazla max_workers thread ile paralel çalıştırır.
+
+    - Bir çağrı başladıktan sonra per_symbol_timeout saniyede bitmezse beklenmez.
+    - Toplam süre deadline saniyeyi geçerse bitmeyen (veya hiç başlamayan) tüm
+      semboller bırakılır.
+    (results, errors) döndürür: symbol -> sonuç ve symbol -> hata mesajı.
+    Bırakılan thread'ler arka planda kendi kendine biter; sonuçları yok sayılır.
+    """
+    results, errors = {}, {}
+    if not symbols:
+        return results, errors
+
+    started = {}
+
+    def run(symbol):
+        started[symbol] = clock()
+        return fetch_one(symbol)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fetch')
+    futures = {executor.submit(run, s): s for s in symbols}
+    pending = set(futures)
+    end = clock() + deadline
+
+    try:
+        while pending:
+            now = clock()
+
+            # Sembol başına süre sınırı (sayım çağrı başladığında başlar)
+            for future in list(pending):
+                symbol = futures[future]
+                t0 = started.get(symbol)
+                if t0 is not None and not future.done() and now - t0 > per_symbol_timeout:
+                    errors[symbol] = f"Zaman aşımı ({per_symbol_timeout:g} sn)"
+                    pending.discard(future)
+
+            if not pending or now >= end:
+                break
+
+            done, _ = wait(pending, timeout=min(_POLL_SECONDS, end - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                symbol = futures[future]
+                try:
+                    results[symbol] = future.result()
+                except Exception as e:
+                    errors[symbol] = str(e) or type(e).__name__
+    finally:
+        for future in pending:
+            symbol = futures[future]
+            errors[symbol] = f"Döngü süresi doldu ({deadline:g} sn)"
+        # Takılan thread'leri bekleme; başlamamış işleri iptal et
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results, errors
+
+
+def _missing_symbols(frame, chunk):
+    # Kapanış sütunu hiç olmayan veya tamamen boş semboller
+    # (yfinance bu semboller için hata fırlatmaz, NaN sütun döndürür)
+    if frame is None or frame.empty or 'Close' not in frame:
+        return list(chunk)
+    has_close = frame['Close'].reindex(columns=chunk).notna().any(axis=0)
+    return [s for s in chunk if not has_close[s]]
+
+
+def download_in_chunks(symbols, download, chunk_size=50, max_workers=4, rate=None,
+                       attempts=3, base_delay=1.0, max_delay=8.0, sleep=time.sleep):
+    """
+    download(chunk) çağrısını sembol parçaları üzerinde en fazla max_workers
+    thread ile paralel çalıştırır. download, yf.download biçiminde
+    (tarih x (alan, sembol)) bir DataFrame döndürmelidir.
+
+    - rate verilirse çağrılar saniyede en fazla 'rate' ile sınırlanır.
+    - Hata fırlatan parçanın tüm sembolleri, verisi gelmeyen semboller ise tek
+      tek bir sonraki tura kalır; her turda bekleme üstel olarak artar ve kalan
+      semboller yeniden parçalanır. En fazla 'attempts' tur yapılır.
+    (frame, errors) döndürür: başarılı sembollerin birleşik tablosu ve
+    son turda hâlâ başarısız olan symbol -> hata mesajı.
+    """
+    order = {s: i for i, s in enumerate(dict.fromkeys(symbols))}
+    pending = list(order)
+    bucket = TokenBucket(rate) if rate else None
+    frames, last_error = [], {}
+
+    def run(chunk):
+        if bucket is not None:
+            bucket.acquire()
+        return download(chunk)
+
+    for attempt in range(attempts):
+        if not pending:
+            break
+        if attempt:
+            sleep(min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        retry = []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)), thread_name_prefix='download') as executor:
+            futures = {executor.submit(run, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    frame = future.result()
+                except Exception as e:
+                    for symbol in chunk:
+                        last_error[symbol] = str(e) or type(e).__name__
+                    retry.extend(chunk)
+                    continue
+
+                missing = _missing_symbols(frame, chunk)
+                for symbol in missing:
+                    last_error[symbol] = 'yf.download verisi bulunamadı'
+                retry.extend(missing)
+                if len(missing) < len(chunk):
+                    good = frame.columns.get_level_values(1).isin(set(chunk) - set(missing))
+                    frames.append(frame.loc[:, good])
+        pending = sorted(retry, key=order.get)
+
+    # pandas ağır bir import; sadece fiyatları indiren (lider) süreçte yüklensin
+    import pandas as pd
+    merged = pd.concat(frames, axis=1).sort_index() if frames else pd.DataFrame()
+    return merged, {symbol: last_error[symbol] for symbol in pending}
@@ -0,0 +1,141 @@
+# formats.py
+# companies cevabının alternatif kodlamaları ve sıkıştırması.
+#
+# Satır listesi (varsayılan JSON) her satırda aynı on üç anahtarı tekrarlar.
+# Yavaş mobil bağlantılar için:
+#   - columnar: alan başına bir dizi ({"count": n, "columns": {"price": [...], ...}})
+#   - msgpack: satır listesinin MessagePack karşılığı (ikili, ayrıştırması hızlı)
+# ve bunların gzip/brotli ile sıkıştırılmış halleri sunulur. Biçim Accept başlığı
+# veya ?format= ile seçilir; sıkıştırma Accept-Encoding ile. POST gövdeleri de
+# JSON veya MessagePack olabilir (decode_body).
+#
+# Kodlama ve sıkıştırma istek başına değil, snapshot başına her (biçim, kodlama)
+# çifti için bir kez yapılır (bkz. Snapshot.encoded_body).
+#
+# msgpack ve brotli isteğe bağlıdır: kurulu değilse o biçim/kodlama sunulmaz.
+import gzip
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9      # 11 yaklaşık %20 daha küçük ama ~20 kat yavaş
+MIN_COMPRESS_BYTES = 1024  # Bundan küçük gövdeler sıkıştırılmaz
+
+# format adı -> içerik tipi
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.sanbist.columnar+json',
+    'msgpack': 'application/msgpack',
+}
+# Accept başlığında kabul edilen diğer adlar
+MEDIA_TYPE_ALIASES = {
+    'application/x-msgpack': 'msgpack',
+}
+
+
+def serialize_payload(payload):
+    """
+    Payload'u Flask'ın jsonify çıktısıyla aynı biçimde (sıralı anahtarlar,
+    ASCII, kompakt) byte dizisine çevirir.
+    """
+    return json.dumps(payload, ensure_ascii=True, sort_keys=True, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def available_formats():
+    return [name for name in MEDIA_TYPES if name != 'msgpack' or msgpack is not None]
+
+
+def available_encodings():
+    # Tercih sırasıyla
+    return (['br'] if brotli is not None else []) + ['gzip']
+
+
+def columnar(rows):
+    """
+    Satır listesini alan başına dizilere çevirir. Alanlar ilk satırdan alınır
+    (tüm satırlar aynı alanlara sahiptir).
+    """
+    fields = list(rows[0]) if rows else []
+    return {"count": len(rows), "columns": {f: [row[f] for row in rows] for f in fields}}
+
+
+def encode_rows(rows, fmt):
+    """
+    Satırları istenen biçimde byte dizisine çevirir.
+    """
+    if fmt == 'json':
+        return serialize_payload(rows)
+    if fmt == 'columnar':
+        return serialize_payload(columnar(rows))
+    if fmt == 'msgpack':
+        if msgpack is None:
+            raise ValueError("msgpack biçimi bu sunucuda kullanılamıyor")
+        return msgpack.packb(rows, use_bin_type=True)
+    raise ValueError(f"Bilinmeyen biçim: {fmt}")
+
+
+def compress(body, encoding):
+    """
+    Gövdeyi sıkıştırır; (gövde, kullanılan kodlama) döndürür.
+    Küçük gövdeler ve bilinmeyen kodlamalar için 'identity'.
+    """
+    if encoding == 'identity' or len(body) < MIN_COMPRESS_BYTES:
+        return body, 'identity'
+    if encoding == 'gzip':
+        # mtime=0: aynı içerik her worker'da aynı byte'ları üretsin
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), 'gzip'
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    return body, 'identity'
+
+
+def negotiate_format(request):
+    """
+    ?format= verildiyse onu, yoksa Accept başlığına en uygun biçimi döndürür
+    (varsayılan json). Geçersiz veya kullanılamayan format= için ValueError.
+    """
+    fmt = request.args.get('format')
+    if fmt:
+        if fmt not in available_formats():
+            raise ValueError(f"Geçersiz biçim: {fmt} (geçerli: {', '.join(available_formats())})")
+        return fmt
+    offered = [MEDIA_TYPES[f] for f in available_formats()]
+    offered += [m for m, f in MEDIA_TYPE_ALIASES.items() if f in available_formats()]
+    # Accept yoksa veya */* ise ilk seçenek (json) döner
+    best = request.accept_mimetypes.best_match(offered, default=MEDIA_TYPES['json'])
+    return MEDIA_TYPE_ALIASES.get(best) or next(f for f, m in MEDIA_TYPES.items() if m == best)
+
+
+def decode_body(request):
+    """
+    İstek gövdesini Content-Type'a göre (JSON veya MessagePack) çözer.
+    Çözülemeyen veya desteklenmeyen gövdede ValueError.
+    """
+    mimetype = request.mimetype
+    if mimetype == MEDIA_TYPES['msgpack'] or MEDIA_TYPE_ALIASES.get(mimetype) == 'msgpack':
+        if msgpack is None:
+            raise ValueError("msgpack biçimi bu sunucuda kullanılamıyor")
+        try:
+            return msgpack.unpackb(request.get_data(), raw=False, strict_map_key=False)
+        except Exception as e:
+            raise ValueError(f"Geçersiz MessagePack gövdesi: {e}")
+    data = request.get_json(force=True, silent=True)
+    if data is None:
+        raise ValueError("Gövde geçerli bir JSON olmalı")
+    return data
+
+
+def negotiate_encoding(request):
+    """
+    Accept-Encoding başlığına göre 'br', 'gzip' veya 'identity'.
+    """
+    return request.accept_encodings.best_match(available_encodings(), default='identity') or 'identity'
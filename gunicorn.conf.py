@@ -0,0 +1,41 @@
+# gunicorn.conf.py
+# Gunicorn bu dosyayı çalışma dizininde kendiliğinden okur:
+#   gunicorn app:app
+#   gunicorn --preload app:app   (app master'da bir kez import edilir, worker'lar fork'lanır)
+#
+# app.py import edilirken thread başlatmaz ve DB bağlantısı açık bırakmaz; arka
+# plan işi aşağıdaki kancalarla fork'tan SONRA, her worker'da ayrıca başlatılır.
+import os
+import shutil
+import tempfile
+
+# --- PROMETHEUS ÇOK SÜREÇLİ MOD ---
+# Her worker metriklerini bu dizine yazar, /metrics hepsini toplar (bkz. metrics.py).
+# Ortam değişkeni worker'lar app'i import etmeden önce, burada ayarlanmalı.
+prometheus_multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'sanbist_prometheus'))
+
+
+def on_starting(server):
+    # Önceki çalıştırmadan kalan metrik dosyaları sayaçları şişirmesin
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
+
+
+def when_ready(server):
+    # --preload: snapshot master'da bir kez hazırlansın, worker'lar fork ile sıcak
+    # devralsın (warm_snapshot bağlantıları kapatır, fork'a açık bağlantı kalmaz)
+    if server.cfg.preload_app:
+        from app import warm_snapshot
+        warm_snapshot()
+
+
+def post_worker_init(worker):
+    # Uygulama worker'da yüklendikten sonra: snapshot (güncel değilse) + arka plan thread'i
+    from app import init_worker
+    init_worker()
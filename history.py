@@ -0,0 +1,211 @@
+# history.py
+# Fiyat geçmişi: her güncellemede nokta ekleme, OHLC kovalarına indirgeme
+# (downsampling) ve eski tick'lerin günlük barlara sıkıştırılması.
+#
+# Bir yıllık grafik binlerce tick yerine birkaç yüz kova olarak döner;
+# indirgeme sunucuda, kapsayan birincil anahtardan okunan satırlar üzerinde
+# NumPy ile tek geçişte yapılır.
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from db_models import db, PriceHistory
+
+# Desteklenen çözünürlükler (saniye)
+RESOLUTIONS = {
+    '5m': 5 * 60,
+    '15m': 15 * 60,
+    '1h': 60 * 60,
+    '4h': 4 * 60 * 60,
+    '1d': 24 * 60 * 60,
+    '1w': 7 * 24 * 60 * 60,
+}
+
+# Desteklenen aralıklar (None = tüm geçmiş)
+RANGES = {
+    '1d': timedelta(days=1),
+    '5d': timedelta(days=5),
+    '1mo': timedelta(days=31),
+    '3mo': timedelta(days=92),
+    '6mo': timedelta(days=183),
+    '1y': timedelta(days=366),
+    '5y': timedelta(days=5 * 366),
+    'max': None,
+}
+
+# Çözünürlük verilmezse bu kadar kovayı geçmeyen en ince çözünürlük seçilir
+MAX_POINTS = 400
+# Bu günden eski tick'ler günlük barlara sıkıştırılır
+INTRADAY_RETENTION_DAYS = 7
+
+_DAY = 24 * 60 * 60
+# 1970-01-01 Perşembe; haftalık kovalar Pazartesi başlasın diye 3 gün kaydırılır
+_WEEK_OFFSET = 3 * _DAY
+
+
+def append_history(rows):
+    """
+    Fiyatı olan satırları 'tick' olarak geçmişe ekler. Son geçerli değeri
+    korunan (stale) satırlar yeni bir gözlem olmadığı için eklenmez.
+    Price yazımıyla aynı transaction (db.atomic) içinde çağrılmalıdır.
+    """
+    points = [{
+        'symbol': r['symbol'],
+        'timestamp': r['timestamp'],
+        'interval': 'tick',
+        'open': r['price'], 'high': r['price'], 'low': r['price'], 'close': r['price'],
+        'volume': r.get('volume'),
+    } for r in rows if r.get('price') is not None and r.get('error') is None]
+    if points:
+        PriceHistory.insert_many(points).on_conflict_ignore().execute()
+    return len(points)
+
+
+def pick_resolution(span_seconds):
+    """
+    Aralığı MAX_POINTS kovadan az olacak şekilde bölen en ince çözünürlüğü seçer.
+    """
+    for name, seconds in RESOLUTIONS.items():
+        if span_seconds / seconds <= MAX_POINTS:
+            return name
+    return '1w'
+
+
+def _epoch_seconds(values):
+    # DB'deki 'YYYY-MM-DD HH:MM:SS[.ffffff]' metinlerini (yerel saat) saniyeye çevirir
+    return np.array(values, dtype='datetime64[us]').astype('int64') // 1_000_000
+
+
+def downsample(ts, open_, high, low, close, volume, resolution_seconds):
+    """
+    Zamana göre sıralı noktaları kovalara indirger:
+    open=kovanın ilki, close=sonu, high/low=max/min.
+    Hacim her gün için o günün en büyük (kümülatif) değeri alınıp kovada toplanır.
+    Kova başlangıç zamanlarını (epoch saniye) ve dizileri döndürür.
+    """
+    if ts.size == 0:
+        empty = np.array([], dtype=float)
+        return np.array([], dtype='int64'), empty, empty, empty, empty, empty
+
+    offset = _WEEK_OFFSET if resolution_seconds == RESOLUTIONS['1w'] else 0
+    bucket = (ts + offset) // resolution_seconds
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], ts.size] - 1
+
+    b_open = open_[starts]
+    b_close = close[ends]
+    b_high = np.fmax.reduceat(high, starts)
+    b_low = np.fmin.reduceat(low, starts)
+
+    # Hacim: önce (kova, gün) başına max, sonra kova başına toplam
+    day = ts // _DAY
+    vol = np.nan_to_num(volume, nan=0.0)
+    day_starts = np.flatnonzero(np.r_[True, (bucket[1:] != bucket[:-1]) | (day[1:] != day[:-1])])
+    day_max = np.maximum.reduceat(vol, day_starts)
+    day_bucket_index = np.searchsorted(starts, day_starts, side='right') - 1
+    b_volume = np.bincount(day_bucket_index, weights=day_max, minlength=starts.size)
+
+    bucket_start = bucket[starts] * resolution_seconds - offset
+    return bucket_start, b_open, b_high, b_low, b_close, b_volume
+
+
+def _none_if_nan(values):
+    return [None if v != v else v for v in values.tolist()]
+
+
+def query_history(symbol, range_name='1mo', resolution=None, now=None):
+    """
+    Bir sembolün geçmişini istenen aralık ve çözünürlükte döndürür (sütun bazlı dict).
+    Geçersiz aralık/çözünürlük için ValueError fırlatır.
+    """
+    if range_name not in RANGES:
+        raise ValueError(f"Geçersiz aralık: {range_name} (geçerli: {', '.join(RANGES)})")
+    if resolution is not None and resolution not in RESOLUTIONS:
+        raise ValueError(f"Geçersiz çözünürlük: {resolution} (geçerli: {', '.join(RESOLUTIONS)})")
+
+    now = now or datetime.now()
+    span = RANGES[range_name]
+
+    query = (PriceHistory
+             .select(PriceHistory.timestamp, PriceHistory.open, PriceHistory.high,
+                     PriceHistory.low, PriceHistory.close, PriceHistory.volume)
+             .where(PriceHistory.symbol == symbol)
+             .order_by(PriceHistory.timestamp))
+    if span is not None:
+        query = query.where(PriceHistory.timestamp >= now - span)
+
+    # Ham cursor: satır başına datetime dönüşümü yapılmaz, metinler NumPy'a gider
+    rows = db.execute(query).fetchall()
+    if rows:
+        raw_ts, o, h, l, c, v = zip(*rows)
+        ts = _epoch_seconds(raw_ts)
+        as_float = lambda col: np.array(col, dtype=float)
+        o, h, l, c, v = map(as_float, (o, h, l, c, v))
+    else:
+        ts = np.array([], dtype='int64')
+        o = h = l = c = v = np.array([], dtype=float)
+
+    if resolution is None:
+        span_seconds = span.total_seconds() if span is not None else (
+            float(ts[-1] - ts[0]) if ts.size else 0.0)
+        resolution = pick_resolution(span_seconds)
+
+    starts, bo, bh, bl, bc, bv = downsample(ts, o, h, l, c, v, RESOLUTIONS[resolution])
+    return {
+        "symbol": symbol,
+        "range": range_name,
+        "resolution": resolution,
+        "count": int(starts.size),
+        "timestamps": [t.isoformat() for t in starts.astype('datetime64[s]').tolist()],
+        "open": _none_if_nan(bo),
+        "high": _none_if_nan(bh),
+        "low": _none_if_nan(bl),
+        "close": _none_if_nan(bc),
+        "volume": bv.astype('int64').tolist(),
+    }
+
+
+def compact_history(retention_days=INTRADAY_RETENTION_DAYS, now=None):
+    """
+    retention_days'den eski 'tick' satırlarını günlük '1d' barlarına toplar ve siler.
+    Böylece SQLite dosyası zamanla sınırsız büyümez. O gün için zaten bir '1d'
+    barı varsa (backfill.py ile yüklenen upstream barı) o korunur; tick'ler
+    yine silinir. Oluşan bar sayısını döndürür.
+    Açık bir bağlantı içinde çağrılmalıdır.
+    """
+    cutoff = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0) \
+        - timedelta(days=retention_days)
+
+    ticks = (PriceHistory
+             .select(PriceHistory.symbol, PriceHistory.timestamp, PriceHistory.close, PriceHistory.volume)
+             .where((PriceHistory.interval == 'tick') & (PriceHistory.timestamp < cutoff))
+             .order_by(PriceHistory.symbol, PriceHistory.timestamp)
+             .tuples())
+
+    bars = {}
+    for symbol, ts, close, volume in ticks:
+        key = (symbol, ts.date())
+        bar = bars.get(key)
+        if bar is None:
+            bars[key] = {'symbol': symbol, 'timestamp': datetime.combine(ts.date(), datetime.min.time()),
+                         'interval': '1d', 'open': close, 'high': close, 'low': close, 'close': close,
+                         'volume': volume}
+        else:
+            bar['high'] = max(bar['high'], close)
+            bar['low'] = min(bar['low'], close)
+            bar['close'] = close
+            if volume is not None:
+                bar['volume'] = max(bar['volume'] or 0, volume)
+
+    if not bars:
+        return 0
+
+    with db.atomic():
+        rows = list(bars.values())
+        for i in range(0, len(rows), 500):
+            PriceHistory.insert_many(rows[i:i + 500]).on_conflict_ignore().execute()
+        (PriceHistory
+         .delete()
+         .where((PriceHistory.interval == 'tick') & (PriceHistory.timestamp < cutoff))
+         .execute())
+    return len(bars)
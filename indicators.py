@@ -0,0 +1,457 @@
+# indicators.py
+# Teknik göstergeler: SMA, EMA, MACD, RSI ve Bollinger bantları (günlük kapanışlar).
+#
+# Her istemci ham geçmişi indirip göstergeleri kendisi hesaplamak yerine burada
+# tüm semboller için bir kez hesaplanır:
+#   - Durum (EMA'lar, RSI ortalama kazanç/kayıp, pencere toplamları ve son 50
+#     kapanışın halka tamponu) sembol başına NumPy dizilerinde tutulur; her adım
+#     tüm semboller üzerinde tek vektör işlemidir.
+#   - İlk yükleme PriceHistory'deki günlük kapanışlardan yapılır (tarih ekseninde
+#     tek geçiş). Sonrasında her güncelleme döngüsünde sadece en yeni fiyat
+#     işlenir: bugünün barı 'geçici' kabul edilir ve göstergeler son kesinleşmiş
+#     durum + bu fiyattan O(1) hesaplanır. Pencerenin tamamı hiçbir zaman yeniden
+#     hesaplanmaz.
+#   - Gün değişince kapanmış günler (geçici barlar dahil) PriceHistory'den
+#     kesinleşir. Her worker kendi motorunu tutar ve sadece kendisine gelen
+#     isteklerde güncellenir; kapanışı o worker'ın son gördüğü fiyattan almak
+#     worker'lar arasında (aynı ETag altında) farklı sonuçlara ve atlanan günlere
+#     yol açardı. Geçmiş tüm worker'lar için aynıdır.
+#
+# EMA'lar ilk kapanışla başlatılır (pandas ewm(adjust=False) ile aynı), RSI
+# Wilder yumuşatmasıdır (ilk 14 değişimin ortalamasıyla başlar), Bollinger
+# bantları 20 günlük ortalama +/- 2 popülasyon standart sapmasıdır.
+import re
+import threading
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from db_models import db, PriceHistory
+from derived import fill_derived_history
+from snapshot import QUERY_CACHE_MAX
+
+SMA_PERIODS = (20, 50)
+EMA_PERIODS = (12, 26)
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+RSI_PERIOD = 14
+BOLLINGER_PERIOD = 20
+BOLLINGER_K = 2.0
+WINDOW = max(SMA_PERIODS + (BOLLINGER_PERIOD,))  # Halka tamponu uzunluğu
+
+# EMA'lar bu sürede fiilen yakınsar; ilk yüklemede daha eskisi okunmaz
+LOOKBACK_DAYS = 2 * 365
+
+FIELDS = ('close', 'sma20', 'sma50', 'ema12', 'ema26', 'macd', 'macdSignal', 'macdHist',
+          'rsi14', 'bbUpper', 'bbMiddle', 'bbLower')
+
+# Alanın geçerli olması için gereken en az gözlem (kapanış) sayısı
+MIN_OBSERVATIONS = {
+    'close': 1, 'sma20': 20, 'sma50': 50, 'ema12': MACD_FAST, 'ema26': MACD_SLOW,
+    'macd': MACD_SLOW, 'macdSignal': MACD_SLOW + MACD_SIGNAL - 1, 'macdHist': MACD_SLOW + MACD_SIGNAL - 1,
+    'rsi14': RSI_PERIOD + 1, 'bbUpper': BOLLINGER_PERIOD, 'bbMiddle': BOLLINGER_PERIOD, 'bbLower': BOLLINGER_PERIOD,
+}
+
+_NO_DAY = np.iinfo(np.int64).min
+
+
+def _alpha(period):
+    return 2.0 / (period + 1)
+
+
+def day_number(value):
+    # date veya 'YYYY-MM-DD...' metni -> 1970'ten beri gün sayısı
+    return _parse_day(str(value)[:10])
+
+
+def day_date(number):
+    # day_number'ın tersi
+    return np.datetime64(int(number), 'D').astype(object)
+
+
+def newest_day(quotes):
+    """
+    quotes (symbol -> (fiyat, gün)) içindeki fiyatlı en yeni gün numarası.
+    """
+    return max((day_number(d) for p, d in quotes.values() if p is not None and d is not None),
+               default=_NO_DAY)
+
+
+@lru_cache(maxsize=64)
+def _parse_day(text):
+    # Bir döngüdeki tüm kotasyonlar birkaç farklı günden gelir
+    return int(np.datetime64(text, 'D').astype(np.int64))
+
+
+class IndicatorTable:
+    """
+    Bir andaki gösterge değerleri: alan -> (n,) dizisi (geçersizler NaN).
+    Değişmezdir; istekler bunu okur.
+    """
+
+    def __init__(self, symbols, values, observations, days):
+        self.symbols = symbols
+        self.position = {s: i for i, s in enumerate(symbols)}
+        self.values = values
+        self.observations = observations
+        self.days = days
+
+    def _row(self, i):
+        row = {'symbol': self.symbols[i], 'bars': int(self.observations[i]),
+               'asOf': None if self.days[i] == _NO_DAY else str(np.datetime64(int(self.days[i]), 'D'))}
+        for field in FIELDS:
+            v = self.values[field][i]
+            row[field] = None if v != v else float(v)
+        return row
+
+    def row(self, symbol):
+        """
+        Sembolün göstergeleri (dict) veya bilinmiyorsa None.
+        """
+        i = self.position.get(symbol)
+        return None if i is None else self._row(i)
+
+    def screen(self, conditions, symbols=None, sort=None, descending=False, limit=None):
+        """
+        Koşulların hepsini sağlayan sembollerin satırları.
+        conditions: (alan, operatör, sayı veya alan) listesi (bkz. parse_conditions)
+        symbols: sadece bu semboller arasında ara (None = hepsi)
+        Değeri NaN olan (yetersiz geçmiş) semboller koşulu sağlamaz.
+        """
+        mask = np.ones(len(self.symbols), dtype=bool)
+        if symbols is not None:
+            mask[:] = False
+            mask[[self.position[s] for s in symbols if s in self.position]] = True
+        for field, op, rhs in conditions:
+            left = self.values[field]
+            right = self.values[rhs] if isinstance(rhs, str) else rhs
+            with np.errstate(invalid='ignore'):
+                mask &= _OPERATORS[op](left, right)  # NaN karşılaştırmaları False
+        selected = np.flatnonzero(mask)
+        if sort is not None:
+            key = self.values[sort][selected]
+            # NaN'lar yönden bağımsız olarak sonda
+            order = np.argsort(-key if descending else key, kind='stable')
+            selected = selected[order]
+        if limit is not None:
+            selected = selected[:limit]
+        return [self._row(i) for i in selected.tolist()]
+
+
+_OPERATORS = {
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+}
+_CONDITION = re.compile(r'^\s*([A-Za-z0-9]+)\s*(<=|>=|<|>)\s*([A-Za-z0-9.+-]+)\s*$')
+
+
+def parse_conditions(text):
+    """
+    'rsi14<30,close>sma50' -> [('rsi14', '<', 30.0), ('close', '>', 'sma50')].
+    Geçersiz ifadede ValueError fırlatır.
+    """
+    conditions = []
+    for part in (text or '').split(','):
+        if not part.strip():
+            continue
+        match = _CONDITION.match(part)
+        if match is None:
+            raise ValueError(f"Geçersiz koşul: {part.strip()} (ör. rsi14<30 veya close>sma50)")
+        field, op, rhs = match.groups()
+        if field not in FIELDS:
+            raise ValueError(f"Bilinmeyen gösterge: {field} (geçerli: {', '.join(FIELDS)})")
+        if rhs in FIELDS:
+            conditions.append((field, op, rhs))
+            continue
+        try:
+            conditions.append((field, op, float(rhs)))
+        except ValueError:
+            raise ValueError(f"Bilinmeyen gösterge veya sayı: {rhs}") from None
+    return conditions
+
+
+class IndicatorEngine:
+    """
+    Semboller için artımlı gösterge durumu. Sembol kümesi oluşturulurken sabitlenir.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = list(symbols)
+        self.position = {s: i for i, s in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self.count = np.zeros(n, dtype=np.int64)       # Kesinleşmiş kapanış sayısı
+        self.last_day = np.full(n, _NO_DAY, dtype=np.int64)
+        self.last_close = np.full(n, np.nan)
+        self.ema = {p: np.full(n, np.nan) for p in EMA_PERIODS}
+        self.signal = np.full(n, np.nan)
+        self.avg_gain = np.zeros(n)
+        self.avg_loss = np.zeros(n)
+        self.buffer = np.zeros((n, WINDOW))            # Son WINDOW kesinleşmiş kapanış
+        self.sums = {p: np.zeros(n) for p in SMA_PERIODS}
+        self.sumsq = np.zeros(n)                       # Son BOLLINGER_PERIOD kapanışın kareleri
+        # Bugünün (henüz kesinleşmemiş) barı
+        self.pending_day = np.full(n, _NO_DAY, dtype=np.int64)
+        self.pending_close = np.full(n, np.nan)
+
+    # --- Kesinleştirme (bir günlük kapanışı duruma ekler) ---
+    def _commit(self, idx, close, day):
+        """
+        idx sembollerine birer günlük kapanış ekler (vektörel; idx tekrarsız olmalı).
+        """
+        c = self.count[idx]
+        first = c == 0
+
+        for p, ema in self.ema.items():
+            ema[idx] = np.where(first, close, ema[idx] + _alpha(p) * (close - ema[idx]))
+        macd = self.ema[MACD_FAST][idx] - self.ema[MACD_SLOW][idx]
+        self.signal[idx] = np.where(first, macd, self.signal[idx] + _alpha(MACD_SIGNAL) * (macd - self.signal[idx]))
+
+        self.avg_gain[idx], self.avg_loss[idx] = self._rsi_step(idx, c, close)
+
+        for p, total in self.sums.items():
+            leaving = np.where(c >= p, self.buffer[idx, (c - p) % WINDOW], 0.0)
+            total[idx] += close - leaving
+            if p == BOLLINGER_PERIOD:
+                self.sumsq[idx] += close * close - leaving * leaving
+        self.buffer[idx, c % WINDOW] = close
+
+        self.count[idx] = c + 1
+        self.last_close[idx] = close
+        self.last_day[idx] = day
+
+    def _rsi_step(self, idx, c, close):
+        # c. değişim (1'den başlar): ilk RSI_PERIOD değişimde basit ortalama, sonra Wilder
+        change = np.where(c > 0, close - self.last_close[idx], 0.0)
+        k = np.clip(c, 1, RSI_PERIOD)
+        gain = (self.avg_gain[idx] * (k - 1) + np.maximum(change, 0.0)) / k
+        loss = (self.avg_loss[idx] * (k - 1) + np.maximum(-change, 0.0)) / k
+        return np.where(c > 0, gain, 0.0), np.where(c > 0, loss, 0.0)
+
+    def load_matrix(self, days, closes):
+        """
+        Geçmişten kesinleştirme (ilk yükleme ve gün değişimi): days (T,) artan gün
+        numaraları, closes (n, T) kapanış matrisi (eksik günler NaN). Her gün için
+        kapanışı olan ve o günü henüz kesinleşmemiş semboller birlikte işlenir.
+        Günü geçmişten kesinleşen geçici barlar atılır.
+        """
+        for t in range(len(days)):
+            column = closes[:, t]
+            idx = np.flatnonzero(np.isfinite(column) & (self.last_day < days[t]))
+            if idx.size:
+                self._commit(idx, column[idx], days[t])
+        done = self.pending_day <= self.last_day
+        self.pending_day[done] = _NO_DAY
+        self.pending_close[done] = np.nan
+
+    def horizon(self):
+        """
+        Durumdaki en yeni gün (kesinleşmiş veya geçici).
+        """
+        return max(int(self.last_day.max(initial=_NO_DAY)), int(self.pending_day.max(initial=_NO_DAY)))
+
+    def replay_from(self):
+        """
+        Gün değişiminde geçmişten okunacak ilk gün: en yeni kesinleşmiş günden
+        sonrası ve geçici barların en eskisi. Durum boşsa None.
+        """
+        start = int(self.last_day.max(initial=_NO_DAY))
+        start = None if start == _NO_DAY else start + 1
+        pending = self.pending_day[self.pending_day != _NO_DAY]
+        if pending.size:
+            start = int(pending.min()) if start is None else min(start, int(pending.min()))
+        return start
+
+    def update(self, quotes):
+        """
+        Her güncelleme döngüsünde çağrılır. quotes: symbol -> (fiyat, gün).
+        Gün değiştiyse önceki günün geçici barı kesinleşir (geçmişte o günün
+        kapanışı olmayan semboller için; bkz. IndicatorStore.sync); sonra yeni
+        fiyat bugünün geçici barı olur. Sembol başına O(1).
+        """
+        idx, price, day = [], [], []
+        for symbol, (p, d) in quotes.items():
+            i = self.position.get(symbol)
+            if i is None or p is None or d is None:
+                continue
+            idx.append(i)
+            price.append(p)
+            day.append(day_number(d))
+        if not idx:
+            return
+        idx, price, day = np.array(idx), np.array(price, dtype=float), np.array(day, dtype=np.int64)
+
+        # Önceki günün geçici barı -> kesinleşir
+        rolled = (self.pending_day[idx] != _NO_DAY) & (day > self.pending_day[idx])
+        if rolled.any():
+            r = idx[rolled]
+            self._commit(r, self.pending_close[r], self.pending_day[r])
+            self.pending_day[r] = _NO_DAY
+            self.pending_close[r] = np.nan
+
+        # Kesinleşmiş son günden yeni fiyatlar geçici bar olur
+        fresh = (day > self.last_day[idx]) & (day >= self.pending_day[idx])
+        self.pending_day[idx[fresh]] = day[fresh]
+        self.pending_close[idx[fresh]] = price[fresh]
+
+    def table(self):
+        """
+        Kesinleşmiş durum + geçici bardan güncel göstergeler (tüm semboller, vektörel).
+        """
+        n = len(self.symbols)
+        idx = np.arange(n)
+        c = self.count
+        pending = np.isfinite(self.pending_close)
+        price = np.where(pending, self.pending_close, self.last_close)
+
+        values = {'close': price}
+        for p, ema in self.ema.items():
+            values[f'ema{p}'] = np.where(pending & (c > 0), ema + _alpha(p) * (price - ema),
+                                         np.where(pending, price, ema))
+        macd = values[f'ema{MACD_FAST}'] - values[f'ema{MACD_SLOW}']
+        signal = np.where(pending & (c > 0), self.signal + _alpha(MACD_SIGNAL) * (macd - self.signal),
+                          np.where(pending, macd, self.signal))
+        values['macd'] = macd
+        values['macdSignal'] = signal
+        values['macdHist'] = macd - signal
+
+        gain, loss = self._rsi_step(idx, c, price)
+        gain = np.where(pending, gain, self.avg_gain)
+        loss = np.where(pending, loss, self.avg_loss)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rsi = np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), 100.0 - 100.0 / (1.0 + gain / loss))
+        values['rsi14'] = rsi
+
+        observations = c + pending
+        for p, total in self.sums.items():
+            # Geçici bar varsa pencerenin en eskisi düşer, fiyat eklenir
+            leaving = np.where(pending & (c >= p), self.buffer[idx, (c - p) % WINDOW], 0.0)
+            window_sum = total - leaving + np.where(pending, price, 0.0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values[f'sma{p}'] = window_sum / p
+            if p == BOLLINGER_PERIOD:
+                window_sumsq = self.sumsq - leaving * leaving + np.where(pending, price * price, 0.0)
+                mean = window_sum / p
+                std = np.sqrt(np.maximum(window_sumsq / p - mean * mean, 0.0))
+                values['bbMiddle'] = mean
+                values['bbUpper'] = mean + BOLLINGER_K * std
+                values['bbLower'] = mean - BOLLINGER_K * std
+
+        for field, minimum in MIN_OBSERVATIONS.items():
+            values[field] = np.where(observations >= minimum, values[field], np.nan)
+        days = np.where(pending, self.pending_day, self.last_day)
+        return IndicatorTable(self.symbols, values, observations, days)
+
+
+def load_daily_closes(symbols, today=None, lookback_days=LOOKBACK_DAYS, since=None):
+    """
+    PriceHistory'den bugünden önceki günlük kapanışları (n, T) matris olarak okur.
+    since (date) verilirse o günden, yoksa lookback_days öncesinden başlar.
+    Bir günün '1d' barı varsa o, yoksa o günün son tick'i kullanılır (henüz
+    sıkıştırılmamış günler); türetilmişlerin eksik günleri girdilerinden
+    doldurulur. Açık bir bağlantı içinde çağrılmalıdır.
+    (gün numaraları (T,), kapanışlar (n, T)) döndürür.
+    """
+    today = today or date.today()
+    start = today - timedelta(days=lookback_days)
+    if since is not None:
+        start = max(start, since)
+    position = {s: i for i, s in enumerate(symbols)}
+    query = (PriceHistory
+             .select(PriceHistory.symbol, PriceHistory.timestamp, PriceHistory.interval, PriceHistory.close)
+             .where((PriceHistory.timestamp >= start) &
+                    (PriceHistory.timestamp < today) &
+                    PriceHistory.close.is_null(False) &
+                    PriceHistory.symbol.in_(list(symbols)))
+             .order_by(PriceHistory.symbol, PriceHistory.timestamp))
+    rows = db.execute(query).fetchall()
+    if not rows:
+        return np.array([], dtype=np.int64), np.full((len(symbols), 0), np.nan)
+
+    symbol_col, ts_col, interval_col, close_col = zip(*rows)
+    sym = np.array([position[s] for s in symbol_col])
+    day = np.array([t[:10] for t in ts_col], dtype='datetime64[D]').astype(np.int64)
+    is_bar = np.array([i == '1d' for i in interval_col])
+    close = np.array(close_col, dtype=float)
+
+    # (sembol, gün) grubunda son sıradaki seçilir: varsa '1d' barı, yoksa son tick
+    order = np.lexsort((np.arange(len(rows)), is_bar, day, sym))
+    sym, day, close = sym[order], day[order], close[order]
+    last = np.r_[(sym[1:] != sym[:-1]) | (day[1:] != day[:-1]), True]
+
+    days, column = np.unique(day[last], return_inverse=True)
+    closes = np.full((len(symbols), len(days)), np.nan)
+    closes[sym[last], column] = close[last]
+    # Geçmişi olmayan günlerde türetilmişler (gram altın vb.) girdilerinden hesaplanır
+    return days, fill_derived_history(symbols, closes)
+
+
+class IndicatorStore:
+    """
+    Süreç içi gösterge durumu. sync() companies snapshot'ının nesline bakar:
+    motor ilk kez gerekiyorsa geçmişten yüklenir, sonrasında her yeni nesilde
+    sadece snapshot'taki en yeni fiyatlar işlenir; gün değiştiyse önce aradaki
+    kapanmış günler geçmişten kesinleşir. Hazırlanan cevaplar nesil başına
+    önbelleğe alınır.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engine = None
+        self._generation = None
+        self._table = None
+        self._bodies = {}
+
+    def sync(self, snap):
+        """
+        Durumu verilen snapshot'a getirir ve güncel IndicatorTable'ı döndürür.
+        Motor yüklenirken ve gün değişiminde açık bir DB bağlantısı gerekir.
+        """
+        if self._generation == snap.generation and self._table is not None:
+            return self._table
+        with self._lock:
+            if self._generation == snap.generation and self._table is not None:
+                return self._table
+            quotes = {row['symbol']: (row['price'], row['timestamp']) for row in snap.payload}
+            if self._engine is None:
+                engine = IndicatorEngine([row['symbol'] for row in snap.payload])
+                engine.load_matrix(*load_daily_closes(engine.symbols))
+                self._engine = engine
+            newest = newest_day(quotes)
+            if newest > self._engine.horizon():
+                # Gün değişti: bu süreç hiç görmemiş olsa bile kapanmış günler
+                # geçmişten kesinleşir (geçici barın son fiyatı değil)
+                since = self._engine.replay_from()
+                self._engine.load_matrix(*load_daily_closes(
+                    self._engine.symbols, today=day_date(newest),
+                    since=None if since is None else day_date(since)))
+            self._engine.update(quotes)
+            self._table = self._engine.table()
+            self._bodies = {}
+            self._generation = snap.generation
+            return self._table
+
+    def body(self, key, build):
+        """
+        'key' cevabını döndürür; yoksa build() ile hazırlayıp saklar. Anahtar
+        snapshot neslini içermelidir (nesil değişirken yarışan istek eski
+        tabloyla hazırladığı cevabı yeni neslin adıyla saklamasın).
+        """
+        bodies = self._bodies
+        body = bodies.get(key)
+        if body is None:
+            body = build()
+            # Tarama koşulları ve symbols= ile anahtar uzayı sınırsız; nesil
+            # gece ve hafta sonu değişmediği için bellek büyümesin
+            if len(bodies) >= QUERY_CACHE_MAX:
+                bodies.clear()
+            bodies[key] = body
+        return body
+
+    def reset(self):
+        with self._lock:
+            self._engine = None
+            self._generation = None
+            self._table = None
+            self._bodies = {}
+
+
+indicator_store = IndicatorStore()
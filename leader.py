@@ -0,0 +1,136 @@
+# leader.py
+# Gunicorn worker'ları arasında tek lider seçimi.
+#
+# Her worker app.py'yi import ettiğinde arka plan thread'ini başlatır. Lider
+# seçimi olmadan 'gunicorn -w 4' dört ayrı yfinance döngüsü ve dört yazıcı demek.
+# Burada fiyat güncelleyiciyi sadece dosya kilidini alan süreç çalıştırır.
+# Kilit işletim sistemi kilididir (flock): lider süreç ölürse kilit hemen
+# serbest kalır ve bekleyen bir worker birkaç saniye içinde devralır.
+#
+# Kimin lider olduğu ve son kalp atışı RefresherLease tablosuna yazılır;
+# böylece herhangi bir worker /api/status/refresher üzerinden bunu gösterebilir.
+import os
+import socket
+import threading
+from datetime import datetime
+
+from filelock import FileLock, Timeout
+
+from db_models import db, RefresherLease
+
+LEASE_NAME = 'price_refresher'
+LEADER_RETRY_SECONDS = 5       # Takipçi bu aralıkla kilidi dener
+HEARTBEAT_SECONDS = 5          # Lider bu aralıkla kalp atışı yazar
+HEARTBEAT_STALE_SECONDS = 3 * HEARTBEAT_SECONDS
+
+
+def _default_lock_path():
+    # Kilit dosyası veritabanı dosyasının yanında durur
+    return f"{db.database}.refresher.lock"
+
+
+class LeaderLease:
+    """
+    Dosya kilidine dayalı liderlik. try_acquire() bloklamaz; kilit alınırsa
+    lider olunur ve kalp atışı thread'i başlar, release() ile bırakılır.
+    """
+
+    def __init__(self, name=LEASE_NAME, lock_path=None):
+        self.name = name
+        self._lock_path = lock_path
+        self._lock = None
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = None
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+
+    @property
+    def is_leader(self):
+        return self._lock is not None and self._lock.is_locked
+
+    def try_acquire(self):
+        """
+        Kilidi beklemeden almaya çalışır. Lider olunduysa True döner.
+        Kira kaydı yazılamazsa kilit bırakılır ve hata yükseltilir.
+        """
+        if self.is_leader:
+            return True
+        # Süreç kimliği fork sonrası değişmiş olabilir
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        # thread_local=False: durum sorgusu istek thread'lerinden de yapılır
+        lock = FileLock(self._lock_path or _default_lock_path(), thread_local=False)
+        try:
+            lock.acquire(timeout=0)
+        except Timeout:
+            return False
+
+        try:
+            self._write_lease(acquired=True)
+        except Exception:
+            # Kayıt yazılamadı (örn. 'database is locked'): kilidi tutarak
+            # kalmayalım, yoksa bu süreç ölene kadar kimse lider olamaz
+            lock.release()
+            raise
+        self._lock = lock
+        self._heartbeat_stop.clear()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._heartbeat_thread.start()
+        print(f"[LİDER] {self.holder} fiyat güncelleyici liderliğini aldı.")
+        return True
+
+    def release(self):
+        if not self.is_leader:
+            return
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout=HEARTBEAT_SECONDS)
+        self._lock.release()
+        self._lock = None
+        print(f"[LİDER] {self.holder} liderliği bıraktı.")
+
+    def _heartbeat_loop(self):
+        while not self._heartbeat_stop.wait(HEARTBEAT_SECONDS):
+            try:
+                self._write_lease(acquired=False)
+            except Exception as e:
+                print(f"HATA (Lider kalp atışı): {e}")
+
+    def _write_lease(self, acquired):
+        now = datetime.now()
+        values = {'holder': self.holder, 'pid': os.getpid(), 'heartbeat_at': now}
+        if acquired:
+            values['acquired_at'] = now
+        with db.connection_context():
+            (RefresherLease
+             .insert(name=self.name, **values)
+             .on_conflict(conflict_target=[RefresherLease.name],
+                          update=values)
+             .execute())
+
+
+def lease_status(lease):
+    """
+    Liderlik durumunu (DB kaydı + bu worker'ın durumu) dict olarak döndürür.
+    """
+    row = RefresherLease.get_or_none(RefresherLease.name == lease.name)
+    leader = None
+    if row is not None:
+        age = (datetime.now() - row.heartbeat_at).total_seconds()
+        leader = {
+            "holder": row.holder,
+            "pid": row.pid,
+            "acquiredAt": row.acquired_at.isoformat(),
+            "heartbeatAt": row.heartbeat_at.isoformat(),
+            "heartbeatAgeSeconds": round(age, 1),
+            "stale": age > HEARTBEAT_STALE_SECONDS,
+        }
+    return {
+        "lease": lease.name,
+        "leader": leader,
+        "thisWorker": {
+            "holder": f"{socket.gethostname()}:{os.getpid()}",
+            "isLeader": lease.is_leader,
+        },
+    }
+
+
+refresher_lease = LeaderLease()
@@ -0,0 +1,125 @@
+# market.py
+# Piyasa özeti: en çok yükselen/düşenler, piyasa genişliği (yükselen/düşen sayısı)
+# ve sektör/tür bazında ortalama değişim.
+#
+# Eskiden her istemci tüm companies listesini indirip bunları her yoklamada
+# JavaScript'te hesaplıyordu. Burada snapshot her yeniden oluşturulduğunda
+# (yani her Price yazımından sonra bir kez) fiyat/önceki kapanış sütunları
+# üzerinde NumPy ile hesaplanır; istek anında hiçbir şey yeniden hesaplanmaz.
+import numpy as np
+
+MAX_TOP = 50      # Grup başına saklanan en fazla yükselen/düşen sayısı
+DEFAULT_TOP = 10
+
+# Yükselen/düşen listelerindeki alanlar
+MOVER_FIELDS = ('symbol', 'name', 'type', 'sector', 'price', 'previousClose')
+
+
+def _float_column(payload, key):
+    # None -> NaN
+    return np.array([row[key] for row in payload], dtype=float)
+
+
+def _group_stats(codes, n_groups, pct, valid):
+    """
+    Grup kodlarına göre sayım ve ortalama değişim (bincount ile tek geçişte).
+    """
+    count = np.bincount(codes, minlength=n_groups)
+    priced = np.bincount(codes, weights=valid, minlength=n_groups)
+    pct0 = np.where(valid, pct, 0.0)
+    total = np.bincount(codes, weights=pct0, minlength=n_groups)
+    advancers = np.bincount(codes, weights=valid & (pct0 > 0), minlength=n_groups)
+    decliners = np.bincount(codes, weights=valid & (pct0 < 0), minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average = total / priced
+    return count, priced, average, advancers, decliners
+
+
+class MarketSummary:
+    """
+    Bir snapshot payload'undan hesaplanan değişmez piyasa özeti.
+    view() sadece hazır listeleri dilimler.
+    """
+
+    def __init__(self, payload):
+        n = len(payload)
+        price = _float_column(payload, 'price')
+        prev_close = _float_column(payload, 'previousClose')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            change = price - prev_close
+            pct = np.where(prev_close > 0, change / prev_close * 100, np.nan)
+        valid = np.isfinite(pct)
+
+        sectors = np.array([row['sector'] or 'bilinmiyor' for row in payload], dtype=object)
+        types = np.array([row['type'] or 'bilinmiyor' for row in payload], dtype=object)
+        symbols = np.array([row['symbol'] for row in payload], dtype=object)
+
+        # Yükselenler (değişim > 0) en büyük değişimden, düşenler (değişim < 0) en
+        # küçükten bir kez sıralanır (eşitlikte sembol adı); her grubun listeleri
+        # bu sıraların maskelenmesiyle çıkar. Değişmeyenler iki listede de yoktur.
+        pct0 = np.where(valid, pct, 0.0)
+        up_idx, down_idx = np.flatnonzero(pct0 > 0), np.flatnonzero(pct0 < 0)
+        gainers_order = up_idx[np.lexsort((symbols[up_idx], -pct[up_idx]))]
+        losers_order = down_idx[np.lexsort((symbols[down_idx], pct[down_idx]))]
+
+        def movers(indices):
+            return [dict({f: payload[i][f] for f in MOVER_FIELDS},
+                         change=float(change[i]), changePercent=float(pct[i])) for i in indices]
+
+        def group_view(codes, g, breadth):
+            # codes None ise tüm piyasa, değilse g grubundaki satırlar
+            gainers, losers = gainers_order, losers_order
+            if codes is not None:
+                gainers, losers = gainers[codes[gainers] == g], losers[codes[losers] == g]
+            return {
+                "breadth": breadth,
+                "gainers": movers(gainers[:MAX_TOP]),
+                "losers": movers(losers[:MAX_TOP]),
+            }
+
+        def breadth_of(count, priced, advancers, decliners):
+            return {
+                "total": int(count),
+                "advancers": int(advancers),
+                "decliners": int(decliners),
+                "unchanged": int(priced - advancers - decliners),
+                "noData": int(count - priced),
+            }
+
+        self._views = {
+            None: group_view(None, None, breadth_of(n, valid.sum(), (pct[valid] > 0).sum(), (pct[valid] < 0).sum()))
+        }
+        self.tables = {}
+        for key, labels in (('sector', sectors), ('type', types)):
+            names, codes = np.unique(labels.astype(str), return_inverse=True)
+            count, priced, average, advancers, decliners = _group_stats(codes, len(names), pct, valid)
+            table = []
+            for g, name in enumerate(names.tolist()):
+                breadth = breadth_of(count[g], priced[g], advancers[g], decliners[g])
+                self._views[(key, name)] = group_view(codes, g, breadth)
+                table.append(dict(breadth, **{key: name, "avgChangePercent": None if np.isnan(average[g]) else float(average[g])}))
+            self.tables[key] = table
+
+    def view(self, top=DEFAULT_TOP, sector=None, type=None):
+        """
+        İstenen grubun ilk 'top' yükselen/düşenini ve genişliğini, ayrıca
+        sektör ve tür tablolarını döndürür.
+        Geçersiz top veya bilinmeyen sektör/tür için ValueError fırlatır.
+        """
+        if not 1 <= top <= MAX_TOP:
+            raise ValueError(f"top 1 ile {MAX_TOP} arasında olmalı")
+        if sector is not None and type is not None:
+            raise ValueError("sector ve type birlikte verilemez")
+        key = ('sector', sector) if sector is not None else ('type', type) if type is not None else None
+        group = self._views.get(key)
+        if group is None:
+            raise ValueError(f"Bilinmeyen {key[0]}: {key[1]}")
+        return {
+            "filter": {"sector": sector, "type": type},
+            "top": top,
+            "breadth": group["breadth"],
+            "gainers": group["gainers"][:top],
+            "losers": group["losers"][:top],
+            "sectors": self.tables['sector'],
+            "types": self.tables['type'],
+        }
@@ -0,0 +1,144 @@
+# metrics.py
+# Prometheus metrikleri: güncelleme aşamalarının süreleri, endpoint gecikmesi ve
+# durum kodları, DB bağlantı bekleme süresi, upstream hataları ve varlık sınıfı
+# başına en yeni kotasyonun yaşı.
+#
+# Gunicorn'da her worker ayrı bir süreçtir. PROMETHEUS_MULTIPROC_DIR tanımlıysa
+# (bkz. gunicorn.conf.py) prometheus_client her süreçte değerleri bu dizindeki
+# mmap dosyalarına yazar ve /metrics hangi worker'a düşerse düşsün tüm
+# worker'ların toplamını döndürür. Tanımlı değilse (tek süreç, geliştirme)
+# varsayılan süreç içi kayıt kullanılır.
+# Kayıt maliyeti bir sözlük araması + kilitli bir toplamadır; üretimde açık kalabilir.
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from prometheus_client import (CollectorRegistry, Counter, Histogram, REGISTRY,
+                               CONTENT_TYPE_LATEST, generate_latest)
+from prometheus_client.core import GaugeMetricFamily
+
+from db_models import db, Price
+
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+
+# Güncelleme aşamaları saniyeler, istekler milisaniyeler mertebesinde
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+REQUEST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+DB_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+REFRESH_STAGE_SECONDS = Histogram(
+    'sanbist_refresh_stage_seconds', 'Fiyat güncelleme aşamalarının süresi',
+    ['stage'], buckets=STAGE_BUCKETS)
+HTTP_REQUEST_SECONDS = Histogram(
+    'sanbist_http_request_seconds', 'Endpoint başına istek süresi',
+    ['endpoint', 'method'], buckets=REQUEST_BUCKETS)
+HTTP_REQUESTS = Counter(
+    'sanbist_http_requests', 'Endpoint ve durum kodu başına istek sayısı',
+    ['endpoint', 'method', 'status'])
+DB_CONNECTION_WAIT_SECONDS = Histogram(
+    'sanbist_db_connection_wait_seconds', 'Havuzdan bağlantı alma süresi',
+    buckets=DB_WAIT_BUCKETS)
+UPSTREAM_ERRORS = Counter(
+    'sanbist_upstream_errors', 'Upstream (yfinance) hata sayısı',
+    ['source'])
+
+
+@contextmanager
+def stage_timer(stage):
+    """
+    with stage_timer('bist_download'): ... bloğunun süresini kaydeder
+    (hata fırlatsa bile).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REFRESH_STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def record_upstream_errors(source, count=1):
+    if count:
+        UPSTREAM_ERRORS.labels(source).inc(count)
+
+
+class QuoteAgeCollector:
+    """
+    Varlık sınıfı başına en yeni Price zaman damgasının yaşını, /metrics
+    çağrıldığı anda DB'den okur. Veri DB'de olduğu için hangi worker
+    cevaplarsa cevaplasın aynı değer döner (süreçler arası toplama gerekmez).
+    """
+
+    def __init__(self, asset_classes):
+        # asset_class -> sembol listesi
+        self._class_of = {s: name for name, symbols in asset_classes.items() for s in symbols}
+        self._names = list(asset_classes)
+
+    def _family(self):
+        return GaugeMetricFamily('sanbist_quote_age_seconds',
+                                 'Varlık sınıfının en yeni kotasyonunun yaşı',
+                                 labels=['asset_class'])
+
+    def describe(self):
+        # Kayıt sırasında collect() (yani DB sorgusu) çalışmasın
+        yield self._family()
+
+    def collect(self):
+        gauge = self._family()
+        newest = {}
+        try:
+            with db.connection_context():
+                rows = (Price
+                        .select(Price.symbol, Price.timestamp)
+                        .where(Price.price.is_null(False))
+                        .tuples())
+                for symbol, ts in rows:
+                    name = self._class_of.get(symbol)
+                    if name is not None and ts is not None and (name not in newest or ts > newest[name]):
+                        newest[name] = ts
+        except Exception as e:
+            # Scrape'in geri kalanı (diğer metrikler) yine dönsün
+            print(f"HATA (quote age metriği): {e}")
+        now = datetime.now()
+        for name in self._names:
+            if name in newest:
+                gauge.add_metric([name], (now - newest[name]).total_seconds())
+        yield gauge
+
+
+_collectors = []
+
+
+def register_collector(collector):
+    """
+    Scrape anında çalışan bir collector ekler (çok süreçli modda da geçerli).
+    """
+    _collectors.append(collector)
+    if not os.environ.get(MULTIPROC_DIR_ENV):
+        REGISTRY.register(collector)
+
+
+def metrics_payload():
+    """
+    /metrics cevabının gövdesi ve içerik tipi.
+    """
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        # Her scrape'te tüm worker'ların dosyalarını birleştiren geçici kayıt
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _collectors:
+            registry.register(collector)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid):
+    """
+    Gunicorn child_exit kancasından çağrılır; ölen worker'ın canlı
+    (gauge) dosyalarını temizler.
+    """
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
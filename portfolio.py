@@ -0,0 +1,218 @@
+# portfolio.py
+# Toplu portföy değerlemesi (POST /api/portfolio/valuation).
+#
+# İstemciler portföyü değerlemek için tüm companies listesini indirip pozisyonları
+# tek tek çarpıyordu. Alarm ve raporlar için on binlerce portföyün sunucuda
+# değerlenmesi gerekiyor. Pozisyon başına Python döngüsü yerine:
+#   - Snapshot başına bir kez (ilk istendiğinde) her sembolün TL cinsinden birim
+#     fiyatı ve önceki kapanışı vektör olarak hazırlanır (PortfolioPricer).
+#     Döviz/ons gibi TL dışı kotasyonlar o anki (ve önceki kapanıştaki) kurla
+#     çevrilir; yani günlük K/Z kur hareketini de içerir.
+#   - İstekteki tüm pozisyonlar (portföy, sembol sütunu, miktar) dizilerine
+#     düzleştirilir; değer, önceki değer ve varlık sınıfı kırılımı seyrek
+#     portföy x sembol matrisi ile fiyat vektörünün çarpımıdır (np.bincount).
+#   - USD karşılıkları USDTRY ile tek vektör işlemiyle bulunur.
+# Python'da kalan tek döngüler JSON'u okumak ve cevabı yazmaktır.
+import math
+from itertools import repeat
+
+import numpy as np
+
+MAX_PORTFOLIOS = 50_000
+MAX_POSITIONS = 1_000_000       # İstek başına toplam pozisyon
+MAX_BODY_BYTES = 32 * 1024 * 1024
+BASE_CURRENCY = 'TRY'  # Değerler önce TL'ye çevrilir, USD karşılığı USDTRY ile
+
+
+def quote_currency(symbol):
+    """
+    Sembolün fiyatının para birimi: 'EURUSD=X' -> USD, 'USDTRY=X' -> TRY,
+    vadeli ons (GC=F) -> USD, diğerleri (hisse, gram/sikke, sepet) -> TRY.
+    """
+    if symbol.endswith('=X') and len(symbol) == 8:
+        return symbol[3:6]
+    if symbol.endswith('=F'):
+        return 'USD'
+    return BASE_CURRENCY
+
+
+def asset_class(asset_type):
+    # 'maden_ons', 'maden_gram' -> 'maden'; 'doviz_capraz' -> 'doviz'; 'hisse' -> 'hisse'
+    return asset_type.split('_')[0]
+
+
+def _column(payload, field):
+    return np.array([np.nan if row[field] is None else row[field] for row in payload], dtype=float)
+
+
+def _rounded(values, decimals):
+    # 1 veya 2 boyutlu dizi -> (iç içe) liste; NaN/sonsuz -> None (JSON'da geçerli olsun)
+    rounded = np.round(values, decimals).astype(object)
+    rounded[~np.isfinite(values)] = None
+    return rounded.tolist()
+
+
+def _rounded_one(value, decimals):
+    return None if not math.isfinite(value) else round(value, decimals)
+
+
+class Valuation:
+    """
+    Bir isteğin ham (TL, yuvarlanmamış) değerleme dizileri; portföy sırasıyla.
+    """
+    __slots__ = ('ids', 'positions', 'total', 'prev_total', 'breakdown', 'present', 'unknown', 'unpriced')
+
+    def __init__(self, ids, positions, total, prev_total, breakdown, present, unknown, unpriced):
+        self.ids = ids
+        self.positions = positions    # Toplam pozisyon sayısı
+        self.total = total            # (n,) güncel değer
+        self.prev_total = prev_total  # (n,) önceki kapanışa göre değer
+        self.breakdown = breakdown    # (n, sınıf) güncel değer
+        self.present = present        # (n, sınıf) portföyde o sınıftan fiyatlı pozisyon var mı
+        self.unknown = unknown        # Portföy başına bilinmeyen semboller
+        self.unpriced = unpriced      # Portföy başına fiyatı olmayan semboller
+
+
+class PortfolioPricer:
+    """
+    Bir snapshot payload'u için TL cinsinden birim fiyat vektörleri (değişmez).
+    """
+
+    def __init__(self, payload):
+        self.symbols = [row['symbol'] for row in payload]
+        self.position = {s: i for i, s in enumerate(self.symbols)}
+        price = _column(payload, 'price')
+        prev_close = _column(payload, 'previousClose')
+
+        # Kurlar: XXXTRY=X kotasyonları (önceki kapanış yoksa güncel kur)
+        self.rates, prev_rates = {BASE_CURRENCY: 1.0}, {BASE_CURRENCY: 1.0}
+        for row in payload:
+            symbol = row['symbol']
+            if symbol.endswith('TRY=X') and len(symbol) == 8 and row['price'] is not None:
+                self.rates[symbol[:3]] = row['price']
+                prev_rates[symbol[:3]] = row['previousClose'] if row['previousClose'] is not None else row['price']
+        currencies = [quote_currency(s) for s in self.symbols]
+        rate = np.array([self.rates.get(c, np.nan) for c in currencies])
+        prev_rate = np.array([prev_rates.get(c, np.nan) for c in currencies])
+
+        self.price = price * rate
+        # Önceki kapanışı olmayan sembolün günlük K/Z'si 0 sayılır
+        prev = prev_close * prev_rate
+        self.prev = np.where(np.isfinite(prev), prev, self.price)
+        self.usdtry = self.rates.get('USD', math.nan)
+        self.usdtry_prev = prev_rates.get('USD', math.nan)
+
+        classes = [asset_class(row['type']) for row in payload]
+        self.classes = sorted(set(classes))
+        class_index = {c: i for i, c in enumerate(self.classes)}
+        self.class_of = np.array([class_index[c] for c in classes], dtype=np.intp)
+
+    def valuate(self, portfolios):
+        """
+        portfolios: [{"id": ..., "holdings": {sembol: miktar}}, ...]
+        Tüm pozisyonları tek seferde değerler ve Valuation döndürür. Bilinmeyen ve
+        fiyatı olmayan semboller değere katılmaz, ayrıca listelenir.
+        Geçersiz istekte ValueError.
+        """
+        if not isinstance(portfolios, list) or not portfolios:
+            raise ValueError("portfolios boş olmayan bir liste olmalı")
+        if len(portfolios) > MAX_PORTFOLIOS:
+            raise ValueError(f"İstek başına en fazla {MAX_PORTFOLIOS} portföy")
+
+        # --- Düzleştirme: pozisyonlar -> (portföy, sembol, miktar) dizileri ---
+        ids, counts, symbols, quantities = [], [], [], []
+        for i, p in enumerate(portfolios):
+            holdings = p.get('holdings') if isinstance(p, dict) else None
+            if not isinstance(holdings, dict):
+                raise ValueError(f"portfolios[{i}].holdings bir {{sembol: miktar}} nesnesi olmalı")
+            ids.append(p.get('id', i))
+            counts.append(len(holdings))
+            symbols.extend(holdings)
+            quantities.extend(holdings.values())
+        n_positions = len(symbols)
+        if n_positions > MAX_POSITIONS:
+            raise ValueError(f"İstek başına en fazla {MAX_POSITIONS} pozisyon")
+        try:
+            quantity = np.array(quantities, dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError("Miktarlar sayı olmalı")
+        if not np.isfinite(quantity).all():
+            raise ValueError("Miktarlar sonlu sayılar olmalı")
+
+        # Sembol -> sütun (bilinmeyen -1); map + dict.get döngüyü C'de tutar
+        col = np.fromiter(map(self.position.get, symbols, repeat(-1, n_positions)), dtype=np.intp, count=n_positions)
+        owner = np.repeat(np.arange(len(portfolios), dtype=np.intp), counts)
+
+        # --- Seyrek matris x fiyat vektörü ---
+        known = col >= 0
+        safe_col = np.where(known, col, 0)
+        priced = known & np.isfinite(self.price[safe_col])
+        value = np.where(priced, quantity * self.price[safe_col], 0.0)
+        prev_value = np.where(priced, quantity * self.prev[safe_col], 0.0)
+
+        n, k = len(portfolios), len(self.classes)
+        total = np.bincount(owner, weights=value, minlength=n)
+        prev_total = np.bincount(owner, weights=prev_value, minlength=n)
+        breakdown = np.bincount(owner * k + self.class_of[safe_col], weights=value,
+                                minlength=n * k).reshape(n, k)
+        # Kırılımda sadece portföyde pozisyonu olan sınıflar gösterilir
+        present = np.bincount(owner * k + self.class_of[safe_col], weights=priced,
+                              minlength=n * k).reshape(n, k) > 0
+
+        # Değere katılmayan pozisyonlar (seyrek; sadece onlar için döngü)
+        unknown = [[] for _ in range(n)]
+        unpriced = [[] for _ in range(n)]
+        for j in np.flatnonzero(~priced).tolist():
+            (unknown if col[j] < 0 else unpriced)[owner[j]].append(symbols[j])
+        return Valuation(ids, n_positions, total, prev_total, breakdown, present, unknown, unpriced)
+
+    def value(self, portfolios):
+        """
+        valuate() sonucunu API cevabına çevirir: portföy başına TL/USD değer,
+        günlük K/Z ve varlık sınıfı kırılımı, ayrıca tüm portföylerin toplamı.
+        """
+        val = self.valuate(portfolios)
+        total, prev_total, breakdown = val.total, val.prev_total, val.breakdown
+
+        # USD: güncel değer güncel kurla, önceki değer önceki kurla
+        total_usd = total / self.usdtry
+        pnl = total - prev_total
+        pnl_usd = total_usd - prev_total / self.usdtry_prev
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pnl_pct = np.where(prev_total != 0, pnl / prev_total * 100, np.nan)
+            pnl_usd_pct = np.where(prev_total != 0, pnl_usd / (prev_total / self.usdtry_prev) * 100, np.nan)
+            weight = breakdown / total[:, None]
+
+        # --- Cevap ---
+        columns = (_rounded(total, 2), _rounded(total_usd, 2), _rounded(pnl, 2), _rounded(pnl_usd, 2),
+                   _rounded(pnl_pct, 4), _rounded(pnl_usd_pct, 4))
+        # Kırılım satırları: (sınıf, TL, USD, ağırlık, var mı) listeleri
+        class_rows = zip(_rounded(breakdown, 2), _rounded(breakdown / self.usdtry, 2),
+                         _rounded(weight, 4), val.present.tolist())
+        classes = self.classes
+        results = []
+        for (v, v_usd, p, p_usd, pct, pct_usd), (c_try, c_usd, c_weight, has), pid, unk, unp in zip(
+                zip(*columns), class_rows, val.ids, val.unknown, val.unpriced):
+            results.append({
+                "id": pid,
+                "value": {"TRY": v, "USD": v_usd},
+                "dailyPnl": {"TRY": p, "USD": p_usd},
+                "dailyPnlPercent": {"TRY": pct, "USD": pct_usd},
+                "breakdown": {c: {"TRY": t, "USD": u, "weight": w}
+                              for c, t, u, w, h in zip(classes, c_try, c_usd, c_weight, has) if h},
+                "unknown": unk,
+                "unpriced": unp,
+            })
+
+        grand, grand_prev = float(total.sum()), float(prev_total.sum())
+        return {
+            "rates": {f"{c}{BASE_CURRENCY}": r for c, r in sorted(self.rates.items()) if c != BASE_CURRENCY},
+            "totals": {
+                "portfolios": len(results),
+                "positions": val.positions,
+                "value": {"TRY": round(grand, 2), "USD": _rounded_one(grand / self.usdtry, 2)},
+                "dailyPnl": {"TRY": round(grand - grand_prev, 2),
+                             "USD": _rounded_one(grand / self.usdtry - grand_prev / self.usdtry_prev, 2)},
+            },
+            "portfolios": results,
+        }
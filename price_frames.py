@@ -0,0 +1,75 @@
+# price_frames.py
+# yf.download çıktısını (tarih x (alan, sembol) geniş tablo) Price satırlarına çevirir.
+#
+# Eski yöntem tabloyu stack'leyip her sembol için uzun tabloyu iki kez
+# maskeyle tarıyordu (sembol sayısında O(N²)). Burada bugün/dün satırları
+# tek seferde sembol x alan tablolarına çevrilir; tüm kararlar (önceki kapanışa
+# geri düşme, hata satırları) sütun bazında verilir ve satırlar tek geçişte oluşur.
+from datetime import datetime
+
+OHLCV_FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def _day_table(data, day, symbols):
+    """
+    Verilen günün satırını sembol x alan tablosuna çevirir (eksik semboller NaN).
+    """
+    row = data.loc[day]
+    table = row.unstack(level=0)
+    return table.reindex(index=symbols, columns=list(OHLCV_FIELDS))
+
+
+def _as_objects(series):
+    # NaN -> None, numpy skalerleri -> Python float/int (SQLite doğrudan yazabilsin)
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def build_bist_price_rows(data, symbols, now=None):
+    """
+    2 günlük yf.download verisinden Price tablosuna yazılacak satırları üretir.
+
+    - Bugün (en son tarih) için hiç verisi olmayan sembol: 'Bugün verisi yok' hatası
+    - Bugün kapanışı yoksa dünkü kapanış fiyat olarak kullanılır
+    - Yine de fiyat yoksa: 'yf.download verisi bulunamadı' hatası
+    Zaman damgası tüm parti için bir kez alınır.
+    """
+    if now is None:
+        now = datetime.now()
+    if data is None or data.empty or 'Close' not in data:
+        return []
+
+    symbols = list(symbols)
+    today = _day_table(data, data.index.max(), symbols)
+    yesterday_close = _day_table(data, data.index.min(), symbols)['Close']
+
+    # Eski stack() davranışı: tüm alanları NaN olan (tarih, sembol) satırı yok sayılır
+    has_today = today.notna().any(axis=1).to_numpy()
+    price = today['Close'].fillna(yesterday_close)
+    has_price = price.notna().to_numpy()
+
+    price_col = _as_objects(price)
+    prev_col = _as_objects(yesterday_close)
+    open_col = _as_objects(today['Open'])
+    high_col = _as_objects(today['High'])
+    low_col = _as_objects(today['Low'])
+    volume_col = _as_objects(today['Volume'])
+
+    rows = []
+    for i, symbol in enumerate(symbols):
+        if not has_today[i]:
+            rows.append({'symbol': symbol, 'error': 'Bugün verisi yok', 'timestamp': now})
+        elif has_price[i]:
+            rows.append({
+                'symbol': symbol,
+                'price': price_col[i],
+                'previousClose': prev_col[i],
+                'open': open_col[i],
+                'high': high_col[i],
+                'low': low_col[i],
+                'volume': volume_col[i],
+                'timestamp': now,
+                'error': None
+            })
+        else:
+            rows.append({'symbol': symbol, 'error': 'yf.download verisi bulunamadı', 'timestamp': now})
+    return rows
@@ -0,0 +1,136 @@
+# price_writer.py
+# Price tablosuna sadece değişen satırları yazar.
+#
+# Eski yöntem her döngüde Price.replace_many ile ~117 satırın tamamını yeniden
+# yazıyordu; SQLite'ta REPLACE = DELETE + INSERT olduğu için borsa kapalıyken bile
+# tüm sayfalar ve indeksler değişiyordu. Burada son yazılan değerler bellekte
+# tutulur; her döngüde fark çıkarılır ve:
+#   - değeri değişen satırlar tek bir INSERT ... ON CONFLICT DO UPDATE ile,
+#   - değişmeyenlerin sadece zaman damgası tek bir UPDATE ... WHERE IN ile yazılır.
+#
+# Fiyatı alınamayan bir sembolün daha önce geçerli bir fiyatı varsa o değerler
+# silinmez: satır son geçerli değerleri ve zaman damgasıyla (yani yaşıyla) kalır,
+# sadece 'error' alanına hata yazılır ('stale' satır, bkz. breaker.py).
+import math
+from datetime import datetime
+
+import peewee as pw
+
+from db_models import Price
+
+# Bir satırın "değişti" sayılması için bakılan alanlar (timestamp hariç)
+PRICE_VALUE_FIELDS = ('price', 'previousClose', 'open', 'high', 'low', 'volume', 'error')
+
+# UPSERT'te çakışma olursa güncellenecek kolonlar
+_UPSERT_UPDATE = {getattr(Price, f): pw.EXCLUDED[f] for f in PRICE_VALUE_FIELDS + ('timestamp', 'revision')}
+
+
+def _normalize_value(value):
+    # NaN (pandas) ve None aynı şeydir: SQLite ikisini de NULL olarak saklar
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def is_stale(price, error):
+    """
+    Son geçerli değerleriyle sunulan ama son güncellemesi başarısız olan satır.
+    """
+    return price is not None and error is not None
+
+
+class WriteResult:
+    """
+    Bir yazma döngüsünün sonucu. commit() ile belleğe işlenir.
+    """
+    __slots__ = ('changed', 'unchanged', 'stale', 'values')
+
+    def __init__(self, changed, unchanged, stale, values):
+        self.changed = changed      # Yazılan satırlar (dict listesi)
+        self.unchanged = unchanged  # Sadece zaman damgası güncellenen semboller
+        self.stale = stale          # Son geçerli değerleri korunan semboller
+        self.values = values        # symbol -> (değerler..., revision, timestamp)
+
+
+class PriceWriter:
+    """
+    Son yazılan Price değerlerinin bellek içi kopyasını tutar ve farkı yazar.
+    Kopya ilk kullanımda (veya reset() sonrası) veritabanından bir kez yüklenir.
+    """
+
+    def __init__(self):
+        self._last = None
+
+    def reset(self):
+        """
+        Bellek içi kopyayı unutur; sonraki write() DB'den yeniden yükler.
+        (Liderlik değiştiğinde veya yazma başarısız olduğunda çağrılır.)
+        """
+        self._last = None
+
+    def _load(self):
+        columns = [Price.symbol] + [getattr(Price, f) for f in PRICE_VALUE_FIELDS] + [Price.revision, Price.timestamp]
+        return {row[0]: row[1:] for row in Price.select(*columns).tuples()}
+
+    def write(self, rows, generation, now=None):
+        """
+        rows içindeki satırları DB'deki son halleriyle karşılaştırıp sadece
+        değişenleri yazar. Değişen satırlara 'revision' = generation atanır,
+        değişmeyenler eski revizyonunu korur. Fiyatı olmayan hata satırı, sembolün
+        son geçerli fiyatı varsa onun üzerine yazılmaz; o değerler ve zaman
+        damgası korunup hata eklenir (zaman damgası tazelenmez).
+        db.atomic() içinde çağrılmalı; transaction commit olduktan sonra
+        dönen sonuç commit() ile işlenmelidir.
+        """
+        if self._last is None:
+            self._last = self._load()
+        now = now or datetime.now()
+
+        changed, unchanged, stale = [], [], []
+        values = {}
+        for item in rows:
+            # Tüm satırlar aynı kolonlarla yazılır; eksik alanlar NULL olur
+            for field in PRICE_VALUE_FIELDS:
+                item[field] = _normalize_value(item.get(field))
+
+            symbol = item['symbol']
+            old = self._last.get(symbol)
+            if item['price'] is None and item['error'] is not None and old is not None and old[0] is not None:
+                # Son geçerli değerleri koru, sadece hatayı işaretle
+                item.update(zip(PRICE_VALUE_FIELDS[:-1], old[:len(PRICE_VALUE_FIELDS) - 1]))
+                item['timestamp'] = old[-1]
+                stale.append(symbol)
+            new_values = tuple(item[f] for f in PRICE_VALUE_FIELDS)
+            if old is None or old[:-2] != new_values:
+                item['revision'] = generation
+                changed.append(item)
+            elif is_stale(item['price'], item['error']):
+                # Aynı hata sürüyor: yazılacak bir şey yok (zaman damgası da eski kalmalı)
+                item['revision'] = old[-2]
+            else:
+                item['revision'] = old[-2]
+                unchanged.append(symbol)
+                item['timestamp'] = now
+            values[symbol] = new_values + (item['revision'], item['timestamp'])
+
+        if changed:
+            (Price
+             .insert_many(changed)
+             .on_conflict(conflict_target=[Price.symbol], update=_UPSERT_UPDATE)
+             .execute())
+        if unchanged:
+            # Değer aynı; sadece "en son ne zaman doğrulandı" bilgisini tazele
+            Price.update(timestamp=now).where(Price.symbol.in_(unchanged)).execute()
+
+        return WriteResult(changed, unchanged, stale, values)
+
+    def commit(self, result):
+        """
+        Başarıyla commit edilmiş bir yazımı bellek içi kopyaya işler.
+        """
+        if self._last is None:
+            self._last = {}
+        self._last.update(result.values)
+
+
+price_writer = PriceWriter()
@@ -0,0 +1,322 @@
+# providers.py
+# Piyasa verisi sağlayıcıları: fiyat güncelleme, endeks endpoint'i ve tohumlama
+# upstream'e doğrudan değil, buradaki arayüz üzerinden gider.
+#
+#   - YFinanceProvider: canlı yfinance (varsayılan)
+#   - FakeProvider: ağa çıkmayan, deterministik sentetik veri üreten sahte
+#     sağlayıcı; gecikme ve hata oranı ayarlanabilir. Benchmark'lar ve
+#     çevrimdışı geliştirme için (SANBIST_PROVIDER=fake).
+#
+# Aktif sağlayıcı get_provider() ile alınır, set_provider() ile değiştirilir.
+#
+# pandas ve yfinance sadece veri indiren metodların içinde import edilir: API'nin
+# okuma yolları (snapshot, endeks önbelleği) bunlara ihtiyaç duymaz ve worker'lar
+# bu kütüphaneleri yüklemeden hızlı açılır.
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+OHLCV_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+HISTORY_SYMBOL_TIMEOUT_SECONDS = 20  # Tek sembolün geçmiş isteği için zaman aşımı
+
+
+class MarketDataProvider:
+    """
+    Sağlayıcı arayüzü. Tüm metodlar havuz thread'lerinden eşzamanlı çağrılabilir.
+    """
+    name = None
+
+    def download_history(self, symbols):
+        """
+        Sembollerin son 2 günlük günlük OHLCV verisini yf.download biçiminde
+        (tarih x (alan, sembol)) döndürür. Verisi alınamayan semboller tablodan
+        eksik olabilir; tamamen başarısız çağrı hata fırlatır.
+        """
+        raise NotImplementedError
+
+    def fast_quote(self, symbol):
+        """
+        Tek sembolün anlık kotasyonunu Price satırı (dict) olarak döndürür.
+        """
+        raise NotImplementedError
+
+    def index_quote(self, symbol):
+        """
+        Endeksin anlık kotasyonunu /api/bist100 biçiminde döndürür.
+        marketState bilinmiyorsa 'UNKNOWN' olur.
+        """
+        raise NotImplementedError
+
+    def company_info(self, symbol):
+        """
+        Hissenin statik bilgisini {'name', 'sector'} olarak döndürür (ham sektör adı).
+        """
+        raise NotImplementedError
+
+    def daily_history(self, symbol, start, end):
+        """
+        Sembolün [start, end) tarih aralığındaki günlük OHLCV barlarını
+        (tarih indeksli, OHLCV_FIELDS sütunlu) DataFrame olarak döndürür.
+        Aralıkta işlem yoksa boş tablo döner; istek başarısızsa hata fırlatır.
+        """
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    name = 'yfinance'
+
+    def __init__(self, history_timeout=HISTORY_SYMBOL_TIMEOUT_SECONDS):
+        import yfinance as yf
+        self._yf = yf
+        self.history_timeout = history_timeout
+
+    # yf.download modül düzeyinde paylaşılan sözlükler kullandığı için aynı anda
+    # birden çok thread'den çağrılamaz; burada her sembolün geçmişi ayrı istenir ve
+    # parça yf.download ile aynı biçimde birleştirilir.
+    def download_history(self, symbols):
+        import pandas as pd
+        frames = {}
+        for symbol in symbols:
+            try:
+                history = self._yf.Ticker(symbol).history(period="2d", interval="1d", auto_adjust=False,
+                                                          timeout=self.history_timeout, raise_errors=True)
+            except Exception as e:
+                # Sembol tek başına atlanır; download_in_chunks onu bir sonraki turda yeniden dener
+                print(f"HATA ({symbol} history): {e}")
+                continue
+            if history.empty:
+                continue
+            history.index = history.index.tz_localize(None)
+            frames[symbol] = history[OHLCV_FIELDS]
+        if not frames:
+            return pd.DataFrame()
+        data = pd.concat(frames, axis=1, names=['Ticker', 'Price'])
+        return data.swaplevel(0, 1, axis=1).sort_index(axis=1)
+
+    # (fast_info tembeldir; ağ çağrısı .get() sırasında, yani çağıran thread içinde yapılır)
+    def fast_quote(self, symbol):
+        info = self._yf.Ticker(symbol).fast_info
+        price_val = info.get("lastPrice", info.get("regularMarketPrice"))
+        if not price_val:
+            return {'symbol': symbol, 'error': 'fast_info fiyatı yok', 'timestamp': datetime.now()}
+        return {
+            'symbol': symbol,
+            'price': price_val,
+            'previousClose': info.get("previousClose", info.get("regularMarketPreviousClose")),
+            'open': info.get("open", info.get("regularMarketOpen")),
+            'high': info.get("dayHigh", info.get("regularMarketDayHigh")),
+            'low': info.get("dayLow", info.get("regularMarketDayLow")),
+            'volume': info.get("volume", info.get("regularMarketVolume")),
+            'timestamp': datetime.now(),
+            'error': None
+        }
+
+    def index_quote(self, symbol):
+        info = self._yf.Ticker(symbol).fast_info
+        return {
+            "symbol": info.get("symbol", symbol),
+            "shortName": info.get("shortName", "BIST 100"),
+            "regularMarketPrice": info.get("lastPrice"),
+            "regularMarketOpen": info.get("open"),
+            "regularMarketDayHigh": info.get("dayHigh"),
+            "regularMarketDayLow": info.get("dayLow"),
+            "regularMarketPreviousClose": info.get("previousClose"),
+            "marketState": info.get("marketState", "UNKNOWN")
+        }
+
+    def company_info(self, symbol):
+        # O YAVAŞ ÇAĞRI: .info
+        full_info = self._yf.Ticker(symbol).info
+        return {
+            'name': full_info.get("longName", full_info.get("shortName", symbol)),
+            'sector': full_info.get("sector", "Diğer"),
+        }
+
+
+    def daily_history(self, symbol, start, end):
+        import pandas as pd
+        from yfinance.exceptions import YFPricesMissingError
+        try:
+            history = self._yf.Ticker(symbol).history(start=start, end=end, interval="1d", auto_adjust=False,
+                                                      timeout=self.history_timeout, raise_errors=True)
+        except YFPricesMissingError:
+            # Aralıkta hiç bar yok (tatil, halka arz öncesi); sembol yoksa YFTickerMissingError fırlar
+            return pd.DataFrame(columns=OHLCV_FIELDS)
+        history.index = history.index.tz_localize(None).normalize()
+        return history[OHLCV_FIELDS]
+
+
+# Bilinen sembollerin sahte taban fiyatları (diğerleri sembol adından türetilir)
+FAKE_BASE_PRICES = {
+    'USDTRY=X': 41.9, 'EURTRY=X': 48.7, 'GBPTRY=X': 55.8, 'EURUSD=X': 1.16,
+    'GC=F': 4000.0, 'SI=F': 48.0, 'PL=F': 1600.0, 'XU100.IS': 10500.0,
+}
+FAKE_SECTORS = ['Financial Services', 'Industrials', 'Basic Materials', 'Consumer Cyclical',
+                'Energy', 'Technology', 'Utilities', 'Real Estate', 'Communication Services',
+                'Consumer Defensive', 'Healthcare']
+
+
+class FakeError(RuntimeError):
+    pass
+
+
+class FakeProvider(MarketDataProvider):
+    """
+    Deterministik sentetik veri. Aynı seed ile aynı sembol, aynı çağrı sırasında
+    hep aynı fiyatı (ve aynı hatayı) üretir; thread sırası sonucu değiştirmez.
+
+    latency: sembol başına yapay gecikme (saniye)
+    failure_rate: bir sembol isteğinin hata vermesi olasılığı (0-1)
+    tick: her çağrıda fiyatın en fazla ne kadar oynayacağı (oran)
+    """
+    name = 'fake'
+
+    def __init__(self, seed=0, latency=0.0, failure_rate=0.0, tick=0.01, sleep=time.sleep):
+        self.seed = seed
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.tick = tick
+        self._sleep = sleep
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _unit(self, *parts):
+        # [0, 1) aralığında deterministik sayı
+        return zlib.crc32(':'.join(map(str, (self.seed,) + parts)).encode()) / 2 ** 32
+
+    def _next_call(self, symbol):
+        with self._lock:
+            n = self._calls.get(symbol, 0)
+            self._calls[symbol] = n + 1
+        return n
+
+    def _quote(self, symbol):
+        """
+        Sembolün (bugün OHLCV, dünkü kapanış) değerleri; hata olasılığına göre FakeError.
+        """
+        n = self._next_call(symbol)
+        if self.latency:
+            self._sleep(self.latency)
+        if self._unit(symbol, n, 'fail') < self.failure_rate:
+            raise FakeError(f"sahte upstream hatası ({symbol})")
+
+        base = FAKE_BASE_PRICES.get(symbol) or 5 + 495 * self._unit(symbol, 'base')
+        prev_close = base * (0.95 + 0.1 * self._unit(symbol, 'prev'))
+        # Her çağrıda küçük bir oynama: ardışık döngülerde değişen satırlar olsun
+        close = base * (1 + self.tick * (2 * self._unit(symbol, n, 'tick') - 1))
+        open_ = base
+        high = max(open_, close) * (1 + 0.01 * self._unit(symbol, n, 'high'))
+        low = min(open_, close) * (1 - 0.01 * self._unit(symbol, n, 'low'))
+        volume = int(1_000 + 50_000_000 * self._unit(symbol, n, 'volume'))
+        return (open_, high, low, close, volume), prev_close
+
+    def download_history(self, symbols):
+        import pandas as pd
+        today = pd.Timestamp(datetime.now().date())
+        index = pd.DatetimeIndex([today - timedelta(days=1), today], name='Date')
+        data = {}
+        for symbol in symbols:
+            try:
+                (open_, high, low, close, volume), prev_close = self._quote(symbol)
+            except FakeError:
+                continue  # yf.download gibi: sembol tablodan eksik kalır
+            for field, value in zip(OHLCV_FIELDS, (open_, high, low, close, volume)):
+                data[(field, symbol)] = [prev_close if field == 'Close' else value, value]
+        if not data:
+            return pd.DataFrame()
+        frame = pd.DataFrame(data, index=index)
+        frame.columns = pd.MultiIndex.from_tuples(frame.columns, names=['Price', 'Ticker'])
+        return frame.sort_index(axis=1)
+
+    def fast_quote(self, symbol):
+        (open_, high, low, close, volume), prev_close = self._quote(symbol)
+        return {
+            'symbol': symbol, 'price': close, 'previousClose': prev_close,
+            'open': open_, 'high': high, 'low': low, 'volume': volume,
+            'timestamp': datetime.now(), 'error': None
+        }
+
+    def index_quote(self, symbol):
+        (open_, high, low, close, volume), prev_close = self._quote(symbol)
+        return {
+            "symbol": symbol,
+            "shortName": "BIST 100",
+            "regularMarketPrice": close,
+            "regularMarketOpen": open_,
+            "regularMarketDayHigh": high,
+            "regularMarketDayLow": low,
+            "regularMarketPreviousClose": prev_close,
+            "marketState": "UNKNOWN"
+        }
+
+    def company_info(self, symbol):
+        n = self._next_call(symbol)
+        if self.latency:
+            self._sleep(self.latency)
+        if self._unit(symbol, n, 'fail') < self.failure_rate:
+            raise FakeError(f"sahte upstream hatası ({symbol})")
+        sector = FAKE_SECTORS[int(self._unit(symbol, 'sector') * len(FAKE_SECTORS))]
+        return {'name': f"Sahte {symbol.split('.')[0]} A.Ş.", 'sector': sector}
+
+
+    def daily_history(self, symbol, start, end):
+        n = self._next_call(symbol)
+        if self.latency:
+            self._sleep(self.latency)
+        if self._unit(symbol, n, 'fail') < self.failure_rate:
+            raise FakeError(f"sahte upstream hatası ({symbol})")
+        import pandas as pd
+        # Değerler sadece (sembol, tarih)'e bağlı: aralık nasıl parçalanırsa parçalansın aynı barlar
+        dates = pd.bdate_range(start, pd.Timestamp(end) - timedelta(days=1), name='Date')
+        if dates.empty:
+            return pd.DataFrame(columns=OHLCV_FIELDS)
+        base = FAKE_BASE_PRICES.get(symbol) or 5 + 495 * self._unit(symbol, 'base')
+        days = dates.to_numpy().astype('datetime64[D]').astype('int64')
+        phase = 2 * np.pi * self._unit(symbol, 'phase')
+        noise = np.array([self._unit(symbol, d, 'daily') for d in days.tolist()])
+        close = base * (1 + 0.3 * np.sin(days / 90 + phase)) * (1 + 0.02 * (noise - 0.5))
+        open_ = close * (1 + 0.01 * (noise - 0.5))
+        return pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) * (1 + 0.01 * noise),
+            'Low': np.minimum(open_, close) * (1 - 0.01 * noise),
+            'Close': close,
+            'Volume': (1_000 + 50_000_000 * noise).astype('int64'),
+        }, index=dates)
+
+
+PROVIDERS = {
+    'yfinance': YFinanceProvider,
+    'fake': FakeProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """
+    Aktif sağlayıcı. İlk çağrıda SANBIST_PROVIDER ortam değişkenine göre
+    (varsayılan 'yfinance') oluşturulur.
+    """
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                name = os.environ.get('SANBIST_PROVIDER', 'yfinance')
+                if name not in PROVIDERS:
+                    raise ValueError(f"Bilinmeyen sağlayıcı: {name} (geçerli: {', '.join(PROVIDERS)})")
+                _provider = PROVIDERS[name]()
+    return _provider
+
+
+def set_provider(provider):
+    """
+    Aktif sağlayıcıyı değiştirir (benchmark'lar ve testler için).
+    """
+    global _provider
+    _provider = provider
@@ -0,0 +1,51 @@
+# ratelimit.py
+# yfinance'e giden çağrıları sınırlamak için küçük yardımcılar:
+# token bucket hız sınırlayıcı ve üstel geri çekilmeli (backoff) yeniden deneme.
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Saniyede 'rate' jeton üreten, en fazla 'capacity' jeton biriktiren kova.
+    acquire() jeton yoksa bekler; birden çok thread güvenle paylaşabilir.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate pozitif olmalı")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+def retry_with_backoff(fn, attempts=3, base_delay=0.5, max_delay=8.0, retry_on=(Exception,), sleep=time.sleep):
+    """
+    fn() çağrısını hata alırsa üstel bekleme + rastgele sapma (jitter) ile
+    en fazla 'attempts' kez dener. Son hatayı yukarı fırlatır.
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except retry_on:
+            if attempt == attempts - 1:
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            sleep(delay * random.uniform(0.5, 1.0))
@@ -0,0 +1,330 @@
+# risk.py
+# Kayan pencereli getiri korelasyonu ve volatilite (tüm hisseler, döviz ve
+# sentetik gram/sikke serileri; ~117x117 matris).
+#
+# Matrisi her istekte geçmişten hesaplamak yerine:
+#   - Son RETURN_WINDOW günün hizalanmış günlük log getirileri önceden ayrılmış
+#     (WINDOW x n) bir halka tamponda tutulur.
+#   - Çapraz çarpım matrisi P = sum(r r^T) ve toplamlar S = sum(r) artımlı
+#     güncellenir: gün kesinleşince en eski satır çıkarılıp yenisi eklenir
+#     (iki dış çarpım, O(n^2)). Her güncelleme döngüsünde bugünün geçici getirisi
+#     aynı şekilde kesinleşmiş duruma eklenerek kovaryans O(n^2) ile bulunur.
+#   - Bellek çalışma süresinden bağımsız olarak sabittir; kayan nokta birikimi
+#     olmasın diye her WINDOW kesinleşmede bir P ve S tampondan yeniden toplanır.
+#   - Gün değişince kapanmış günler PriceHistory'den kesinleşir (bkz.
+#     indicators.py); istek almayan worker'lar da aynı matrisi sunar.
+#
+# Hizalama: bir sembolün o gün kapanışı yoksa fiyatı aynen taşınır (getiri 0) ve
+# gözlem 'geçersiz' sayılır; penceresinde MIN_OBSERVATIONS'tan az geçerli getirisi
+# olan sembollerin korelasyonu ve volatilitesi None döner.
+import math
+import threading
+
+import numpy as np
+
+from indicators import load_daily_closes, day_number, day_date, newest_day
+from snapshot import QUERY_CACHE_MAX
+
+RETURN_WINDOW = 60           # Gün (yaklaşık 3 ay)
+MIN_OBSERVATIONS = 20
+TRADING_DAYS_PER_YEAR = 252  # Volatilite yıllıklandırması
+# İlk yüklemede okunacak takvim günü (hafta sonları/tatiller için pay)
+LOAD_LOOKBACK_DAYS = RETURN_WINDOW * 2 + 30
+
+_NO_DAY = np.iinfo(np.int64).min
+
+
+class RiskMatrix:
+    """
+    Bir andaki volatilite ve korelasyon matrisi (değişmez; istekler bunu okur).
+    """
+
+    def __init__(self, symbols, volatility, correlation, observations, as_of):
+        self.symbols = symbols
+        self.position = {s: i for i, s in enumerate(symbols)}
+        self.volatility = volatility      # (n,) yıllık, NaN = yetersiz veri
+        self.correlation = correlation    # (n, n), NaN = yetersiz veri
+        self.observations = observations  # (n,) penceredeki geçerli getiri sayısı
+        self.as_of = as_of
+
+    def _meta(self):
+        return {"window": RETURN_WINDOW, "asOf": self.as_of}
+
+    def block(self, symbols=None, decimals=4):
+        """
+        Sembollerin (None = hepsi) alt matrisi, volatiliteleri ve blok içi
+        ortalama korelasyon (köşegen hariç).
+        """
+        if symbols is None:
+            idx = np.arange(len(self.symbols))
+        else:
+            idx = np.array([self.position[s] for s in symbols if s in self.position], dtype=np.intp)
+        sub = self.correlation[np.ix_(idx, idx)]
+        off_diagonal = sub[~np.eye(len(idx), dtype=bool)]
+        finite = off_diagonal[np.isfinite(off_diagonal)]
+        return dict(self._meta(), **{
+            "symbols": [self.symbols[i] for i in idx.tolist()],
+            "volatility": _rounded(self.volatility[idx], decimals),
+            "observations": self.observations[idx].tolist(),
+            "averageCorrelation": round(float(finite.mean()), decimals) if finite.size else None,
+            "correlation": [_rounded(row, decimals) for row in sub],
+        })
+
+    def row(self, symbol, top=10, decimals=4):
+        """
+        Sembolle en çok ve en az (negatif) korele olan 'top' sembol.
+        Bilinmeyen sembolde KeyError.
+        """
+        i = self.position[symbol]
+        corr = self.correlation[i].copy()
+        corr[i] = np.nan
+        valid = np.flatnonzero(np.isfinite(corr))
+        ranked = valid[np.argsort(-corr[valid], kind='stable')]
+
+        def entries(indices):
+            return [{"symbol": self.symbols[j], "correlation": round(float(corr[j]), decimals),
+                     "volatility": _rounded_one(self.volatility[j], decimals)} for j in indices.tolist()]
+        return dict(self._meta(), **{
+            "symbol": symbol,
+            "volatility": _rounded_one(self.volatility[i], decimals),
+            "observations": int(self.observations[i]),
+            "mostCorrelated": entries(ranked[:top]),
+            "leastCorrelated": entries(ranked[::-1][:top]),
+        })
+
+
+def _rounded_one(value, decimals):
+    return None if value != value else round(float(value), decimals)
+
+
+def _rounded(values, decimals):
+    return [None if v != v else v for v in np.round(values, decimals).tolist()]
+
+
+class CorrelationEngine:
+    """
+    Sabit sembol kümesi için kayan pencere getiri durumu.
+    """
+
+    def __init__(self, symbols, window=RETURN_WINDOW):
+        self.symbols = list(symbols)
+        self.position = {s: i for i, s in enumerate(self.symbols)}
+        self.window = window
+        n = len(self.symbols)
+        self.returns = np.zeros((window, n))           # Halka tampon
+        self.valid = np.zeros((window, n), dtype=bool)
+        self.filled = 0                                 # Tampondaki satır sayısı (<= window)
+        self.head = 0                                   # Sıradaki yazılacak satır
+        self.commits = 0
+        self.cross = np.zeros((n, n))                   # P = sum(r r^T)
+        self.sums = np.zeros(n)                         # S = sum(r)
+        self.valid_count = np.zeros(n, dtype=np.int64)
+        self.close = np.full(n, np.nan)                 # Son kesinleşmiş (taşınmış) kapanış
+        self.last_day = _NO_DAY
+        # Bugünün geçici fiyatları
+        self.pending_day = _NO_DAY
+        self.pending_price = np.full(n, np.nan)
+
+    def _returns_to(self, price):
+        # Son kesinleşmiş kapanıştan 'price'a log getiri; eksikse 0 ve geçersiz
+        ok = np.isfinite(price) & np.isfinite(self.close) & (price > 0) & (self.close > 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = np.where(ok, np.log(np.where(ok, price, 1.0) / np.where(ok, self.close, 1.0)), 0.0)
+        return r, ok
+
+    def _oldest(self):
+        # Pencere doluysa bir sonraki yazımda düşecek satır
+        if self.filled < self.window:
+            return None, None
+        return self.returns[self.head], self.valid[self.head]
+
+    def _commit(self, price, day):
+        """
+        Bir günlük kapanış satırını (n,) pencereye ekler. Kapanışı olmayan
+        sembollerin fiyatı taşınır.
+        """
+        if self.last_day == _NO_DAY:
+            # İlk kapanış: getiri yok, sadece başlangıç fiyatı
+            self.close = np.asarray(price, dtype=float).copy()
+            self.last_day = day
+            return
+        r, ok = self._returns_to(price)
+        old_r, old_ok = self._oldest()
+        if old_r is not None:
+            self.cross -= np.outer(old_r, old_r)
+            self.sums -= old_r
+            self.valid_count -= old_ok
+        self.cross += np.outer(r, r)
+        self.sums += r
+        self.valid_count += ok
+        self.returns[self.head] = r
+        self.valid[self.head] = ok
+        self.head = (self.head + 1) % self.window
+        self.filled = min(self.filled + 1, self.window)
+        self.close = np.where(np.isfinite(price), price, self.close)
+        self.last_day = day
+
+        self.commits += 1
+        if self.commits % self.window == 0:
+            # Kayan nokta birikimini sıfırla (pencere başına bir kez O(W n^2))
+            rows = self.returns[:self.filled]
+            self.cross = rows.T @ rows
+            self.sums = rows.sum(axis=0)
+
+    def load_matrix(self, days, closes):
+        """
+        Geçmişten kesinleştirme (ilk yükleme ve gün değişimi): (n, T) kapanış
+        matrisinin henüz kesinleşmemiş günleri gün gün işlenir; pencerede son
+        'window' günün getirileri kalır (eski günler sadece fiyat taşımaya yarar).
+        Günü geçmişten kesinleşen geçici satır atılır.
+        """
+        for t in range(len(days)):
+            if days[t] > self.last_day:
+                self._commit(closes[:, t], int(days[t]))
+        if self.pending_day <= self.last_day:
+            self.pending_day = _NO_DAY
+            self.pending_price = np.full(len(self.symbols), np.nan)
+
+    def horizon(self):
+        # Durumdaki en yeni gün (kesinleşmiş veya geçici)
+        return max(self.last_day, self.pending_day)
+
+    def replay_from(self):
+        """
+        Gün değişiminde geçmişten okunacak ilk gün (geçici satırın günü veya son
+        kesinleşmiş günden sonrası); durum boşsa None.
+        """
+        if self.pending_day != _NO_DAY:
+            return self.pending_day
+        return None if self.last_day == _NO_DAY else self.last_day + 1
+
+    def update(self, quotes):
+        """
+        quotes: symbol -> (fiyat, gün). Daha yeni bir gün gelince önceki günün
+        geçici fiyatları kesinleşir (geçmişte o gün yoksa; bkz. RiskStore.sync);
+        sonra gelen fiyatlar bugünün geçici satırı olur.
+        """
+        idx, price, day = [], [], []
+        for symbol, (p, d) in quotes.items():
+            i = self.position.get(symbol)
+            if i is None or p is None or d is None:
+                continue
+            idx.append(i)
+            price.append(p)
+            day.append(day_number(d))
+        if not idx:
+            return
+        idx, price, day = np.array(idx), np.array(price, dtype=float), np.array(day, dtype=np.int64)
+
+        newest = int(day.max())
+        if self.pending_day != _NO_DAY and newest > self.pending_day:
+            self._commit(self.pending_price, self.pending_day)
+            self.pending_price = np.full(len(self.symbols), np.nan)
+            self.pending_day = _NO_DAY
+
+        fresh = day > self.last_day
+        if fresh.any():
+            self.pending_day = max(self.pending_day, int(day[fresh].max()))
+            self.pending_price[idx[fresh]] = price[fresh]
+
+    def matrix(self):
+        """
+        Kesinleşmiş pencere + bugünün geçici getirisinden güncel matris (O(n^2)).
+        """
+        cross, sums, valid_count, filled = self.cross, self.sums, self.valid_count, self.filled
+        if self.pending_day != _NO_DAY:
+            r, ok = self._returns_to(self.pending_price)
+            old_r, old_ok = self._oldest()
+            if old_r is not None:
+                cross = cross - np.outer(old_r, old_r)
+                sums = sums - old_r
+                valid_count = valid_count - old_ok
+            else:
+                filled += 1
+            cross = cross + np.outer(r, r)
+            sums = sums + r
+            valid_count = valid_count + ok
+
+        n_obs = max(filled, 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = (cross - np.outer(sums, sums) / n_obs) / (n_obs - 1)
+            std = np.sqrt(np.maximum(np.diag(cov), 0.0))
+            corr = np.clip(cov / np.outer(std, std), -1.0, 1.0)
+        enough = (valid_count >= MIN_OBSERVATIONS) & (std > 0)
+        corr[~enough, :] = np.nan
+        corr[:, ~enough] = np.nan
+        np.fill_diagonal(corr, np.where(enough, 1.0, np.nan))
+        volatility = np.where(enough, std * math.sqrt(TRADING_DAYS_PER_YEAR), np.nan)
+
+        day = self.pending_day if self.pending_day != _NO_DAY else self.last_day
+        as_of = None if day == _NO_DAY else str(np.datetime64(day, 'D'))
+        return RiskMatrix(self.symbols, volatility, corr, valid_count, as_of)
+
+
+class RiskStore:
+    """
+    Süreç içi korelasyon durumu; IndicatorStore ile aynı düzen: ilk kullanımda
+    geçmişten yüklenir, sonra her yeni snapshot neslinde sadece en yeni fiyatlar
+    işlenir; gün değiştiyse önce aradaki kapanmış günler geçmişten kesinleşir.
+    Cevaplar nesil başına önbelleğe alınır.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engine = None
+        self._generation = None
+        self._matrix = None
+        self._bodies = {}
+
+    def sync(self, snap):
+        """
+        Durumu snapshot'a getirir ve güncel RiskMatrix'i döndürür.
+        Motor yüklenirken ve gün değişiminde açık bir DB bağlantısı gerekir.
+        """
+        if self._generation == snap.generation and self._matrix is not None:
+            return self._matrix
+        with self._lock:
+            if self._generation == snap.generation and self._matrix is not None:
+                return self._matrix
+            quotes = {row['symbol']: (row['price'], row['timestamp']) for row in snap.payload}
+            if self._engine is None:
+                engine = CorrelationEngine([row['symbol'] for row in snap.payload])
+                engine.load_matrix(*load_daily_closes(engine.symbols, lookback_days=LOAD_LOOKBACK_DAYS))
+                self._engine = engine
+            newest = newest_day(quotes)
+            if newest > self._engine.horizon():
+                # Gün değişti: kapanmış günler geçmişten (bkz. IndicatorStore.sync)
+                since = self._engine.replay_from()
+                self._engine.load_matrix(*load_daily_closes(
+                    self._engine.symbols, today=day_date(newest), lookback_days=LOAD_LOOKBACK_DAYS,
+                    since=None if since is None else day_date(since)))
+            self._engine.update(quotes)
+            self._matrix = self._engine.matrix()
+            self._bodies = {}
+            self._generation = snap.generation
+            return self._matrix
+
+    def body(self, key, build):
+        """
+        'key' cevabını döndürür; yoksa build() ile hazırlar. Anahtar snapshot
+        neslini içermelidir; önbellek QUERY_CACHE_MAX'ta boşaltılır (bkz.
+        IndicatorStore.body).
+        """
+        bodies = self._bodies
+        body = bodies.get(key)
+        if body is None:
+            body = build()
+            if len(bodies) >= QUERY_CACHE_MAX:
+                bodies.clear()
+            bodies[key] = body
+        return body
+
+    def reset(self):
+        with self._lock:
+            self._engine = None
+            self._generation = None
+            self._matrix = None
+            self._bodies = {}
+
+
+risk_store = RiskStore()
@@ -0,0 +1,268 @@
+# scheduler.py
+# Piyasa takvimine duyarlı, varlık sınıfı başına ayrı tempolu güncelleme planlayıcısı.
+#
+# Eski döngü her dakika uyanıp, sadece BIST açıkken her şeyi 15 dakikada bir
+# güncelliyordu; döviz ve madenler (neredeyse 24/5 işlem görür) gece boyunca eski
+# kalıyordu. Burada her varlık sınıfının kendi işlem saatleri ve temposu vardır:
+#   - Seans içinde 'interval' aralıkla (± jitter) çalışır
+#   - Seans kapandıktan sonra BİR kez kapanış snapshot'ı alır
+#   - Seans dışında bir sonraki açılışa kadar bekler
+#   - Upstream hata verirse üstel geri çekilme (backoff) ile yeniden dener
+import random
+from datetime import date, datetime, time as dt_time, timedelta
+
+import pytz
+
+istanbul_tz = pytz.timezone('Europe/Istanbul')
+
+# --- BIST TATİL TAKVİMİ ---
+# Sabit resmi tatiller (ay, gün)
+FIXED_HOLIDAYS = [
+    (1, 1),    # Yılbaşı
+    (4, 23),   # Ulusal Egemenlik ve Çocuk Bayramı
+    (5, 1),    # Emek ve Dayanışma Günü
+    (5, 19),   # Atatürk'ü Anma, Gençlik ve Spor Bayramı
+    (7, 15),   # Demokrasi ve Milli Birlik Günü
+    (8, 30),   # Zafer Bayramı
+    (10, 29),  # Cumhuriyet Bayramı
+]
+# Dini bayramlar (her yıl değişir). Arife günleri yarım gündür.
+RELIGIOUS_HOLIDAYS = {
+    2025: ['2025-03-30', '2025-03-31', '2025-04-01',                 # Ramazan Bayramı
+           '2025-06-06', '2025-06-07', '2025-06-08', '2025-06-09'],  # Kurban Bayramı
+    2026: ['2026-03-20', '2026-03-21', '2026-03-22',
+           '2026-05-27', '2026-05-28', '2026-05-29', '2026-05-30'],
+    2027: ['2027-03-09', '2027-03-10', '2027-03-11',
+           '2027-05-16', '2027-05-17', '2027-05-18', '2027-05-19'],
+}
+HALF_DAYS = {
+    2025: ['2025-03-29', '2025-06-05', '2025-10-28'],
+    2026: ['2026-03-19', '2026-05-26', '2026-10-28'],
+    2027: ['2027-03-08', '2027-05-15', '2027-10-28'],
+}
+
+
+def _dates(mapping):
+    return {date.fromisoformat(d) for days in mapping.values() for d in days}
+
+
+def _at(day, t):
+    return istanbul_tz.localize(datetime.combine(day, t))
+
+
+class BistCalendar:
+    """
+    BIST pay piyasası seansları: hafta içi 10:00-18:10 (kapanış seansı dahil),
+    yarım günlerde 10:00-12:40, tatillerde kapalı.
+    """
+    name = 'BIST'
+    OPEN = dt_time(10, 0)
+    CLOSE = dt_time(18, 10)
+    HALF_DAY_CLOSE = dt_time(12, 40)
+
+    def __init__(self, holidays=None, half_days=None):
+        self.holidays = holidays if holidays is not None else _dates(RELIGIOUS_HOLIDAYS)
+        self.half_days = half_days if half_days is not None else _dates(HALF_DAYS)
+
+    def is_holiday(self, day):
+        return day.weekday() >= 5 or (day.month, day.day) in FIXED_HOLIDAYS or day in self.holidays
+
+    def session(self, day):
+        """
+        Günün (açılış, kapanış) zamanları; işlem günü değilse None.
+        """
+        if self.is_holiday(day):
+            return None
+        close = self.HALF_DAY_CLOSE if day in self.half_days else self.CLOSE
+        return _at(day, self.OPEN), _at(day, close)
+
+    def is_open(self, now):
+        session = self.session(now.date())
+        return session is not None and session[0] <= now <= session[1]
+
+    def next_open(self, now):
+        day = now.date()
+        for _ in range(30):
+            session = self.session(day)
+            if session is not None and session[0] > now:
+                return session[0]
+            day += timedelta(days=1)
+        return None
+
+    def last_close(self, now):
+        day = now.date()
+        for _ in range(30):
+            session = self.session(day)
+            if session is not None and session[1] <= now:
+                return session[1]
+            day -= timedelta(days=1)
+        return None
+
+    def current_close(self, now):
+        session = self.session(now.date())
+        return session[1] if session is not None and session[0] <= now <= session[1] else None
+
+
+class WeeklyHours:
+    """
+    Haftalık tek kesintili piyasa (döviz, COMEX madenleri): Cumartesi 01:00'de
+    kapanır, Pazartesi 01:00'de açılır (İstanbul saati).
+    """
+
+    def __init__(self, name, close=(5, dt_time(1, 0)), open_=(0, dt_time(1, 0))):
+        self.name = name
+        self.close = close
+        self.open = open_
+
+    def _weekly(self, now, weekday, t, forward):
+        day = now.date() + timedelta(days=(weekday - now.weekday()) % 7)
+        moment = _at(day, t)
+        if forward and moment <= now:
+            moment = _at(day + timedelta(days=7), t)
+        if not forward and moment > now:
+            moment = _at(day - timedelta(days=7), t)
+        return moment
+
+    def next_open(self, now):
+        return self._weekly(now, *self.open, forward=True)
+
+    def last_close(self, now):
+        return self._weekly(now, *self.close, forward=False)
+
+    def current_close(self, now):
+        return self._weekly(now, *self.close, forward=True) if self.is_open(now) else None
+
+    def is_open(self, now):
+        # Son kapanıştan sonra açılış olduysa açıktır
+        last_close = self.last_close(now)
+        last_open = self._weekly(now, *self.open, forward=False)
+        return last_open > last_close
+
+
+class AssetClassSchedule:
+    """
+    Tek bir varlık sınıfının planı ve çalışma durumu.
+    """
+
+    def __init__(self, name, hours, interval, post_close_delay=10 * 60, jitter=0.1,
+                 backoff_base=60, backoff_max=30 * 60, rng=None):
+        self.name = name
+        self.hours = hours
+        self.interval = interval
+        self.post_close_delay = post_close_delay
+        self.jitter = jitter
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._rng = rng or random.Random()
+
+        self.next_run = None           # None = hemen (ilk çalıştırma)
+        self.next_reason = 'başlangıç'
+        self.last_run = None
+        self.last_success = None
+        self.failures = 0
+        self.last_error = None
+        self._post_close_done = None   # Kapanış snapshot'ı alınan seansın kapanış zamanı
+
+    def _jittered(self, seconds):
+        return seconds * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def is_due(self, now):
+        return self.next_run is None or self.next_run <= now
+
+    def record(self, now, error=None):
+        """
+        Bir çalıştırmanın sonucunu işler ve bir sonraki çalıştırmayı planlar.
+        """
+        self.last_run = now
+        if error is not None:
+            self.failures += 1
+            self.last_error = error
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (self.failures - 1))
+            self.next_run = now + timedelta(seconds=self._jittered(delay))
+            self.next_reason = f'yeniden deneme #{self.failures}'
+            return
+
+        self.failures = 0
+        self.last_error = None
+        self.last_success = now
+        if not self.hours.is_open(now):
+            last_close = self.hours.last_close(now)
+            if last_close is not None and now >= last_close + timedelta(seconds=self.post_close_delay):
+                self._post_close_done = last_close
+        self._plan(now)
+
+    def _plan(self, now):
+        if self.hours.is_open(now):
+            next_run = now + timedelta(seconds=self._jittered(self.interval))
+            close = self.hours.current_close(now)
+            if close is not None and next_run > close:
+                # Seans bu aralık dolmadan kapanıyor: kapanış snapshot'ını planla
+                self.next_run = close + timedelta(seconds=self.post_close_delay)
+                self.next_reason = 'kapanış snapshot'
+            else:
+                self.next_run = next_run
+                self.next_reason = 'seans içi'
+            return
+
+        last_close = self.hours.last_close(now)
+        if last_close is not None and self._post_close_done != last_close:
+            self.next_run = max(now, last_close + timedelta(seconds=self.post_close_delay))
+            self.next_reason = 'kapanış snapshot'
+            return
+
+        next_open = self.hours.next_open(now)
+        # Açılışta tüm sınıflar aynı saniyede upstream'e gitmesin
+        self.next_run = next_open + timedelta(seconds=self._rng.uniform(0, 60))
+        self.next_reason = 'sonraki açılış'
+
+    def status(self, now):
+        return {
+            "assetClass": self.name,
+            "market": self.hours.name,
+            "isOpen": self.hours.is_open(now),
+            "intervalSeconds": self.interval,
+            "nextRun": self.next_run.isoformat() if self.next_run else now.isoformat(),
+            "nextReason": self.next_reason,
+            "lastRun": self.last_run.isoformat() if self.last_run else None,
+            "lastSuccess": self.last_success.isoformat() if self.last_success else None,
+            "failures": self.failures,
+            "lastError": self.last_error,
+        }
+
+
+class RefreshScheduler:
+    """
+    Varlık sınıfı planlarının toplamı.
+    """
+
+    def __init__(self, schedules):
+        self.schedules = {s.name: s for s in schedules}
+
+    def due(self, now):
+        return [name for name, s in self.schedules.items() if s.is_due(now)]
+
+    def record(self, name, now, error=None):
+        self.schedules[name].record(now, error)
+
+    def open_classes(self, now):
+        """
+        Piyasası şu an açık olan sınıflar.
+        """
+        return [name for name, s in self.schedules.items() if s.hours.is_open(now)]
+
+    def seconds_until_next(self, now, cap=60):
+        """
+        Bir sonraki çalıştırmaya kalan süre (en fazla cap saniye).
+        """
+        pending = [s.next_run for s in self.schedules.values()]
+        if any(t is None for t in pending):
+            return 0
+        return max(0.0, min(cap, min((t - now).total_seconds() for t in pending)))
+
+    def status(self, now):
+        return [s.status(now) for s in self.schedules.values()]
+
+
+bist_calendar = BistCalendar()
+fx_hours = WeeklyHours('FX')
+metals_hours = WeeklyHours('COMEX')
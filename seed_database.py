@@ -1,10 +1,17 @@
 # seed_database.py
-import yfinance as yf
 # ESKİ: from db_models import db, Company, Price
 # YENİ:
 from db_models import db, Company, Price, create_tables 
 import peewee as pw
+import argparse
+import json
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ratelimit import TokenBucket, retry_with_backoff
+from derived import DERIVED_INSTRUMENTS
+from providers import PROVIDERS, get_provider, set_provider
 # --- Kaynak Dosyalardan Verileri Al ---
 try:
     from bist100_symbols import BIST100_SYMBOLS
@@ -24,14 +31,132 @@ COMMODITY_FOREX_SYMBOLS = [
     {'symbol': 'EURUSD=X', 'type': 'doviz_capraz', 'name': 'Euro/Dolar Paritesi', 'sector': 'doviz'},
 ]
 
-# app.py'deki sentetik varlıklar
-SYNTHETIC_SYMBOLS = [
-    {'symbol': 'GRAMALTIN', 'type': 'maden_gram', 'name': 'Gram Altın (TL)', 'sector': 'maden'},
-    {'symbol': 'GRAMGUMUS', 'type': 'maden_gram', 'name': 'Gram Gümüş (TL)', 'sector': 'maden'},
-    {'symbol': 'GRAMPLATIN', 'type': 'maden_gram', 'name': 'Gram Platin (TL)', 'sector': 'maden'},
-]
+# Sentetik varlıklar: fiyat formülleriyle aynı bildirimlerden (derived.py)
+SYNTHETIC_SYMBOLS = [d.metadata() for d in DERIVED_INSTRUMENTS]
+
+# --- EŞZAMANLI TOHUMLAMA AYARLARI ---
+SEED_WORKERS = 8              # Aynı anda en fazla kaç .info çağrısı
+SEED_RATE_PER_SECOND = 5.0    # yfinance'e saniyede en fazla kaç istek
+SEED_CHUNK_SIZE = 25          # Kaç satırda bir toplu yazma + checkpoint
+SEED_RETRY_ATTEMPTS = 3       # Başarısız .info çağrısı kaç kez denensin
+SEED_CHECKPOINT_FILE = 'seed_checkpoint.json'
+
+def fetch_company_info(symbol):
+    """
+    Tek bir hisse için .info çağrısı yapıp Company satırı (dict) döndürür.
+    """
+    # O YAVAŞ ÇAĞRI: .info (aktif sağlayıcı üzerinden, bkz. providers.py)
+    info = get_provider().company_info(symbol)
+
+    sector = info['sector'].replace(' ', '-').lower()
+    return {'symbol': symbol, 'name': info['name'], 'type': 'hisse', 'sector': sector}
 
-def seed_companies():
+def load_checkpoint(path):
+    """
+    Yarıda kalmış tohumlamanın tamamlanan sembollerini okur.
+    """
+    if not path or not os.path.exists(path):
+        return set()
+    try:
+        with open(path, encoding='utf-8') as f:
+            return set(json.load(f).get('done', []))
+    except (OSError, ValueError) as e:
+        print(f"[!] UYARI: Checkpoint okunamadı ({e}), baştan başlanıyor.")
+        return set()
+
+def save_checkpoint(path, done, failed):
+    # Yarım yazılmış dosya kalmasın diye önce geçici dosyaya yaz, sonra değiştir
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'done': sorted(done), 'failed': sorted(failed)}, f)
+    os.replace(tmp_path, path)
+
+def upsert_companies(rows, update_fields=('name', 'sector')):
+    """
+    Bir parça Company satırını tek bir INSERT ... ON CONFLICT DO UPDATE ile yazar.
+    """
+    if not rows:
+        return
+    update = {getattr(Company, f): pw.EXCLUDED[f] for f in update_fields}
+    with db.atomic():
+        (Company
+         .insert_many(rows)
+         .on_conflict(conflict_target=[Company.symbol], update=update)
+         .execute())
+
+def insert_placeholders(symbols):
+    """
+    .info'su alınamayan hisseler için kayıt oluşturur ki fiyat takibi yapılabilsin.
+    Var olan kayda dokunmaz (eski get_or_create davranışı).
+    """
+    if not symbols:
+        return
+    rows = [{'symbol': s, 'name': s, 'type': 'hisse', 'sector': 'bilinmiyor'} for s in symbols]
+    with db.atomic():
+        Company.insert_many(rows).on_conflict_ignore().execute()
+
+def seed_bist_companies(symbols, workers=SEED_WORKERS, rate=SEED_RATE_PER_SECOND,
+                        chunk_size=SEED_CHUNK_SIZE, checkpoint_path=SEED_CHECKPOINT_FILE):
+    """
+    Hisselerin .info bilgisini sınırlı bir thread havuzu ile çeker.
+    - Token bucket: yfinance'e saniyede en fazla 'rate' istek gider
+    - Hata alan çağrılar üstel geri çekilme ile tekrar denenir
+    - Her 'chunk_size' sonuçta bir toplu yazma yapılır ve checkpoint güncellenir;
+      yarıda kesilen bir çalıştırma kaldığı yerden devam eder.
+    (başarılı, başarısız, atlanan) sayılarını döndürür.
+    """
+    done = load_checkpoint(checkpoint_path)
+    pending = [s for s in symbols if s not in done]
+    skipped = len(symbols) - len(pending)
+    if skipped:
+        print(f"Checkpoint bulundu: {skipped} sembol zaten tamamlanmış, atlanıyor.")
+
+    bucket = TokenBucket(rate)
+
+    def task(symbol):
+        def call():
+            bucket.acquire()
+            return fetch_company_info(symbol)
+        return retry_with_backoff(call, attempts=SEED_RETRY_ATTEMPTS)
+
+    succeeded, failed = 0, []
+    buffer = []
+
+    def flush():
+        upsert_companies(buffer)
+        done.update(row['symbol'] for row in buffer)
+        save_checkpoint(checkpoint_path, done, failed)
+        buffer.clear()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(task, s): s for s in pending}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                row = future.result()
+                buffer.append(row)
+                succeeded += 1
+                print(f"[+] {symbol} ({row['name']})")
+            except Exception as e:
+                print(f"[!] HATA: {symbol} işlenemedi. Sebep: {e}")
+                failed.append(symbol)
+            if len(buffer) >= chunk_size:
+                flush()
+    flush()
+
+    # Hata alsa bile bir kayıt oluşturalım ki fiyat takibi yapılabilsin
+    insert_placeholders(failed)
+
+    # Hepsi tamamlandıysa checkpoint'e gerek yok; sonraki tohumlama baştan başlar.
+    # Hatalı semboller varsa dosya kalır ve sonraki çalıştırma sadece onları dener.
+    if not failed and checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return succeeded, len(failed), skipped
+
+def seed_companies(workers=SEED_WORKERS, rate=SEED_RATE_PER_SECOND,
+                   chunk_size=SEED_CHUNK_SIZE, checkpoint_path=SEED_CHECKPOINT_FILE):
     """
     Veritabanını statik varlık bilgileriyle doldurur (tohumlar).
     Bu işlem yavaştır ve sadece bir kez çalıştırılmalıdır.
@@ -41,86 +166,28 @@ def seed_companies():
     
     # === 1. BIST100 HİSSELERİNİ İŞLEME ===
     if BIST100_SYMBOLS:
-        print(f"\n{len(BIST100_SYMBOLS)} adet BIST100 hissesi işleniyor...")
-        print("Bu işlem yfinance .info çağrıları nedeniyle 2-3 dakika sürebilir...")
-        
-        symbols_str = " ".join(BIST100_SYMBOLS)
-        tickers_bist = yf.Tickers(symbols_str)
-        failed_infos = []
-
-        for symbol in BIST100_SYMBOLS:
-            try:
-                # O YAVAŞ ÇAĞRI: .info
-                full_info = tickers_bist.tickers[symbol].info
-                
-                name = full_info.get("longName", full_info.get("shortName", symbol))
-                sector = full_info.get("sector", "Diğer").replace(' ', '-').lower()
-
-                # Veritabanına kaydet (veya güncelle)
-                company, created = Company.get_or_create(
-                    symbol=symbol,
-                    defaults={
-                        'name': name,
-                        'type': 'hisse',
-                        'sector': sector
-                    }
-                )
-                
-                if created:
-                    print(f"[+] EKLENDİ: {symbol} ({name})")
-                else:
-                    # Eğer zaten varsa güncelle
-                    company.name = name
-                    company.sector = sector
-                    company.save()
-                    print(f"[=] GÜNCELLENDİ: {symbol}")
-
-                # yfinance'i yormamak için kısa bir bekleme
-                time.sleep(0.1) 
-
-            except Exception as e:
-                print(f"[!] HATA: {symbol} işlenemedi. Sebep: {e}")
-                failed_infos.append(symbol)
-                # Hata alsa bile bir kayıt oluşturalım ki fiyat takibi yapılabilsin
-                Company.get_or_create(
-                    symbol=symbol,
-                    defaults={
-                        'name': symbol, # İsim olarak sembolü kullan
-                        'type': 'hisse',
-                        'sector': 'bilinmiyor'
-                    }
-                )
-
-        print(f"BIST100 tamamlandı. {len(failed_infos)} sembol .info hatası aldı (ama DB'ye eklendi).")
+        print(f"\n{len(BIST100_SYMBOLS)} adet BIST100 hissesi işleniyor "
+              f"({workers} eşzamanlı, saniyede en fazla {rate:g} istek)...")
+        start_time = time.time()
+        succeeded, failed, skipped = seed_bist_companies(
+            BIST100_SYMBOLS, workers=workers, rate=rate,
+            chunk_size=chunk_size, checkpoint_path=checkpoint_path)
+        print(f"BIST100 tamamlandı ({time.time() - start_time:.2f} sn): "
+              f"{succeeded} başarılı, {failed} başarısız (yine de DB'ye eklendi), {skipped} atlandı.")
 
     # === 2. MADEN, DÖVİZ VE SENTETİK VARLIKLARI İŞLEME ===
     print("\nMaden, Döviz ve Sentetik varlıklar işleniyor...")
     
     # app.py'den aldığımız listeleri birleştiriyoruz
-    all_other_assets = COMMODITY_FOREX_SYMBOLS + SYNTHETIC_SYMBOLS
-
-    for asset in all_other_assets:
-        try:
-            company, created = Company.get_or_create(
-                symbol=asset['symbol'],
-                defaults={
-                    'name': asset['name'],
-                    'type': asset['type'],
-                    'sector': asset.get('sector', 'diger')
-                }
-            )
-            if created:
-                print(f"[+] EKLENDİ (Diğer): {asset['symbol']} ({asset['name']})")
-            else:
-                # Varsa güncelle
-                company.name = asset['name']
-                company.type = asset['type']
-                company.sector = asset.get('sector', 'diger')
-                company.save()
-                print(f"[=] GÜNCELLENDİ (Diğer): {asset['symbol']}")
-
-        except Exception as e:
-            print(f"[!] HATA (Diğer): {asset['symbol']} işlenemedi. Sebep: {e}")
+    all_other_assets = [
+        {'symbol': a['symbol'], 'name': a['name'], 'type': a['type'], 'sector': a.get('sector', 'diger')}
+        for a in COMMODITY_FOREX_SYMBOLS + SYNTHETIC_SYMBOLS
+    ]
+    try:
+        upsert_companies(all_other_assets, update_fields=('name', 'type', 'sector'))
+        print(f"[=] {len(all_other_assets)} diğer varlık eklendi/güncellendi.")
+    except Exception as e:
+        print(f"[!] HATA (Diğer): varlıklar işlenemedi. Sebep: {e}")
 
     print("\nTohumlama işlemi tamamlandı.")
     db.close()
@@ -128,17 +195,32 @@ def seed_companies():
 # seed_database.py dosyasının EN ALTI
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="sanbist.db veritabanını statik verilerle doldurur.")
+    parser.add_argument('--workers', type=int, default=SEED_WORKERS, help="eşzamanlı .info çağrısı sayısı")
+    parser.add_argument('--rate', type=float, default=SEED_RATE_PER_SECOND, help="saniyede en fazla istek")
+    parser.add_argument('--chunk-size', type=int, default=SEED_CHUNK_SIZE, help="toplu yazma boyutu")
+    parser.add_argument('--checkpoint', default=SEED_CHECKPOINT_FILE, help="devam dosyası")
+    parser.add_argument('--fresh', action='store_true', help="checkpoint'i yok say ve baştan başla")
+    parser.add_argument('--provider', choices=sorted(PROVIDERS), help="piyasa verisi sağlayıcısı (varsayılan: SANBIST_PROVIDER veya yfinance)")
+    args = parser.parse_args()
+
+    if args.provider:
+        set_provider(PROVIDERS[args.provider]())
+
     print("UYARI: Bu script 'sanbist.db' veritabanını statik verilerle dolduracaktır.")
-    print("Bu işlem BIST100 listesi için 2-3 dakika sürebilir.")
     
     start_time = time.time()
     
+    if args.fresh and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
     # YENİ EKLENEN SATIR:
     print("1. Adım: Veritabanı tabloları oluşturuluyor (varsa atlanacak)...")
     create_tables() 
     
     print("2. Adım: Statik şirket verileri tohumlanıyor...")
-    seed_companies()
+    seed_companies(workers=args.workers, rate=args.rate,
+                   chunk_size=args.chunk_size, checkpoint_path=args.checkpoint)
     
     end_time = time.time()
     print(f"\nToplam süre: {end_time - start_time:.2f} saniye.")
@@ -0,0 +1,236 @@
+# snapshot.py
+# /api/bist100/companies için önceden serileştirilmiş, sürümlü bellek içi kopya.
+#
+# Veri sadece arka plan thread'i Price tablosuna yazdığında değişir.
+# Bu yüzden JOIN + dict oluşturma + JSON serileştirme işini her istekte değil,
+# sadece veri değiştiğinde BİR KEZ yapıyoruz. İstekler hazır byte'ları alır.
+#
+# Gunicorn'da her worker ayrı bir süreçtir ve kendi snapshot'ını tutar.
+# Yazan süreç (arka plan thread'i) DataVersion tablosundaki nesil sayacını
+# artırır; diğer worker'lar her istekte bu tek satırı okuyup kendi
+# snapshot'larının eskiyip eskimediğini anlar.
+import hashlib
+import threading
+
+import peewee as pw
+
+from db_models import db, Company, Price, get_generation
+from company_index import CompanyIndex
+from formats import serialize_payload, encode_rows, compress
+from market import MarketSummary
+from portfolio import PortfolioPricer
+from price_writer import is_stale
+
+QUERY_CACHE_MAX = 256  # Snapshot başına saklanan en fazla filtreli companies cevabı
+
+
+def build_companies_payload(since=None):
+    """
+    Company ve Price tablolarını LEFT JOIN ile birleştirip API'nin
+    döndürdüğü satır listesini (list[dict]) oluşturur.
+    since verilirse sadece revizyonu since'ten büyük (yani o nesilden
+    sonra değeri değişmiş) satırları döndürür; sorgu revision indeksini kullanır.
+    """
+    # (LEFT_OUTER: Company'de olan ama Price'ta henüz olmayanları da getirir)
+    # Birleşen satır 'quote' özelliğine yazılır; Price satırı yoksa peewee bu
+    # özelliği hiç atamaz ('company.price' ise backref sorgusu olarak kalır)
+    query = (Company
+             .select(Company, Price)
+             .join(Price, pw.JOIN.LEFT_OUTER, on=(Company.symbol == Price.symbol), attr='quote')
+            )
+    if since is not None:
+        query = query.where(Price.revision > since)
+
+    results_list = []
+    for company in query:
+        # Temel (Statik) veriler
+        data = {
+            "symbol": company.symbol,
+            "name": company.name,
+            "type": company.type,
+            "sector": company.sector,
+        }
+
+        # Fiyat (Dinamik) verileri
+        quote = getattr(company, 'quote', None)
+        if quote is not None:
+            data.update({
+                "price": quote.price,
+                "previousClose": quote.previousClose,
+                "open": quote.open,
+                "high": quote.high,
+                "low": quote.low,
+                "volume": quote.volume,
+                "timestamp": quote.timestamp.isoformat() if quote.timestamp else None,
+                "error": quote.error,
+                # Son güncelleme başarısız: değerler 'timestamp' anındaki son geçerli değerler
+                "stale": is_stale(quote.price, quote.error),
+                "revision": quote.revision
+            })
+        else:
+            # Price tablosunda henüz verisi yoksa (örn. seed'den sonra ilk fetch bekleniyorsa)
+            data.update({
+                "price": None,
+                "previousClose": None,
+                "open": None, "high": None, "low": None, "volume": None,
+                "timestamp": None,
+                "error": "Henüz fiyat verisi alınmadı.",
+                "stale": False,
+                "revision": 0
+            })
+
+        results_list.append(data)
+    return results_list
+
+
+def build_companies_delta(since):
+    """
+    ?since=<revision> modu: since'ten sonra değişen satırları ve yeni
+    üst sınırı (high-water mark) döndürür.
+    İstemci bir sonraki istekte 'revision' değerini since olarak gönderir.
+    """
+    # Nesil ve satırlar aynı okuma transaction'ında okunur ki
+    # arada yapılan bir yazım yüzünden değişiklik kaçırılmasın.
+    with db.atomic():
+        revision = get_generation()
+        # DB sıfırlandıysa (since sunucudakinden büyük) tam listeyi gönder
+        reset = since > revision
+        changes = build_companies_payload(since=None if reset else since)
+    return {
+        "since": since,
+        "revision": revision,
+        "reset": reset,
+        "changes": changes,
+    }
+
+
+class Snapshot:
+    """
+    Belirli bir nesle (generation) ait, serileştirilmiş ve değişmez veri kopyası.
+    """
+    __slots__ = ('generation', 'payload', 'body', 'etag', 'market', '_market_bodies',
+                 'index', '_query_bodies', '_encoded_bodies', '_pricer')
+
+    def __init__(self, generation, payload):
+        self.generation = generation
+        self.payload = payload
+        self.body = serialize_payload(payload)
+        # Nesil + içerik özeti: veritabanı sıfırlansa bile ETag çakışmaz
+        digest = hashlib.sha1(self.body).hexdigest()[:16]
+        self.etag = f"g{generation}-{digest}"
+        # Piyasa özeti de veri değiştiğinde bir kez hesaplanır (bkz. market.py)
+        self.market = MarketSummary(payload)
+        self._market_bodies = {}
+        # Filtre/sayfalama indeksleri de (bkz. company_index.py)
+        self.index = CompanyIndex(payload)
+        self._query_bodies = {}
+        # (biçim, kodlama) -> (gövde, kullanılan kodlama); bkz. formats.py
+        self._encoded_bodies = {('json', 'identity'): (self.body, 'identity')}
+        self._pricer = None
+
+    @property
+    def pricer(self):
+        """
+        Portföy değerlemesi için TL fiyat vektörleri (bkz. portfolio.py).
+        Sadece değerleme isteyen nesillerde, ilk istekte bir kez kurulur.
+        """
+        pricer = self._pricer
+        if pricer is None:
+            # (Eşzamanlı iki istek aynı vektörleri kurabilir; sonuç aynı olduğundan zararsız)
+            pricer = self._pricer = PortfolioPricer(self.payload)
+        return pricer
+
+    def market_body(self, top, sector=None, type=None):
+        """
+        /api/market/summary cevabını (byte) döndürür. Her (top, sector, type)
+        için bu nesilde bir kez serileştirilir; geçersiz parametrede ValueError.
+        """
+        key = (top, sector, type)
+        body = self._market_bodies.get(key)
+        if body is None:
+            view = self.market.view(top, sector, type)
+            view["revision"] = self.generation
+            body = self._market_bodies[key] = serialize_payload(view)
+        return body
+
+    def encoded_body(self, fmt='json', encoding='identity'):
+        """
+        Tam companies cevabını istenen biçim ve sıkıştırmayla döndürür:
+        (gövde, kullanılan kodlama). Her çift bu nesilde bir kez hazırlanır.
+        """
+        key = (fmt, encoding)
+        cached = self._encoded_bodies.get(key)
+        if cached is None:
+            plain = self._encoded_bodies.get((fmt, 'identity'))
+            body = plain[0] if plain is not None else encode_rows(self.payload, fmt)
+            self._encoded_bodies[(fmt, 'identity')] = (body, 'identity')
+            cached = self._encoded_bodies[key] = compress(body, encoding)
+        return cached
+
+    def query_body(self, query, fmt='json', encoding='identity'):
+        """
+        Filtreli /api/bist100/companies cevabını (body, encoding, total, next_cursor)
+        olarak döndürür. Her normalize sorgu anahtarı, biçim ve kodlama için bu
+        nesilde bir kez serileştirilir.
+        """
+        key = (query.key, fmt, encoding)
+        cached = self._query_bodies.get(key)
+        if cached is None:
+            result = self.index.query(query)
+            body, used = compress(encode_rows(result.rows, fmt), encoding)
+            cached = (body, used, result.total, result.next_cursor)
+            # symbols= ile anahtar uzayı sınırsız; bellek büyümesin
+            if len(self._query_bodies) >= QUERY_CACHE_MAX:
+                self._query_bodies.clear()
+            self._query_bodies[key] = cached
+        return cached
+
+
+class SnapshotStore:
+    """
+    Süreç içi snapshot deposu.
+    get() her çağrıda DB'deki nesil sayacını kontrol eder; sayaç değiştiyse
+    (başka bir worker yazdıysa) snapshot'ı yeniden oluşturur.
+    """
+
+    def __init__(self, builder=build_companies_payload):
+        self._builder = builder
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    @property
+    def current(self):
+        return self._snapshot
+
+    def refresh(self, generation=None):
+        """
+        Snapshot'ı veritabanından yeniden oluşturur ve döndürür.
+        """
+        with self._lock:
+            return self._rebuild(generation)
+
+    def get(self):
+        """
+        Güncel snapshot'ı döndürür, gerekiyorsa yeniden oluşturur.
+        """
+        generation = get_generation()
+        snap = self._snapshot
+        if snap is not None and snap.generation == generation:
+            return snap
+
+        with self._lock:
+            # Kilidi beklerken başka bir thread oluşturmuş olabilir
+            snap = self._snapshot
+            if snap is not None and snap.generation == generation:
+                return snap
+            return self._rebuild(generation)
+
+    def _rebuild(self, generation):
+        if generation is None:
+            generation = get_generation()
+        snap = Snapshot(generation, self._builder())
+        self._snapshot = snap
+        return snap
+
+
+companies_snapshot = SnapshotStore()
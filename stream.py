@@ -0,0 +1,193 @@
+# stream.py
+# Fiyat değişikliklerini istemcilere Server-Sent Events (SSE) ile iten yayıncı.
+#
+# İstemciler "yeni bir şey var mı?" diye /api/bist100/companies'i sürekli sorgulamak
+# yerine /api/stream/prices'a bağlanır ve her commit edilen güncellemeden sonra
+# sadece değişen sembollerin kompakt farkını alır.
+#
+# Süreç başına TEK bir izleyici thread'i DataVersion nesil sayacını izler (lider
+# worker yazdıktan sonra hemen dürter, diğer worker'lar kısa aralıklarla yoklar).
+# Nesil değişince fark bir kez okunur, her sembol bir kez JSON'a çevrilir ve tüm
+# abonelere dağıtılır. Filtresiz abonelere aynı byte dizisi gider; filtreli
+# abonelere sadece hazır parçalar birleştirilir. Olay başına maliyet abone
+# sayısıyla değil, değişen sembol sayısıyla büyür.
+import json
+import queue
+import threading
+
+from db_models import db, get_generation
+from snapshot import build_companies_delta
+
+# İstemciye gönderilen dinamik alanlar (isim/tip/sektör statik, gönderilmez)
+STREAM_FIELDS = ('symbol', 'price', 'previousClose', 'open', 'high', 'low', 'volume', 'timestamp', 'error', 'stale')
+WATCH_INTERVAL_SECONDS = 5     # Lider olmayan worker'larda nesil yoklama aralığı
+KEEPALIVE_SECONDS = 15         # Boşta bağlantıya yorum satırı gönderme aralığı
+SUBSCRIBER_QUEUE_SIZE = 16     # Yavaş istemci bu kadar olay biriktirirse resync alır
+
+_RESYNC = object()
+
+
+def _encode(obj):
+    return json.dumps(obj, ensure_ascii=True, separators=(",", ":"))
+
+
+def format_event(event, data, event_id=None):
+    """
+    Tek bir SSE olayını metin olarak biçimlendirir.
+    """
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {data}\n\n"
+
+
+class PriceEvent:
+    """
+    Bir nesle ait fark. Sembol başına JSON parçaları bir kez üretilir;
+    tam olay metni ve filtreli metinler bunlardan birleştirilir.
+    """
+    __slots__ = ('revision', 'fragments', 'full')
+
+    def __init__(self, revision, changes):
+        self.revision = revision
+        self.fragments = {row['symbol']: _encode({f: row.get(f) for f in STREAM_FIELDS}) for row in changes}
+        self.full = self._render(self.fragments.values())
+
+    def _render(self, fragments):
+        data = f'{{"revision":{self.revision},"changes":[{",".join(fragments)}]}}'
+        return format_event('prices', data, self.revision)
+
+    def for_symbols(self, symbols):
+        """
+        Sadece verilen sembolleri içeren olay metnini döndürür (hiçbiri yoksa None).
+        """
+        fragments = [self.fragments[s] for s in symbols if s in self.fragments]
+        return self._render(fragments) if fragments else None
+
+
+class Subscriber:
+    __slots__ = ('queue', 'symbols')
+
+    def __init__(self, symbols=None):
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.symbols = frozenset(symbols) if symbols else None
+
+
+class PriceBroadcaster:
+    """
+    Süreç içi tek yayıncı. İzleyici thread'i ilk abone geldiğinde başlar.
+    """
+
+    def __init__(self, interval=WATCH_INTERVAL_SECONDS):
+        self.interval = interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.revision = None
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, symbols=None):
+        sub = Subscriber(symbols)
+        with self._lock:
+            self._subscribers.add(sub)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._watch, daemon=True, name='price-broadcaster')
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def notify(self):
+        """
+        Yeni bir yazım commit edildi; izleyiciyi beklemeden uyandırır.
+        """
+        self._wake.set()
+
+    def publish(self, event):
+        """
+        Olayı tüm abonelere dağıtır. Kuyruğu dolan abone 'resync' alır.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            if sub.symbols is None:
+                payload = event.full
+            else:
+                payload = event.for_symbols(sub.symbols)
+                if payload is None:
+                    continue
+            try:
+                sub.queue.put_nowait(payload)
+            except queue.Full:
+                # İstemci yetişemiyor: biriken farkları at, tam listeyi yeniden çeksin
+                while True:
+                    try:
+                        sub.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                sub.queue.put_nowait(_RESYNC)
+
+    def _watch(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            self._wake.clear()
+            try:
+                with db.connection_context():
+                    generation = get_generation()
+                    if self.revision is None:
+                        self.revision = generation
+                    elif generation != self.revision:
+                        delta = build_companies_delta(self.revision)
+                        self.revision = delta['revision']
+                        if delta['changes']:
+                            self.publish(PriceEvent(delta['revision'], delta['changes']))
+            except Exception as e:
+                print(f"HATA (Fiyat yayıncısı): {e}")
+            self._wake.wait(self.interval)
+
+
+def event_stream(broadcaster, symbols=None, last_event_id=None):
+    """
+    Bir SSE bağlantısının gövdesini üreten generator.
+    Last-Event-ID verilmişse aradaki fark önce gönderilir (kopan bağlantı devamı).
+    Abonelik generator içinde açılır ki hiç başlamayan cevaplar abone bırakmasın.
+    """
+    sub = broadcaster.subscribe(symbols)
+    try:
+        yield "retry: 5000\n\n"
+        if last_event_id is not None:
+            with db.connection_context():
+                delta = build_companies_delta(last_event_id)
+            if delta['reset']:
+                yield format_event('resync', '{}')
+            elif delta['changes']:
+                event = PriceEvent(delta['revision'], delta['changes'])
+                payload = event.full if sub.symbols is None else event.for_symbols(sub.symbols)
+                if payload:
+                    yield payload
+        with db.connection_context():
+            revision = get_generation()
+        yield format_event('hello', _encode({"revision": revision}))
+
+        while True:
+            try:
+                payload = sub.queue.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if payload is _RESYNC:
+                yield format_event('resync', '{}')
+            else:
+                yield payload
+    finally:
+        broadcaster.unsubscribe(sub)
+
+
+price_broadcaster = PriceBroadcaster()
@@ -0,0 +1,18 @@
+# tests/conftest.py
+# Ortak fixture'lar: her test geçici bir SQLite dosyasında boş şemayla çalışır.
+import pytest
+
+from db_models import db, SQLITE_PRAGMAS, create_tables
+
+
+@pytest.fixture
+def temp_db(tmp_path):
+    """
+    Geçici veritabanı; test boyunca bir bağlantı açık kalır.
+    """
+    db.close_all()
+    db.init(str(tmp_path / 'test.db'), pragmas=SQLITE_PRAGMAS)
+    create_tables()
+    with db.connection_context():
+        yield db
+    db.close_all()
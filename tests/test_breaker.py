@@ -0,0 +1,161 @@
+# tests/test_breaker.py
+# Devre kesici: closed -> retrying -> open -> half-open -> closed geçişleri
+# (enjekte edilen saatle), hedefli yeniden denemeler ve başarısız sembolün son
+# geçerli fiyatıyla 'stale' olarak sunulması.
+from datetime import datetime, timedelta
+
+import pytest
+
+import app
+from breaker import COOLDOWN_MAX_SECONDS, COOLDOWN_SECONDS, TRIP_AFTER, QuoteBreakers
+from db_models import Company, Price
+from derived import DerivedEngine
+from indicators import IndicatorStore
+from price_writer import PriceWriter
+from providers import FakeError, FakeProvider
+from risk import RiskStore
+from snapshot import SnapshotStore, build_companies_payload
+
+T0 = datetime(2025, 1, 2, 10, 0)
+
+
+def _fetch(provider, symbols):
+    # fetch_all_with_deadline gibi: hata veren sembol fiyatsız bir satır olur
+    rows = []
+    for symbol in symbols:
+        try:
+            rows.append(provider.fast_quote(symbol))
+        except FakeError as e:
+            rows.append({'symbol': symbol, 'error': str(e)})
+    return rows
+
+
+def _states(breakers, now):
+    return {s['symbol']: s['state'] for s in breakers.status(now)}
+
+
+def _fail(breakers, times, now):
+    down = FakeProvider(failure_rate=1.0)
+    for _ in range(times):
+        breakers.record(_fetch(down, ['AAA.IS']), now=now)
+
+
+def test_retry_schedule_before_tripping():
+    breakers = QuoteBreakers()
+    breakers.record(_fetch(FakeProvider(failure_rate=1.0), ['AAA.IS']) + _fetch(FakeProvider(), ['BBB.IS']), now=T0)
+    assert _states(breakers, T0) == {'AAA.IS': 'retrying', 'BBB.IS': 'closed'}
+    # Yeniden denenen sembol tam döngülerde de istenmeye devam eder
+    assert breakers.allowed(['AAA.IS', 'BBB.IS'], now=T0) == ['AAA.IS', 'BBB.IS']
+    assert breakers.due(['AAA.IS', 'BBB.IS'], now=T0 + timedelta(seconds=29)) == []
+    assert breakers.due(['AAA.IS', 'BBB.IS'], now=T0 + timedelta(seconds=30)) == ['AAA.IS']
+    assert breakers.seconds_until_next(['AAA.IS'], now=T0 + timedelta(seconds=10)) == 20
+
+    second = T0 + timedelta(seconds=30)
+    breakers.record(_fetch(FakeProvider(failure_rate=1.0), ['AAA.IS']), now=second)
+    assert breakers.due(['AAA.IS'], now=second + timedelta(seconds=59)) == []
+    assert breakers.due(['AAA.IS'], now=second + timedelta(seconds=60)) == ['AAA.IS']
+
+
+def test_circuit_opens_half_opens_and_closes():
+    breakers = QuoteBreakers()
+    _fail(breakers, TRIP_AFTER - 1, T0)
+    assert _states(breakers, T0)['AAA.IS'] == 'retrying'
+    _fail(breakers, 1, T0)
+    assert _states(breakers, T0)['AAA.IS'] == 'open'
+
+    # Soğuma dolana kadar ne tam döngüde ne hedefli olarak istenir
+    cooling = T0 + timedelta(seconds=COOLDOWN_SECONDS - 1)
+    assert breakers.allowed(['AAA.IS', 'BBB.IS'], now=cooling) == ['BBB.IS']
+    assert breakers.due(['AAA.IS'], now=cooling) == []
+
+    probe = T0 + timedelta(seconds=COOLDOWN_SECONDS)
+    assert _states(breakers, probe)['AAA.IS'] == 'half-open'
+    assert breakers.allowed(['AAA.IS'], now=probe) == ['AAA.IS']
+    assert breakers.due(['AAA.IS'], now=probe) == ['AAA.IS']
+
+    # Başarısız deneme: soğuma iki katına çıkar
+    _fail(breakers, 1, probe)
+    assert _states(breakers, probe)['AAA.IS'] == 'open'
+    assert breakers.allowed(['AAA.IS'], now=probe + timedelta(seconds=2 * COOLDOWN_SECONDS - 1)) == []
+    second_probe = probe + timedelta(seconds=2 * COOLDOWN_SECONDS)
+    assert _states(breakers, second_probe)['AAA.IS'] == 'half-open'
+
+    # Başarılı deneme: devre kapanır ve sayaçlar sıfırlanır
+    assert breakers.record(_fetch(FakeProvider(), ['AAA.IS']), now=second_probe) == ['AAA.IS']
+    status = breakers.status(second_probe)[0]
+    assert (status['state'], status['failures'], status['trips'], status['nextAttempt']) == ('closed', 0, 1, None)
+    _fail(breakers, TRIP_AFTER, second_probe)
+    assert breakers.allowed(['AAA.IS'], now=second_probe + timedelta(seconds=COOLDOWN_SECONDS)) == ['AAA.IS']
+
+
+def test_cooldown_is_capped():
+    breakers = QuoteBreakers()
+    now = T0
+    _fail(breakers, TRIP_AFTER, now)
+    for _ in range(10):
+        now = datetime.fromisoformat(breakers.status(now)[0]['nextAttempt'])
+        _fail(breakers, 1, now)
+    next_attempt = datetime.fromisoformat(breakers.status(now)[0]['nextAttempt'])
+    assert next_attempt - now == timedelta(seconds=COOLDOWN_MAX_SECONDS)
+
+
+class FlakyProvider(FakeProvider):
+    """
+    'failing' kümesindeki semboller için hata veren, istenen sembolleri kaydeden sağlayıcı.
+    """
+
+    def __init__(self):
+        super().__init__(seed=1)
+        self.failing = set()
+        self.requested = []
+
+    def _quote(self, symbol):
+        self.requested.append(symbol)
+        if symbol in self.failing:
+            raise FakeError(f"sahte upstream hatası ({symbol})")
+        return super()._quote(symbol)
+
+
+@pytest.fixture
+def refresher(temp_db, monkeypatch):
+    # update_prices_task'ın kullandığı süreç içi durum her test için sıfırdan
+    provider = FlakyProvider()
+    monkeypatch.setattr(app, 'get_provider', lambda: provider)
+    monkeypatch.setattr(app, 'quote_breakers', QuoteBreakers())
+    monkeypatch.setattr(app, 'price_writer', PriceWriter())
+    monkeypatch.setattr(app, 'derived_engine', DerivedEngine())
+    monkeypatch.setattr(app, 'companies_snapshot', SnapshotStore())
+    monkeypatch.setattr(app, 'indicator_store', IndicatorStore())
+    monkeypatch.setattr(app, 'risk_store', RiskStore())
+    Company.create(symbol='USDTRY=X', name='Dolar', type='döviz', sector='Döviz')
+    return provider
+
+
+def _price(symbol):
+    return Price.select().where(Price.symbol == symbol).get()
+
+
+def test_failed_symbol_is_retried_alone_and_served_stale(refresher):
+    assert app.update_prices_task(('fx',)) == {'fx': None}
+    good = _price('USDTRY=X')
+    assert good.error is None and good.price is not None
+
+    refresher.failing = {'USDTRY=X'}
+    app.update_prices_task(('fx',))
+    stale = _price('USDTRY=X')
+    # Son geçerli değerler ve zaman damgası korunur, sadece hata eklenir
+    assert (stale.price, stale.previousClose, stale.timestamp) == (good.price, good.previousClose, good.timestamp)
+    assert 'sahte upstream hatası' in stale.error
+    row = next(r for r in build_companies_payload() if r['symbol'] == 'USDTRY=X')
+    assert row['stale'] is True and row['price'] == good.price
+
+    later = datetime.now() + timedelta(seconds=30)
+    assert app.quote_breakers.due(app.FX_SYMBOLS_LIST, now=later) == ['USDTRY=X']
+
+    # Hedefli yeniden deneme sadece başarısız sembolü ister
+    refresher.failing = set()
+    refresher.requested.clear()
+    app.update_prices_task(['fx'], only={'USDTRY=X'})
+    assert refresher.requested == ['USDTRY=X']
+    assert _price('USDTRY=X').error is None
+    assert _states(app.quote_breakers, later)['USDTRY=X'] == 'closed'
@@ -0,0 +1,78 @@
+# tests/test_concurrency.py
+# WAL modunda okuyucu thread'ler, uzun transaction tutan aktif bir yazıcıya
+# karşı kilit hatası almadan companies payload'unu okuyabilmeli.
+import random
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from db_models import db, Company, Price, SQLITE_PRAGMAS, create_tables, bump_generation
+from snapshot import build_companies_payload
+
+N_SYMBOLS = 50
+READERS = 8
+SECONDS = 1.0
+WRITE_HOLD_SECONDS = 0.02  # Arka plan thread'inin uzun transaction'ını taklit eder
+
+
+def _prices(symbols, rng):
+    rows = []
+    for symbol in symbols:
+        prev = rng.uniform(5, 500)
+        rows.append({'symbol': symbol, 'price': prev * rng.uniform(0.95, 1.05), 'previousClose': prev,
+                     'timestamp': datetime.now(), 'error': None})
+    return rows
+
+
+@pytest.fixture
+def symbols(tmp_path):
+    db.close_all()
+    db.init(str(tmp_path / 'test.db'), pragmas=SQLITE_PRAGMAS)
+    create_tables()
+    symbols = [f"SYM{i:04d}.IS" for i in range(N_SYMBOLS)]
+    with db.connection_context(), db.atomic():
+        Company.insert_many([{'symbol': s, 'name': s, 'type': 'hisse', 'sector': 'test'} for s in symbols]).execute()
+        Price.replace_many(_prices(symbols, random.Random(0))).execute()
+        bump_generation()
+    yield symbols
+    db.close_all()
+
+
+def test_readers_do_not_fail_against_active_writer(symbols):
+    stop = threading.Event()
+    errors, reads, writes = [], [], []
+
+    def writer():
+        rng = random.Random(1)
+        while not stop.is_set():
+            try:
+                with db.connection_context(), db.atomic():
+                    bump_generation()
+                    Price.replace_many(_prices(symbols, rng)).execute()
+                    time.sleep(WRITE_HOLD_SECONDS)
+                writes.append(1)
+            except Exception as e:
+                errors.append(f"writer: {e}")
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with db.connection_context():
+                    rows = build_companies_payload()
+                assert len(rows) == N_SYMBOLS
+                reads.append(1)
+            except Exception as e:
+                errors.append(f"reader: {e!r}")
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(READERS)]
+    for t in threads:
+        t.start()
+    time.sleep(SECONDS)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert writes and len(reads) > READERS
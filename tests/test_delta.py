@@ -0,0 +1,61 @@
+# tests/test_delta.py
+# ?since= delta modu: sadece değişen satırlar yeni revizyonla döner, since
+# sunucudaki nesilden büyükse (DB sıfırlanmış) tam liste yeniden gönderilir.
+from datetime import datetime
+
+from db_models import Company, bump_generation
+from price_writer import PriceWriter
+from snapshot import build_companies_delta
+
+SYMBOLS = ['AAA.IS', 'BBB.IS', 'CCC.IS']
+
+
+def _cycle(db, writer, prices, now):
+    with db.atomic():
+        generation = bump_generation()
+        rows = [{'symbol': s, 'price': p, 'previousClose': 10.0, 'timestamp': now} for s, p in prices.items()]
+        result = writer.write(rows, generation, now=now)
+    writer.commit(result)
+    return generation
+
+
+def _setup(db):
+    Company.insert_many([{'symbol': s, 'name': s, 'type': 'hisse', 'sector': 'test'} for s in SYMBOLS]).execute()
+    writer = PriceWriter()
+    first = _cycle(db, writer, {'AAA.IS': 10.0, 'BBB.IS': 20.0, 'CCC.IS': 30.0}, datetime(2025, 1, 2, 10, 0))
+    # İkinci döngüde sadece BBB değişir; AAA ve CCC'nin sadece zaman damgası tazelenir
+    second = _cycle(db, writer, {'AAA.IS': 10.0, 'BBB.IS': 21.0, 'CCC.IS': 30.0}, datetime(2025, 1, 2, 10, 15))
+    return first, second
+
+
+def test_delta_returns_only_changed_rows(temp_db):
+    first, second = _setup(temp_db)
+    delta = build_companies_delta(first)
+    assert delta['revision'] == second
+    assert delta['reset'] is False
+    assert [(r['symbol'], r['price'], r['revision']) for r in delta['changes']] == [('BBB.IS', 21.0, second)]
+
+
+def test_delta_is_empty_when_client_is_current(temp_db):
+    _, second = _setup(temp_db)
+    delta = build_companies_delta(second)
+    assert delta['revision'] == second
+    assert delta['reset'] is False
+    assert delta['changes'] == []
+
+
+def test_delta_from_zero_sends_everything(temp_db):
+    first, second = _setup(temp_db)
+    delta = build_companies_delta(0)
+    assert delta['reset'] is False
+    revisions = {r['symbol']: r['revision'] for r in delta['changes']}
+    # Değişmeyen satırlar ilk revizyonlarını korur
+    assert revisions == {'AAA.IS': first, 'BBB.IS': second, 'CCC.IS': first}
+
+
+def test_delta_resets_when_since_is_ahead_of_server(temp_db):
+    _, second = _setup(temp_db)
+    delta = build_companies_delta(second + 50)
+    assert delta['revision'] == second
+    assert delta['reset'] is True
+    assert sorted(r['symbol'] for r in delta['changes']) == SYMBOLS
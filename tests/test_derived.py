@@ -0,0 +1,118 @@
+# tests/test_derived.py
+# Türetilmiş enstrümanlar: DAG sırası, formüller, artımlı yeniden hesaplama ve
+# girdisi alınamayan türetilmişlerin yine de bir Price satırı alması.
+from datetime import datetime
+
+import pytest
+
+from db_models import Company, bump_generation
+from derived import (DERIVED_INSTRUMENTS, Derived, DerivedEngine, ONS_TO_GRAM_DIVISOR, GOLD_22K_PURITY,
+                     CEYREK_ALTIN_GRAMS, resolve_order)
+from price_writer import PriceWriter
+from snapshot import build_companies_payload
+
+INPUTS = {
+    'GC=F': (2000.0, 1990.0), 'SI=F': (25.0, 24.0), 'PL=F': (900.0, 890.0),
+    'USDTRY=X': (40.0, 39.5), 'EURUSD=X': (1.1, 1.09), 'EURTRY=X': (44.0, 43.0),
+}
+
+
+def _rows(result):
+    return {r['symbol']: r for r in result.rows}
+
+
+def test_resolve_order_rejects_cycles_and_duplicates():
+    a = Derived('A', ('B',), lambda b: b, 'A', 't', 's')
+    b = Derived('B', ('A',), lambda a: a, 'B', 't', 's')
+    with pytest.raises(ValueError):
+        resolve_order([a, b])
+    with pytest.raises(ValueError):
+        resolve_order([a, a])
+    order = [d.symbol for d in resolve_order(DERIVED_INSTRUMENTS)]
+    assert order.index('GRAMALTIN') < order.index('CEYREKALTIN')
+
+
+def test_formulas_price_and_previous_close_in_one_pass():
+    engine = DerivedEngine()
+    engine.load(INPUTS)
+    rows = _rows(engine.evaluate({}))
+    gram = 2000.0 / ONS_TO_GRAM_DIVISOR * 40.0
+    gram_prev = 1990.0 / ONS_TO_GRAM_DIVISOR * 39.5
+    assert rows['GRAMALTIN']['price'] == pytest.approx(gram)
+    assert rows['GRAMALTIN']['previousClose'] == pytest.approx(gram_prev)
+    assert rows['CEYREKALTIN']['price'] == pytest.approx(gram * CEYREK_ALTIN_GRAMS * GOLD_22K_PURITY)
+    assert rows['EURTRY_CAPRAZ']['price'] == pytest.approx(1.1 * 40.0)
+    assert rows['DOVIZSEPETI']['previousClose'] == pytest.approx(0.5 * 39.5 + 0.5 * 43.0)
+
+
+def test_only_dependents_of_changed_inputs_are_recomputed():
+    engine = DerivedEngine()
+    engine.load(INPUTS)
+    assert len(engine.evaluate({}).recomputed) == len(engine.derived_symbols)
+    recomputed = engine.evaluate({'SI=F': (26.0, 24.0), 'GC=F': INPUTS['GC=F']}).recomputed
+    assert recomputed == ['GRAMGUMUS']
+    # Başarısız kotasyon (fiyat yok) son geçerli girdiyi değiştirmez
+    assert engine.evaluate({'USDTRY=X': (None, None)}).recomputed == []
+
+
+def test_missing_input_still_writes_a_row_for_every_derived_symbol():
+    engine = DerivedEngine()
+    inputs = dict(INPUTS)
+    del inputs['EURTRY=X']
+    engine.load(inputs)
+    rows = _rows(engine.evaluate({}))
+    assert set(rows) == set(engine.derived_symbols)
+    assert rows['DOVIZSEPETI']['price'] is None
+    assert rows['DOVIZSEPETI']['error'] == "Girdi fiyatı yok: EURTRY=X"
+    assert rows['GRAMALTIN']['price'] is not None and 'error' not in rows['GRAMALTIN']
+
+
+def test_uncomputable_derived_symbol_does_not_break_the_payload(temp_db):
+    # Seed sonrası ilk döngüde EURTRY=X alınamadı
+    Company.insert_many([d.metadata() for d in DERIVED_INSTRUMENTS]).execute()
+    engine, writer = DerivedEngine(), PriceWriter()
+    inputs = dict(INPUTS)
+    del inputs['EURTRY=X']
+    engine.load(inputs)
+    with temp_db.atomic():
+        result = writer.write(engine.evaluate({}).rows, bump_generation(), now=datetime(2025, 1, 2, 10))
+    writer.commit(result)
+    payload = {r['symbol']: r for r in build_companies_payload()}
+    assert set(payload) == {d.symbol for d in DERIVED_INSTRUMENTS}
+    assert payload['DOVIZSEPETI']['price'] is None and payload['DOVIZSEPETI']['error']
+    assert payload['GRAMALTIN']['price'] is not None
+
+    # Girdi gelince satır düzelir
+    with temp_db.atomic():
+        result = writer.write(engine.evaluate({'EURTRY=X': INPUTS['EURTRY=X']}).rows, bump_generation())
+    writer.commit(result)
+    basket = next(r for r in build_companies_payload() if r['symbol'] == 'DOVIZSEPETI')
+    assert basket['price'] == pytest.approx(0.5 * 40.0 + 0.5 * 44.0)
+    assert basket['error'] is None
+
+
+def test_change_fields_from_the_same_pass():
+    engine = DerivedEngine()
+    inputs = dict(INPUTS)
+    del inputs['EURTRY=X']
+    engine.load(inputs)
+    result = engine.evaluate({})
+    rows = _rows(result)
+    gram = rows['GRAMALTIN']
+    assert result.change['GRAMALTIN'] == pytest.approx(gram['price'] - gram['previousClose'])
+    assert result.change_percent['GRAMALTIN'] == pytest.approx(
+        (gram['price'] - gram['previousClose']) / gram['previousClose'] * 100)
+    assert result.change['DOVIZSEPETI'] is None and result.change_percent['DOVIZSEPETI'] is None
+
+
+def test_derived_rows_count_as_market_movers():
+    from market import MarketSummary
+
+    engine = DerivedEngine()
+    engine.load(INPUTS)
+    meta = {d.symbol: d.metadata() for d in DERIVED_INSTRUMENTS}
+    summary = MarketSummary([dict(meta[r['symbol']], **r) for r in engine.evaluate({}).rows])
+    view = summary.view(top=20)
+    assert view['breadth']['noData'] == 0
+    movers = {r['symbol']: r for r in view['gainers'] + view['losers']}
+    assert set(movers) == {d.symbol for d in DERIVED_INSTRUMENTS}
@@ -0,0 +1,72 @@
+# tests/test_download.py
+# download_in_chunks: parça hataları ve eksik semboller sadece ilgili kısım
+# yeniden denenerek kurtarılır; sonunda sadece veri vermeyen semboller hatalı kalır.
+import threading
+
+import numpy as np
+import pandas as pd
+
+from fetchers import download_in_chunks
+
+SYMBOLS = [f"SYM{i:03d}.IS" for i in range(60)]
+
+
+def _frame(symbols):
+    # yf.download(period="2d") biçiminde geniş tablo
+    columns = pd.MultiIndex.from_product([['Close', 'High', 'Low', 'Open', 'Volume'], symbols],
+                                         names=['Price', 'Ticker'])
+    index = pd.DatetimeIndex(['2025-01-02', '2025-01-03'], name='Date')
+    values = np.random.default_rng(0).uniform(5, 500, size=(2, len(columns)))
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+class FakeDownloader:
+    """
+    - 'flaky_chunk' sembollerinden birini içeren parça ilk isteğinde hata fırlatır,
+    - 'flaky' semboller ilk istendiklerinde boş döner,
+    - 'dead' semboller hiç veri döndürmez.
+    """
+
+    def __init__(self, flaky_chunk=(), flaky=(), dead=()):
+        self.frame = _frame(SYMBOLS)
+        self.flaky_chunk, self.flaky, self.dead = set(flaky_chunk), set(flaky), set(dead)
+        self.calls = 0
+        self._requested = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, chunk):
+        with self._lock:
+            self.calls += 1
+            first = {s for s in chunk if s not in self._requested}
+            self._requested.update(chunk)
+        if first & self.flaky_chunk:
+            raise RuntimeError("sahte upstream hatası (429)")
+        keep = [s for s in chunk if s not in self.dead and not (s in self.flaky and s in first)]
+        return self.frame.loc[:, self.frame.columns.get_level_values(1).isin(keep)]
+
+
+def _download(fake, **kwargs):
+    kwargs = dict(dict(chunk_size=10, max_workers=4, attempts=3, sleep=lambda _: None), **kwargs)
+    data, errors = download_in_chunks(SYMBOLS, fake, **kwargs)
+    got = set(data['Close'].columns[data['Close'].notna().any(axis=0)]) if not data.empty else set()
+    return data, got, errors
+
+
+def test_partial_failures_are_retried_until_only_dead_symbols_remain():
+    fake = FakeDownloader(flaky_chunk={'SYM007.IS'}, flaky={'SYM015.IS', 'SYM033.IS'}, dead={'SYM050.IS'})
+    data, got, errors = _download(fake)
+    assert got == set(SYMBOLS) - {'SYM050.IS'}
+    assert set(errors) == {'SYM050.IS'}
+    # Sadece ilgili kısım yeniden istenir: 1. tur 6 parça; 2. tur hatalı parçanın
+    # 10 sembolü + 2 eksik + 1 ölü sembol (2 parça); 3. tur sadece ölü sembol
+    assert fake.calls == 6 + 2 + 1
+    assert data['Close'].columns.is_unique
+
+
+def test_chunk_failing_every_attempt_reports_its_symbols():
+    fake = FakeDownloader(flaky_chunk={'SYM007.IS'})
+    _, got, errors = _download(fake, attempts=1)
+    chunk = set(SYMBOLS[:10])
+    assert got == set(SYMBOLS) - chunk
+    assert set(errors) == chunk
+    assert all("429" in e for e in errors.values())
@@ -0,0 +1,54 @@
+# tests/test_fetchers.py
+# fetch_all_with_deadline: sahte gecikmeli fetcher ile döngü süresinin
+# gecikmelerin toplamı değil, en yavaş (süre sınırlı) çağrı kadar olduğu.
+import time
+
+from fetchers import fetch_all_with_deadline
+
+# Thread başlatma ve yoklama aralığı (_POLL_SECONDS) için pay
+SLACK_SECONDS = 0.3
+
+
+def _fake_fetcher(latency, failing=()):
+    def fetch(symbol):
+        time.sleep(latency[symbol])
+        if symbol in failing:
+            raise RuntimeError("sahte upstream hatası")
+        return {'symbol': symbol, 'price': 1.0}
+    return fetch
+
+
+def _timed(*args, **kwargs):
+    start = time.perf_counter()
+    results, errors = fetch_all_with_deadline(*args, **kwargs)
+    return results, errors, time.perf_counter() - start
+
+
+def test_cycle_time_is_slowest_call_not_sum():
+    latency = {f"FX{i}": 0.2 for i in range(8)}
+    results, errors, elapsed = _timed(list(latency), _fake_fetcher(latency, failing={'FX0'}),
+                                      max_workers=8, per_symbol_timeout=1.0, deadline=5.0)
+    assert elapsed < max(latency.values()) + SLACK_SECONDS < sum(latency.values())
+    assert set(results) == set(latency) - {'FX0'}
+    assert errors == {'FX0': "sahte upstream hatası"}
+
+
+def test_slow_symbol_times_out_without_holding_the_cycle():
+    latency = {f"FX{i}": 0.05 for i in range(4)}
+    latency['TAKILAN'] = 1.0
+    results, errors, elapsed = _timed(list(latency), _fake_fetcher(latency),
+                                      max_workers=8, per_symbol_timeout=0.3, deadline=5.0)
+    assert elapsed < 0.3 + SLACK_SECONDS
+    assert set(results) == set(latency) - {'TAKILAN'}
+    assert errors['TAKILAN'].startswith("Zaman aşımı")
+
+
+def test_deadline_bounds_queued_symbols():
+    # 2 thread, 8 sembol x 0.3 sn: ilk ikisi biter, kalanlar son tarihte bırakılır
+    latency = {f"FX{i}": 0.3 for i in range(8)}
+    results, errors, elapsed = _timed(list(latency), _fake_fetcher(latency),
+                                      max_workers=2, per_symbol_timeout=1.0, deadline=0.5)
+    assert elapsed < 0.5 + SLACK_SECONDS
+    assert len(results) == 2
+    assert set(results) | set(errors) == set(latency)
+    assert all(e.startswith("Döngü süresi doldu") for e in errors.values())
@@ -0,0 +1,165 @@
+# tests/test_indicators.py
+# Artımlı gösterge motoru, her adımda kapanış serisinden sıfırdan NumPy ile
+# hesaplanan değerlerle aynı sonucu vermeli: geçmişten yükleme, gün içi geçici
+# bar, gün değişiminde kesinleşme ve PriceHistory'den kaçırılan günlerin telafisi.
+from datetime import date, datetime, time as dt_time, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from history import append_history
+from indicators import (BOLLINGER_K, BOLLINGER_PERIOD, EMA_PERIODS, FIELDS, MACD_FAST, MACD_SIGNAL, MACD_SLOW,
+                        MIN_OBSERVATIONS, RSI_PERIOD, SMA_PERIODS, IndicatorEngine, IndicatorStore, day_date,
+                        day_number)
+
+SYMBOLS = ['AAA.IS', 'BBB.IS', 'CCC.IS']
+FIRST_DAY = day_number(date(2025, 1, 1))
+
+
+def _closes(days, seed=0):
+    # Sembol başına rastgele yürüyüş; BBB'nin bazı günleri eksik, CCC geç başlar
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (len(SYMBOLS), days)), axis=1))
+    closes[1, [5, 6, days - 18, days - 8]] = np.nan
+    closes[2, :days - 30] = np.nan
+    return closes
+
+
+def _ema(values, period):
+    alpha = 2.0 / (period + 1)
+    out = np.empty(len(values))
+    out[0] = values[0]
+    for i in range(1, len(values)):
+        out[i] = out[i - 1] + alpha * (values[i] - out[i - 1])
+    return out
+
+
+def _rsi(values):
+    changes = np.diff(values)
+    gains, losses = np.maximum(changes, 0), np.maximum(-changes, 0)
+    avg_gain, avg_loss = gains[:RSI_PERIOD].mean(), losses[:RSI_PERIOD].mean()
+    for g, l in zip(gains[RSI_PERIOD:], losses[RSI_PERIOD:]):
+        avg_gain = (avg_gain * (RSI_PERIOD - 1) + g) / RSI_PERIOD
+        avg_loss = (avg_loss * (RSI_PERIOD - 1) + l) / RSI_PERIOD
+    if avg_loss == 0:
+        return 50.0 if avg_gain == 0 else 100.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+def reference(series):
+    """
+    Bir sembolün tüm kapanışlarından (NaN'sız) göstergeler; yetersiz gözlemde NaN.
+    """
+    x = np.asarray(series, dtype=float)
+    n = len(x)
+    if n == 0:
+        return {field: np.nan for field in FIELDS}
+    values = {'close': x[-1]}
+    for p in SMA_PERIODS:
+        values[f'sma{p}'] = x[-p:].mean()
+    emas = {p: _ema(x, p) for p in EMA_PERIODS}
+    for p in EMA_PERIODS:
+        values[f'ema{p}'] = emas[p][-1]
+    macd = emas[MACD_FAST] - emas[MACD_SLOW]
+    signal = _ema(macd, MACD_SIGNAL)
+    values.update(macd=macd[-1], macdSignal=signal[-1], macdHist=macd[-1] - signal[-1])
+    values['rsi14'] = _rsi(x) if n > RSI_PERIOD else np.nan
+    window = x[-BOLLINGER_PERIOD:]
+    mean, std = window.mean(), window.std()
+    values.update(bbMiddle=mean, bbUpper=mean + BOLLINGER_K * std, bbLower=mean - BOLLINGER_K * std)
+    return {field: values[field] if n >= MIN_OBSERVATIONS[field] else np.nan for field in FIELDS}
+
+
+def _assert_matches(table, series_by_symbol):
+    for symbol, series in series_by_symbol.items():
+        row = table.row(symbol)
+        expected = reference(series)
+        assert row['bars'] == len(series), symbol
+        for field in FIELDS:
+            actual = np.nan if row[field] is None else row[field]
+            np.testing.assert_allclose(actual, expected[field], rtol=1e-9, atol=1e-9, err_msg=f"{symbol} {field}")
+
+
+def _series(closes, upto):
+    # Sembol başına 'upto' gününe kadarki (hariç) mevcut kapanışlar
+    return {s: list(closes[i, :upto][np.isfinite(closes[i, :upto])]) for i, s in enumerate(SYMBOLS)}
+
+
+def test_load_matrix_matches_from_scratch():
+    closes = _closes(80)
+    engine = IndicatorEngine(SYMBOLS)
+    engine.load_matrix(FIRST_DAY + np.arange(80), closes)
+    _assert_matches(engine.table(), _series(closes, 80))
+
+
+def test_incremental_updates_and_rollover_match_from_scratch():
+    days = 90
+    closes = _closes(days, seed=1)
+    engine = IndicatorEngine(SYMBOLS)
+    engine.load_matrix(FIRST_DAY + np.arange(60), closes[:, :60])
+
+    rng = np.random.default_rng(2)
+    for t in range(60, days):
+        day = day_date(FIRST_DAY + t)
+        # Gün içinde önce ara bir fiyat, sonra günün kapanışı gelir
+        for final in (False, True):
+            price = closes[:, t] if final else closes[:, t] * rng.uniform(0.97, 1.03, len(SYMBOLS))
+            engine.update({s: (float(price[i]), day) for i, s in enumerate(SYMBOLS) if np.isfinite(price[i])})
+            _assert_pending(engine.table(), closes, t, price)
+
+
+def _assert_pending(table, closes, t, price):
+    # Beklenen seri: önceki günlerin kapanışları + bugünün geçici fiyatı. Bugün
+    # fiyatı gelmeyen sembolde dünün barı hâlâ geçicidir ama değeri aynıdır.
+    expected = _series(closes, t)
+    for i, s in enumerate(SYMBOLS):
+        if np.isfinite(price[i]):
+            expected[s] = expected[s] + [price[i]]
+    _assert_matches(table, expected)
+
+
+def _tick(symbol, day, hour, price):
+    return {'symbol': symbol, 'timestamp': datetime.combine(day, dt_time(hour)), 'price': float(price), 'error': None}
+
+
+def _snap(generation, day, prices):
+    # SnapshotStore'un payload'undaki alanlar yeterli (fiyatı olmayan satırda None)
+    timestamp = datetime.combine(day, dt_time(12)).isoformat()
+    payload = [{'symbol': s, 'price': float(p) if np.isfinite(p) else None, 'timestamp': timestamp}
+               for s, p in zip(SYMBOLS, prices)]
+    return SimpleNamespace(generation=generation, payload=payload)
+
+
+@pytest.fixture
+def base_day():
+    # İlk yükleme bugünden önceki geçmişi okur; sentetik günler gerçek bugünden önce kalsın
+    return date.today() - timedelta(days=80)
+
+
+def test_store_catches_up_missed_days_from_history(temp_db, base_day):
+    closes = _closes(50, seed=3)
+    def day_of(t):
+        return base_day + timedelta(days=t)
+
+    def record(t):
+        # Arka plan güncellemesi: gün içinde ara fiyat ve günün kapanış tick'i
+        rows = []
+        for i, s in enumerate(SYMBOLS):
+            if np.isfinite(closes[i, t]):
+                rows.append(_tick(s, day_of(t), 11, closes[i, t] * 1.01))
+                rows.append(_tick(s, day_of(t), 17, closes[i, t]))
+        append_history(rows)
+
+    for t in range(30):
+        record(t)
+    store = IndicatorStore()
+    # 30. günün öğlesi: geçici bar gün içi bir fiyat
+    midday = closes[:, 30] * 0.99
+    _assert_pending(store.sync(_snap(1, day_of(30), midday)), closes, 30, midday)
+
+    # Bu worker 30-34. günleri hiç görmedi; kapanışlar (30. günün öğle fiyatı
+    # değil) geçmişten kesinleşmeli
+    for t in range(30, 35):
+        record(t)
+    _assert_pending(store.sync(_snap(2, day_of(35), closes[:, 35])), closes, 35, closes[:, 35])
@@ -0,0 +1,41 @@
+# tests/test_leader.py
+# Dosya kilidine dayalı liderlik: tek lider, bırakınca devir ve kira kaydı
+# yazılamadığında kilidin tutulmaması.
+import pytest
+
+from db_models import RefresherLease
+from leader import LeaderLease
+
+
+@pytest.fixture
+def lock_path(tmp_path, temp_db):
+    return str(tmp_path / 'refresher.lock')
+
+
+def test_single_leader_and_takeover(lock_path):
+    first, second = LeaderLease(lock_path=lock_path), LeaderLease(lock_path=lock_path)
+    try:
+        assert first.try_acquire()
+        assert not second.try_acquire()
+        assert RefresherLease.get().holder == first.holder
+        first.release()
+        assert second.try_acquire()
+    finally:
+        first.release()
+        second.release()
+
+
+def test_failed_lease_write_releases_the_lock(lock_path, monkeypatch):
+    lease, other = LeaderLease(lock_path=lock_path), LeaderLease(lock_path=lock_path)
+
+    def locked(acquired):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(lease, '_write_lease', locked)
+    with pytest.raises(RuntimeError):
+        lease.try_acquire()
+    assert not lease.is_leader
+    try:
+        assert other.try_acquire()
+    finally:
+        other.release()
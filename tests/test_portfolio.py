@@ -0,0 +1,95 @@
+# tests/test_portfolio.py
+# Toplu portföy değerlemesi: elle hesaplanmış TL/USD değerler, günlük K/Z
+# (kur hareketi dahil), varlık sınıfı kırılımı ve geçersiz istekler.
+import pytest
+
+import portfolio
+from portfolio import MAX_PORTFOLIOS, PortfolioPricer, quote_currency
+
+PAYLOAD = [
+    {'symbol': 'AAA.IS', 'type': 'hisse', 'price': 10.0, 'previousClose': 9.5},
+    {'symbol': 'BBB.IS', 'type': 'hisse', 'price': None, 'previousClose': None},
+    {'symbol': 'USDTRY=X', 'type': 'doviz', 'price': 40.0, 'previousClose': 39.5},
+    {'symbol': 'EURTRY=X', 'type': 'doviz', 'price': 44.0, 'previousClose': 43.0},
+    {'symbol': 'EURUSD=X', 'type': 'doviz_capraz', 'price': 1.1, 'previousClose': 1.09},
+    {'symbol': 'GC=F', 'type': 'maden_ons', 'price': 2000.0, 'previousClose': 1990.0},
+]
+
+
+@pytest.mark.parametrize('symbol, currency', [
+    ('USDTRY=X', 'TRY'), ('EURUSD=X', 'USD'), ('GC=F', 'USD'), ('AAA.IS', 'TRY'), ('GRAMALTIN', 'TRY'),
+])
+def test_quote_currency(symbol, currency):
+    assert quote_currency(symbol) == currency
+
+
+def test_values_match_hand_computed_totals():
+    result = PortfolioPricer(PAYLOAD).value([
+        {'id': 'p1', 'holdings': {'AAA.IS': 100, 'USDTRY=X': 10, 'GC=F': 0.5, 'BBB.IS': 5, 'ZZZ.IS': 1}},
+        {'id': 'p2', 'holdings': {'EURUSD=X': 1000, 'EURTRY=X': 10}},
+        {'id': 'p3', 'holdings': {}},
+    ])
+    p1, p2, p3 = result['portfolios']
+
+    # p1: 100*10 + 10*40 + 0.5*2000*40 = 41400; önceki: 950 + 395 + 0.5*1990*39.5 = 40647.5
+    assert p1['value'] == {'TRY': 41400.0, 'USD': 1035.0}
+    # USD K/Z: 41400/40 - 40647.5/39.5
+    assert p1['dailyPnl'] == {'TRY': 752.5, 'USD': 5.95}
+    assert p1['dailyPnlPercent'] == {'TRY': 1.8513, 'USD': 0.5781}
+    assert p1['breakdown'] == {
+        'doviz': {'TRY': 400.0, 'USD': 10.0, 'weight': 0.0097},
+        'hisse': {'TRY': 1000.0, 'USD': 25.0, 'weight': 0.0242},
+        'maden': {'TRY': 40000.0, 'USD': 1000.0, 'weight': 0.9662},
+    }
+    assert p1['unknown'] == ['ZZZ.IS']
+    assert p1['unpriced'] == ['BBB.IS']
+
+    # p2: çapraz kur USD'den TL'ye çevrilir: 1000*1.1*40 + 10*44 = 44440
+    assert p2['value'] == {'TRY': 44440.0, 'USD': 1111.0}
+    assert p2['dailyPnl']['TRY'] == 955.0  # 44440 - (1000*1.09*39.5 + 430)
+    assert list(p2['breakdown']) == ['doviz']
+
+    # Boş portföy: değer 0, yüzde tanımsız, kırılım boş
+    assert p3['value'] == {'TRY': 0.0, 'USD': 0.0}
+    assert p3['dailyPnlPercent'] == {'TRY': None, 'USD': None}
+    assert p3['breakdown'] == {}
+
+    assert result['rates'] == {'EURTRY': 44.0, 'USDTRY': 40.0}
+    assert result['totals'] == {
+        'portfolios': 3,
+        'positions': 7,
+        'value': {'TRY': 85840.0, 'USD': 2146.0},
+        'dailyPnl': {'TRY': 1707.5, 'USD': 16.06},
+    }
+
+
+def test_missing_usdtry_leaves_usd_values_empty():
+    payload = [row for row in PAYLOAD if row['symbol'] != 'USDTRY=X']
+    result = PortfolioPricer(payload).value([{'id': 1, 'holdings': {'AAA.IS': 100, 'GC=F': 1}}])
+    row = result['portfolios'][0]
+    # USD kotasyonlu ons TL'ye çevrilemez: fiyatsız sayılır
+    assert row['value'] == {'TRY': 1000.0, 'USD': None}
+    assert row['unpriced'] == ['GC=F']
+    assert result['totals']['value']['USD'] is None
+
+
+@pytest.mark.parametrize('portfolios, message', [
+    ([], 'boş olmayan bir liste'),
+    ({'holdings': {}}, 'boş olmayan bir liste'),
+    ([{'id': 1, 'holdings': ['AAA.IS']}], r'portfolios\[0\]\.holdings'),
+    ([{'id': 1}], r'portfolios\[0\]\.holdings'),
+    (['AAA.IS'], r'portfolios\[0\]\.holdings'),
+    ([{'holdings': {'AAA.IS': 'çok'}}], 'sayı olmalı'),
+    ([{'holdings': {'AAA.IS': float('nan')}}], 'sonlu'),
+    ([{'holdings': {'AAA.IS': float('inf')}}], 'sonlu'),
+    ([{'holdings': {}}] * (MAX_PORTFOLIOS + 1), 'en fazla'),
+])
+def test_invalid_requests_raise_value_error(portfolios, message):
+    with pytest.raises(ValueError, match=message):
+        PortfolioPricer(PAYLOAD).value(portfolios)
+
+
+def test_position_limit(monkeypatch):
+    monkeypatch.setattr(portfolio, 'MAX_POSITIONS', 2)
+    with pytest.raises(ValueError, match='pozisyon'):
+        PortfolioPricer(PAYLOAD).value([{'holdings': {'AAA.IS': 1, 'GC=F': 1}}, {'holdings': {'USDTRY=X': 1}}])
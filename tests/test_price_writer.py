@@ -0,0 +1,93 @@
+# tests/test_price_writer.py
+# Fark yazımı: değişmeyen satırların sadece zaman damgası tazelenir, değişenler
+# yeni revizyonla upsert edilir, reset() sonrası bellek DB'den yeniden kurulur.
+from datetime import datetime
+
+from db_models import Price, bump_generation
+from price_writer import PriceWriter
+
+T0 = datetime(2025, 1, 2, 10, 0)
+T1 = datetime(2025, 1, 2, 10, 15)
+T2 = datetime(2025, 1, 2, 10, 30)
+
+
+def _rows(prices, now):
+    return [{'symbol': s, 'price': p, 'previousClose': 10.0, 'timestamp': now} for s, p in prices.items()]
+
+
+def _write(db, writer, prices, now):
+    with db.atomic():
+        generation = bump_generation()
+        result = writer.write(_rows(prices, now), generation, now=now)
+    writer.commit(result)
+    return generation, result
+
+
+def _db_rows():
+    return {p.symbol_id: p for p in Price.select()}
+
+
+def test_first_write_inserts_every_row(temp_db):
+    writer = PriceWriter()
+    generation, result = _write(temp_db, writer, {'AAA.IS': 10.0, 'BBB.IS': 20.0}, T0)
+    assert sorted(r['symbol'] for r in result.changed) == ['AAA.IS', 'BBB.IS']
+    assert result.unchanged == [] and result.stale == []
+    assert {s: (p.price, p.revision) for s, p in _db_rows().items()} == {
+        'AAA.IS': (10.0, generation), 'BBB.IS': (20.0, generation)}
+
+
+def test_unchanged_rows_only_touch_timestamp(temp_db):
+    writer = PriceWriter()
+    first, _ = _write(temp_db, writer, {'AAA.IS': 10.0, 'BBB.IS': 20.0}, T0)
+    second, result = _write(temp_db, writer, {'AAA.IS': 10.0, 'BBB.IS': 20.0}, T1)
+    assert second > first
+    assert result.changed == []
+    assert sorted(result.unchanged) == ['AAA.IS', 'BBB.IS']
+    for row in _db_rows().values():
+        assert row.timestamp == T1
+        assert row.revision == first
+
+
+def test_changed_row_is_upserted_with_new_revision(temp_db):
+    writer = PriceWriter()
+    first, _ = _write(temp_db, writer, {'AAA.IS': 10.0, 'BBB.IS': 20.0}, T0)
+    second, result = _write(temp_db, writer, {'AAA.IS': 10.0, 'BBB.IS': 21.0}, T1)
+    assert [r['symbol'] for r in result.changed] == ['BBB.IS']
+    assert result.unchanged == ['AAA.IS']
+    rows = _db_rows()
+    assert (rows['BBB.IS'].price, rows['BBB.IS'].revision, rows['BBB.IS'].timestamp) == (21.0, second, T1)
+    assert (rows['AAA.IS'].price, rows['AAA.IS'].revision, rows['AAA.IS'].timestamp) == (10.0, first, T1)
+
+
+def test_nan_and_none_compare_equal(temp_db):
+    writer = PriceWriter()
+    _write(temp_db, writer, {'AAA.IS': 10.0}, T0)
+    with temp_db.atomic():
+        row = dict(_rows({'AAA.IS': 10.0}, T1)[0], volume=float('nan'))
+        result = writer.write([row], bump_generation(), now=T1)
+    assert result.changed == [] and result.unchanged == ['AAA.IS']
+
+
+def test_reset_reloads_and_rewrites_rows_changed_outside(temp_db):
+    writer = PriceWriter()
+    _write(temp_db, writer, {'AAA.IS': 10.0, 'BBB.IS': 20.0}, T0)
+    # Başka bir süreç (ör. önceki lider) tabloyu değiştirdi
+    Price.delete().where(Price.symbol == 'AAA.IS').execute()
+    Price.update(price=99.0).where(Price.symbol == 'BBB.IS').execute()
+
+    writer.reset()
+    generation, result = _write(temp_db, writer, {'AAA.IS': 10.0, 'BBB.IS': 20.0}, T1)
+    assert sorted(r['symbol'] for r in result.changed) == ['AAA.IS', 'BBB.IS']
+    assert result.unchanged == []
+    assert {s: (p.price, p.revision) for s, p in _db_rows().items()} == {
+        'AAA.IS': (10.0, generation), 'BBB.IS': (20.0, generation)}
+
+
+def test_without_reset_memory_hides_outside_changes(temp_db):
+    # reset() olmadan bellek kopyası DB'deki dış değişikliği görmez
+    writer = PriceWriter()
+    _write(temp_db, writer, {'AAA.IS': 10.0}, T0)
+    Price.update(price=99.0).where(Price.symbol == 'AAA.IS').execute()
+    _, result = _write(temp_db, writer, {'AAA.IS': 10.0}, T1)
+    assert result.changed == [] and result.unchanged == ['AAA.IS']
+    assert _db_rows()['AAA.IS'].price == 99.0
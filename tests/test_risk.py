@@ -0,0 +1,101 @@
+# tests/test_risk.py
+# Artımlı korelasyon/volatilite motoru, pencerenin getirilerinden np.corrcoef ve
+# np.std ile sıfırdan hesaplanan matrisle aynı sonucu vermeli (gün içi geçici
+# satır, gün değişimi ve her WINDOW kesinleşmede P/S'nin yeniden toplanması dahil).
+import math
+from datetime import date
+
+import numpy as np
+
+from indicators import day_date, day_number
+from risk import MIN_OBSERVATIONS, RETURN_WINDOW, TRADING_DAYS_PER_YEAR, CorrelationEngine
+
+SYMBOLS = ['AAA.IS', 'BBB.IS', 'CCC.IS', 'DDD.IS']
+FIRST_DAY = day_number(date(2025, 1, 1))
+
+
+def _closes(days, seed=0):
+    # Ortak bir piyasa faktörü + sembole özgü gürültü; BBB'nin bazı günleri
+    # eksik (fiyatı taşınır), DDD pencereyi dolduracak kadar geçmişe sahip değil
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, days)
+    beta = np.array([[1.0], [0.5], [-0.8], [1.2]])
+    returns = beta * market + rng.normal(0, 0.01, (len(SYMBOLS), days))
+    closes = 100 * np.exp(np.cumsum(returns, axis=1))
+    closes[1, [10, days - 40, days - 39, days - 5]] = np.nan
+    closes[3, :days - MIN_OBSERVATIONS + 5] = np.nan
+    return closes
+
+
+def reference(closes, window=RETURN_WINDOW):
+    """
+    (n, T) kapanışlardan son 'window' günün log getirileriyle korelasyon,
+    yıllık volatilite ve geçerli getiri sayısı. Eksik kapanış önceki fiyatı
+    taşır: o günün getirisi 0 ve geçersizdir.
+    """
+    carried = closes.copy()
+    for t in range(1, carried.shape[1]):
+        missing = np.isnan(carried[:, t])
+        carried[missing, t] = carried[missing, t - 1]
+    ok = np.isfinite(closes[:, 1:]) & np.isfinite(carried[:, :-1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.where(ok, np.log(closes[:, 1:] / carried[:, :-1]), 0.0)
+    returns, ok = returns[:, -window:], ok[:, -window:]
+
+    std = returns.std(axis=1, ddof=1)
+    enough = (ok.sum(axis=1) >= MIN_OBSERVATIONS) & (std > 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = np.corrcoef(returns)
+    corr[~enough, :] = np.nan
+    corr[:, ~enough] = np.nan
+    volatility = np.where(enough, std * math.sqrt(TRADING_DAYS_PER_YEAR), np.nan)
+    return corr, volatility, ok.sum(axis=1), returns
+
+
+def _assert_matches(matrix, closes):
+    corr, volatility, observations, _ = reference(closes)
+    np.testing.assert_allclose(matrix.correlation, corr, rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(matrix.volatility, volatility, rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(matrix.observations, observations)
+
+
+def test_load_matrix_matches_from_scratch():
+    closes = _closes(3 * RETURN_WINDOW + 17)
+    engine = CorrelationEngine(SYMBOLS)
+    engine.load_matrix(FIRST_DAY + np.arange(closes.shape[1]), closes)
+    _assert_matches(engine.matrix(), closes)
+    assert np.isnan(engine.matrix().volatility[3])  # Yetersiz gözlem
+    assert not np.isnan(engine.matrix().correlation[0, 2])
+
+
+def test_cross_products_are_rebuilt_every_window():
+    closes = _closes(2 * RETURN_WINDOW + 1)
+    engine = CorrelationEngine(SYMBOLS)
+    engine.load_matrix(FIRST_DAY + np.arange(closes.shape[1]), closes)
+    assert engine.commits == 2 * RETURN_WINDOW
+    # Tam bu kesinleşmede P ve S tampondan yeniden toplandı
+    returns = reference(closes)[3].T
+    np.testing.assert_array_equal(engine.cross, engine.returns.T @ engine.returns)
+    np.testing.assert_allclose(engine.cross, returns.T @ returns, rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(engine.sums, returns.sum(axis=0), rtol=1e-12, atol=1e-15)
+
+
+def test_incremental_updates_and_rollover_match_from_scratch():
+    days = 2 * RETURN_WINDOW + 30
+    closes = _closes(days, seed=1)
+    engine = CorrelationEngine(SYMBOLS)
+    start = RETURN_WINDOW + 10
+    engine.load_matrix(FIRST_DAY + np.arange(start), closes[:, :start])
+
+    rng = np.random.default_rng(2)
+    for t in range(start, days):
+        day = day_date(FIRST_DAY + t)
+        # Gün içinde önce ara bir fiyat, sonra günün kapanışı gelir
+        for final in (False, True):
+            price = closes[:, t] if final else closes[:, t] * rng.uniform(0.98, 1.02, len(SYMBOLS))
+            engine.update({s: (float(price[i]), day) for i, s in enumerate(SYMBOLS) if np.isfinite(price[i])})
+            matrix = engine.matrix()
+            _assert_matches(matrix, np.column_stack([closes[:, :t], price]))
+            assert matrix.as_of == str(day)
+    # Son gün hâlâ geçici; ilk gün sadece başlangıç fiyatı
+    assert engine.commits == days - 2
@@ -0,0 +1,149 @@
+# tests/test_scheduler.py
+# Piyasa takvimi ve sınıf başına planlama: hafta sonları, tatiller, yarım
+# günler ve seans sınırları Europe/Istanbul saatiyle tablo halinde.
+import random
+from datetime import datetime, time as dt_time, timedelta
+
+import pytest
+import pytz
+
+from scheduler import AssetClassSchedule, BistCalendar, RefreshScheduler, WeeklyHours, istanbul_tz
+
+
+def _ist(*args):
+    return istanbul_tz.localize(datetime(*args))
+
+
+bist = BistCalendar()
+fx = WeeklyHours('FX')
+
+
+@pytest.mark.parametrize('now, is_open', [
+    (_ist(2025, 1, 2, 9, 59), False),     # Perşembe, açılıştan önce
+    (_ist(2025, 1, 2, 10, 0), True),      # Açılış anı
+    (_ist(2025, 1, 2, 18, 10), True),     # Kapanış seansının sonu
+    (_ist(2025, 1, 2, 18, 11), False),
+    (_ist(2025, 1, 4, 12, 0), False),     # Cumartesi
+    (_ist(2025, 1, 5, 12, 0), False),     # Pazar
+    (_ist(2025, 1, 1, 12, 0), False),     # Yılbaşı
+    (_ist(2025, 10, 29, 12, 0), False),   # Cumhuriyet Bayramı
+    (_ist(2025, 6, 6, 12, 0), False),     # Kurban Bayramı
+    (_ist(2025, 10, 28, 12, 40), True),   # Arife (yarım gün) kapanışı
+    (_ist(2025, 10, 28, 12, 41), False),
+])
+def test_bist_is_open(now, is_open):
+    assert bist.is_open(now) is is_open
+
+
+@pytest.mark.parametrize('now, expected', [
+    (_ist(2025, 1, 2, 9, 0), _ist(2025, 1, 2, 10, 0)),     # Aynı gün
+    (_ist(2025, 1, 2, 18, 30), _ist(2025, 1, 3, 10, 0)),   # Ertesi gün
+    (_ist(2025, 1, 3, 19, 0), _ist(2025, 1, 6, 10, 0)),    # Cuma -> Pazartesi
+    (_ist(2024, 12, 31, 19, 0), _ist(2025, 1, 2, 10, 0)),  # Yılbaşını atlar
+    (_ist(2025, 6, 5, 13, 0), _ist(2025, 6, 10, 10, 0)),   # Bayram + hafta sonu
+])
+def test_bist_next_open(now, expected):
+    assert bist.next_open(now) == expected
+
+
+@pytest.mark.parametrize('now, expected', [
+    (_ist(2025, 1, 6, 9, 0), _ist(2025, 1, 3, 18, 10)),     # Pazartesi sabahı -> Cuma
+    (_ist(2025, 1, 2, 12, 0), _ist(2024, 12, 31, 18, 10)),  # Yılbaşı atlanır
+    (_ist(2025, 10, 28, 15, 0), _ist(2025, 10, 28, 12, 40)),  # Yarım gün kapanışı
+])
+def test_bist_last_close(now, expected):
+    assert bist.last_close(now) == expected
+
+
+def test_bist_sessions_are_istanbul_time():
+    # Türkiye 2016'dan beri yaz saati uygulamıyor: seans her mevsim UTC 07:00-15:10
+    for day in (datetime(2025, 1, 2), datetime(2025, 7, 2)):
+        open_, close = bist.session(day.date())
+        assert open_.astimezone(pytz.utc).time() == dt_time(7, 0)
+        assert close.astimezone(pytz.utc).time() == dt_time(15, 10)
+    # Farklı saat diliminde verilen an aynı sonucu verir
+    assert bist.is_open(pytz.utc.localize(datetime(2025, 1, 2, 7, 0)).astimezone(istanbul_tz))
+
+
+@pytest.mark.parametrize('now, is_open', [
+    (_ist(2025, 1, 3, 23, 59), True),    # Cuma gecesi
+    (_ist(2025, 1, 4, 0, 59), True),
+    (_ist(2025, 1, 4, 1, 0), False),     # Cumartesi 01:00 kapanış
+    (_ist(2025, 1, 5, 12, 0), False),    # Pazar
+    (_ist(2025, 1, 6, 0, 59), False),
+    (_ist(2025, 1, 6, 1, 0), True),      # Pazartesi 01:00 açılış
+    (_ist(2025, 1, 1, 12, 0), True),     # Tatiller döviz için geçerli değil
+])
+def test_weekly_hours_is_open(now, is_open):
+    assert fx.is_open(now) is is_open
+
+
+def test_weekly_hours_boundaries():
+    assert fx.next_open(_ist(2025, 1, 4, 12, 0)) == _ist(2025, 1, 6, 1, 0)
+    assert fx.last_close(_ist(2025, 1, 5, 12, 0)) == _ist(2025, 1, 4, 1, 0)
+    assert fx.current_close(_ist(2025, 1, 1, 12, 0)) == _ist(2025, 1, 4, 1, 0)
+    assert fx.current_close(_ist(2025, 1, 5, 12, 0)) is None
+
+
+def _schedule(hours, interval=15 * 60):
+    return AssetClassSchedule('test', hours, interval, jitter=0, rng=random.Random(0))
+
+
+@pytest.mark.parametrize('hours, now, next_run, reason', [
+    # Seans içi: aralık kadar sonra
+    (bist, _ist(2025, 1, 2, 11, 0), _ist(2025, 1, 2, 11, 15), 'seans içi'),
+    # Aralık kapanışı aşıyor: kapanıştan 10 dk sonra snapshot
+    (bist, _ist(2025, 1, 2, 18, 0), _ist(2025, 1, 2, 18, 20), 'kapanış snapshot'),
+    (bist, _ist(2025, 10, 28, 12, 35), _ist(2025, 10, 28, 12, 50), 'kapanış snapshot'),
+    # Kapanıştan hemen sonra çalıştı: snapshot hâlâ yapılacak
+    (bist, _ist(2025, 1, 2, 18, 12), _ist(2025, 1, 2, 18, 20), 'kapanış snapshot'),
+    (fx, _ist(2025, 1, 3, 23, 50), _ist(2025, 1, 4, 0, 5), 'seans içi'),
+    (fx, _ist(2025, 1, 4, 0, 50), _ist(2025, 1, 4, 1, 10), 'kapanış snapshot'),
+])
+def test_schedule_plans_next_run(hours, now, next_run, reason):
+    schedule = _schedule(hours)
+    schedule.record(now)
+    assert (schedule.next_run, schedule.next_reason) == (next_run, reason)
+
+
+@pytest.mark.parametrize('hours, now, next_open', [
+    # Kapanış snapshot'ı alındı: bir sonraki açılışa kadar bekle
+    (bist, _ist(2025, 1, 2, 18, 20), _ist(2025, 1, 3, 10, 0)),
+    (bist, _ist(2025, 1, 4, 12, 0), _ist(2025, 1, 6, 10, 0)),
+    (bist, _ist(2025, 6, 5, 13, 0), _ist(2025, 6, 10, 10, 0)),
+    (fx, _ist(2025, 1, 4, 1, 10), _ist(2025, 1, 6, 1, 0)),
+])
+def test_schedule_waits_for_next_open(hours, now, next_open):
+    schedule = _schedule(hours)
+    schedule.record(now)
+    assert schedule.next_reason == 'sonraki açılış'
+    # Açılışta sınıflar aynı saniyede upstream'e gitmesin diye en fazla 60 sn kaydırılır
+    assert next_open <= schedule.next_run <= next_open + timedelta(seconds=60)
+    assert not schedule.is_due(next_open - timedelta(seconds=1))
+
+
+def test_schedule_backs_off_on_errors():
+    schedule = _schedule(bist)
+    now = _ist(2025, 1, 2, 11, 0)
+    delays = []
+    for _ in range(7):
+        schedule.record(now, error='upstream')
+        delays.append((schedule.next_run - now).total_seconds())
+    assert delays == [60, 120, 240, 480, 960, 1800, 1800]
+    assert schedule.next_reason == 'yeniden deneme #7'
+    schedule.record(now)
+    assert (schedule.failures, schedule.last_error, schedule.next_reason) == (0, None, 'seans içi')
+
+
+def test_refresh_scheduler_runs_everything_first():
+    scheduler = RefreshScheduler([AssetClassSchedule('bist', bist, 900), AssetClassSchedule('fx', fx, 900)])
+    saturday = _ist(2025, 1, 4, 12, 0)
+    assert scheduler.due(saturday) == ['bist', 'fx']
+    assert scheduler.seconds_until_next(saturday) == 0
+    assert scheduler.open_classes(saturday) == []
+    assert scheduler.open_classes(_ist(2025, 1, 2, 12, 0)) == ['bist', 'fx']
+
+    scheduler.record('bist', saturday)
+    scheduler.record('fx', saturday)
+    assert scheduler.due(saturday) == []
+    assert scheduler.seconds_until_next(saturday) == 60
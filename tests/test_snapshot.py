@@ -0,0 +1,40 @@
+# tests/test_snapshot.py
+# companies payload'u: Price satırı olmayan şirketler (seed sonrası ilk
+# güncellemeden önce) hata vermeden 'henüz fiyat yok' satırı olarak döner.
+from datetime import datetime
+
+from db_models import Company, Price, bump_generation
+from snapshot import SnapshotStore, build_companies_payload
+
+
+def _seed(symbols):
+    Company.insert_many([{'symbol': s, 'name': s, 'type': 'hisse', 'sector': 'test'} for s in symbols]).execute()
+
+
+def test_payload_before_first_refresh(temp_db):
+    _seed(['AAA.IS', 'BBB.IS'])
+    rows = build_companies_payload()
+    assert [r['symbol'] for r in rows] == ['AAA.IS', 'BBB.IS']
+    assert all(r['price'] is None and r['revision'] == 0 and not r['stale'] for r in rows)
+    assert all(r['error'] == "Henüz fiyat verisi alınmadı." for r in rows)
+
+
+def test_payload_mixes_priced_and_missing_rows(temp_db):
+    _seed(['AAA.IS', 'BBB.IS'])
+    with temp_db.atomic():
+        generation = bump_generation()
+        Price.create(symbol='AAA.IS', price=10.0, previousClose=9.5, timestamp=datetime(2025, 1, 2, 10, 0),
+                     revision=generation)
+    rows = {r['symbol']: r for r in build_companies_payload()}
+    assert rows['AAA.IS']['price'] == 10.0
+    assert rows['AAA.IS']['timestamp'] == '2025-01-02T10:00:00'
+    assert rows['AAA.IS']['revision'] == generation
+    assert rows['BBB.IS']['price'] is None
+
+
+def test_snapshot_builds_without_prices(temp_db):
+    # Piyasa özeti, indeksler ve ETag boş fiyatlarla da kurulabilmeli
+    _seed(['AAA.IS', 'BBB.IS'])
+    snap = SnapshotStore().refresh()
+    assert len(snap.payload) == 2
+    assert snap.market.view()['breadth']['noData'] == 2